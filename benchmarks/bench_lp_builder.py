@@ -0,0 +1,206 @@
+"""Benchmark the native lp builder against glpsol
+
+Builds the lp file of synthetic models of a growing number of technologies,
+timeslices and years with lp_builder and reports the size of the model and the
+build time, as well as the time to patch the lp of a sibling branch with
+other investment limits from it, ie.
+
+    python benchmarks/bench_lp_builder.py --techs 10 100 --timeslices 12 96 --years 10 30
+
+If glpsol is installed, also pass the otoole config and OSeMOSYS file of a
+project to time glpsol --wlp on the same models. Both lp files are then solved
+with HiGHS to check they give the same objective value. A real model is
+checked the same way by passing its CSVs with --csv_dir, ie.
+
+    python benchmarks/bench_lp_builder.py --config data/otoole_config.yaml \\
+        --osemosys model/osemosys.txt --csv_dir data/data
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from otoole import read, write
+
+from osemosys_step import lp_builder, preprocess_data, solve, utils
+
+
+def get_set(values):
+    return pd.DataFrame({"VALUE": values})
+
+
+def get_param(df, index):
+    return df[index + ["VALUE"]].set_index(index)
+
+
+def get_data(num_techs, num_timeslices, num_years, seed=0):
+    """Synthetic model of power plants meeting an electricity demand from fuel imports"""
+    rng = np.random.default_rng(seed)
+    techs = [f"PWR{i:03}" for i in range(num_techs)]
+    imports = ["IMPGAS", "IMPCOA"]
+    timeslices = [f"S{i:03}" for i in range(num_timeslices)]
+    years = list(range(2020, 2020 + num_years))
+    grid = pd.MultiIndex.from_product([["R1"], techs, years], names=["REGION", "TECHNOLOGY", "YEAR"]).to_frame(index=False)
+    fuels = rng.choice(["GAS", "COA"], num_techs)
+
+    oar = pd.concat([
+        grid.assign(FUEL="ELC", MODE_OF_OPERATION=1, VALUE=1.0),
+        pd.DataFrame({"REGION": "R1", "TECHNOLOGY": ["IMPGAS", "IMPCOA"], "FUEL": ["GAS", "COA"]})
+        .merge(pd.DataFrame({"YEAR": years}), how="cross").assign(MODE_OF_OPERATION=1, VALUE=1.0),
+    ])
+    iar = grid.assign(FUEL=np.repeat(fuels, num_years), MODE_OF_OPERATION=1, VALUE=rng.uniform(2, 3, len(grid)))
+    ear = grid.assign(EMISSION="CO2", MODE_OF_OPERATION=1, VALUE=np.where(np.repeat(fuels, num_years) == "COA", 0.1, 0.05))
+    profile = rng.uniform(0.5, 1.5, num_timeslices)
+    demand_profile = pd.DataFrame({"TIMESLICE": timeslices, "VALUE": profile / profile.sum()})
+    capacity_factor = grid.merge(pd.DataFrame({"TIMESLICE": timeslices}), how="cross")
+    capacity_factor["VALUE"] = rng.uniform(0.3, 1, len(capacity_factor))
+
+    data = {
+        "REGION": get_set(["R1"]),
+        "TECHNOLOGY": get_set(techs + imports),
+        "FUEL": get_set(["ELC", "GAS", "COA"]),
+        "EMISSION": get_set(["CO2"]),
+        "TIMESLICE": get_set(timeslices),
+        "MODE_OF_OPERATION": get_set([1]),
+        "YEAR": get_set(years),
+        "YearSplit": get_param(pd.MultiIndex.from_product([timeslices, years], names=["TIMESLICE", "YEAR"]).to_frame(index=False).assign(VALUE=1 / num_timeslices), ["TIMESLICE", "YEAR"]),
+        "OutputActivityRatio": get_param(oar, ["REGION", "TECHNOLOGY", "FUEL", "MODE_OF_OPERATION", "YEAR"]),
+        "InputActivityRatio": get_param(iar, ["REGION", "TECHNOLOGY", "FUEL", "MODE_OF_OPERATION", "YEAR"]),
+        "EmissionActivityRatio": get_param(ear, ["REGION", "TECHNOLOGY", "EMISSION", "MODE_OF_OPERATION", "YEAR"]),
+        "SpecifiedAnnualDemand": get_param(pd.DataFrame({"REGION": "R1", "FUEL": "ELC", "YEAR": years, "VALUE": np.linspace(100, 200, num_years)}), ["REGION", "FUEL", "YEAR"]),
+        "SpecifiedDemandProfile": get_param(demand_profile.assign(REGION="R1", FUEL="ELC").merge(pd.DataFrame({"YEAR": years}), how="cross"), ["REGION", "FUEL", "TIMESLICE", "YEAR"]),
+        "CapacityFactor": get_param(capacity_factor, ["REGION", "TECHNOLOGY", "TIMESLICE", "YEAR"]),
+        "CapitalCost": get_param(grid.assign(VALUE=rng.uniform(500, 2000, len(grid))), ["REGION", "TECHNOLOGY", "YEAR"]),
+        "FixedCost": get_param(grid.assign(VALUE=rng.uniform(10, 50, len(grid))), ["REGION", "TECHNOLOGY", "YEAR"]),
+        "VariableCost": get_param(pd.DataFrame({"REGION": "R1", "TECHNOLOGY": imports, "MODE_OF_OPERATION": 1}).merge(pd.DataFrame({"YEAR": years}), how="cross").assign(VALUE=[5.0, 3.0] * num_years), ["REGION", "TECHNOLOGY", "MODE_OF_OPERATION", "YEAR"]),
+        "OperationalLife": get_param(pd.DataFrame({"REGION": "R1", "TECHNOLOGY": techs, "VALUE": rng.integers(20, 40, num_techs)}), ["REGION", "TECHNOLOGY"]),
+        "ResidualCapacity": get_param(grid.loc[grid["TECHNOLOGY"] == techs[0]].assign(VALUE=np.linspace(50, 0, num_years)), ["REGION", "TECHNOLOGY", "YEAR"]),
+        "AnnualEmissionLimit": get_param(pd.DataFrame({"REGION": "R1", "EMISSION": "CO2", "YEAR": years, "VALUE": np.linspace(60, 30, num_years)}), ["REGION", "EMISSION", "YEAR"]),
+    }
+    defaults = {
+        "DiscountRate": 0.05,
+        "DepreciationMethod": 1,
+        "OperationalLife": 1,
+        "CapacityFactor": 1,
+        "AvailabilityFactor": 1,
+        "CapacityToActivityUnit": 31.536,
+        "TotalAnnualMaxCapacity": -1,
+        "TotalAnnualMaxCapacityInvestment": -1,
+        "TotalTechnologyAnnualActivityUpperLimit": -1,
+        "TotalTechnologyModelPeriodActivityUpperLimit": -1,
+        "AnnualEmissionLimit": -1,
+        "ModelPeriodEmissionLimit": -1,
+    }
+    return data, defaults
+
+
+def get_objective(lp_file):
+    import highspy
+    h = highspy.Highs()
+    h.setOptionValue("output_flag", False)
+    h.readModel(lp_file)
+    h.run()
+    return h.getInfo().objective_function_value
+
+
+def build_native(data, defaults, lp_file):
+    start = time.perf_counter()
+    lp = lp_builder.build(data, defaults)
+    lp.write_lp(lp_file)
+    return time.perf_counter() - start, lp
+
+
+def get_sibling(data, seed=1):
+    """Same model with the investment in half of the technologies stopped, as an option would"""
+    rng = np.random.default_rng(seed)
+    techs = data["OperationalLife"].reset_index()["TECHNOLOGY"]
+    stopped = rng.choice(techs, len(techs) // 2, replace=False)
+    years = data["YEAR"]["VALUE"]
+    sibling = dict(data)
+    sibling["TotalAnnualMaxCapacityInvestment"] = get_param(
+        pd.MultiIndex.from_product([["R1"], stopped, years], names=["REGION", "TECHNOLOGY", "YEAR"]).to_frame(index=False).assign(VALUE=0.0),
+        ["REGION", "TECHNOLOGY", "YEAR"]
+    )
+    return sibling
+
+
+def patch_native(base_lp, base_data, data, defaults):
+    start = time.perf_counter()
+    lp_builder.patch(base_lp, base_data, data, defaults)
+    return time.perf_counter() - start
+
+
+def complete_data(data, defaults, config):
+    """Adds the parameters of the otoole config the synthetic models leave empty"""
+    data = dict(data)
+    defaults = dict(defaults)
+    for name, details in utils.read_otoole_config(config).items():
+        if details["type"] == "set" and name not in data:
+            data[name] = get_set([])
+        elif details["type"] == "param":
+            defaults.setdefault(name, details["default"])
+            if name not in data:
+                data[name] = pd.DataFrame(columns=details["indices"] + ["VALUE"]).set_index(details["indices"])
+    return data, defaults
+
+
+def build_glpsol(data, defaults, config, osemosys, tmp_dir):
+    data_file = str(Path(tmp_dir, "data.txt"))
+    data_file_pp = str(Path(tmp_dir, "data_pp.txt"))
+    lp_file = str(Path(tmp_dir, "glpsol.lp"))
+    data, defaults = complete_data(data, defaults, config)
+    write(config, "datafile", data_file, data, defaults)
+    preprocess_data.main_from_data(data, data_file, data_file_pp)
+    start = time.perf_counter()
+    if solve.create_lp(data_file_pp, lp_file, osemosys) == 1:
+        raise RuntimeError(f"glpsol could not build {lp_file}")
+    return time.perf_counter() - start, lp_file
+
+
+def compare(name, data, defaults, args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        native_time, lp = build_native(data, defaults, str(Path(tmp_dir, "native.lp")))
+        nonzeros = len(lp.get_entries())
+        patch_time = patch_native(lp, data, get_sibling(data), defaults)
+        line = f"{name:>20} {lp.num_rows:>9} {lp.num_cols:>9} {nonzeros:>10} {native_time:>9.3f}s {patch_time:>9.3f}s"
+        if args.osemosys:
+            glpsol_time, glpsol_lp = build_glpsol(data, defaults, args.config, args.osemosys, tmp_dir)
+            native_obj = get_objective(str(Path(tmp_dir, "native.lp")))
+            glpsol_obj = get_objective(glpsol_lp)
+            gap = abs(native_obj - glpsol_obj) / max(abs(glpsol_obj), 1)
+            line += f" {glpsol_time:>9.3f}s {glpsol_time / native_time:>7.1f}x {gap:>9.1e}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--techs", default=[10, 100], type=int, nargs="+")
+    parser.add_argument("--timeslices", default=[12, 96], type=int, nargs="+")
+    parser.add_argument("--years", default=[10, 30], type=int, nargs="+")
+    parser.add_argument("--config", default=None, help="otoole config, needed with --osemosys and --csv_dir")
+    parser.add_argument("--osemosys", default=None, help="OSeMOSYS file to also build the models with glpsol")
+    parser.add_argument("--csv_dir", default=None, help="CSVs of a model to run instead of the synthetic models")
+    args = parser.parse_args()
+
+    header = f"{'model':>20} {'rows':>9} {'columns':>9} {'non zeros':>10} {'native':>10} {'patch':>10}"
+    if args.osemosys:
+        header += f" {'glpsol':>10} {'speedup':>8} {'obj gap':>9}"
+    print(header)
+
+    if args.csv_dir:
+        data, defaults = read(args.config, "csv", args.csv_dir)
+        compare(Path(args.csv_dir).name, data, defaults, args)
+        return
+
+    for num_techs in args.techs:
+        for num_timeslices in args.timeslices:
+            for num_years in args.years:
+                data, defaults = get_data(num_techs, num_timeslices, num_years)
+                compare(f"{num_techs}x{num_timeslices}x{num_years}", data, defaults, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark reading the new capacity passed on to the next step from a solution file
+
+Compares reading a synthetic CBC solution file with otoole against
+solve.read_solution, for all variables and for NewCapacity only, ie.
+
+    python benchmarks/bench_read_solution.py --variables 10000 100000 1000000
+"""
+
+import argparse
+import time
+import numpy as np
+
+from otoole.results.results import ReadCbc
+
+from osemosys_step import solve
+
+
+def write_solution(sol_file, num_variables, seed=0):
+    """Writes a CBC solution file with one NewCapacity for every 20 RateOfActivity variables"""
+    rng = np.random.default_rng(seed)
+    values = rng.random(num_variables)
+    with open(sol_file, "w") as f:
+        f.write("Optimal - objective value 1.00000000\n")
+        for num, value in enumerate(values):
+            if num % 21 == 0:
+                name = f"NewCapacity(R1,TEC{num % 1000},{2020 + num % 30})"
+            else:
+                name = f"RateOfActivity(R1,S{num % 96},TEC{num % 1000},1,{2020 + num % 30})"
+            f.write(f"{num:>8} {name:<60} {value:>15.8f} {0:>15}\n")
+
+
+def read_otoole(sol_file):
+    df = ReadCbc(user_config={"YEAR": {"type": "set", "dtype": "int"}})._convert_to_dataframe(sol_file)
+    return df.loc[df["Value"].abs() >= 1e-6].reset_index(drop=True)
+
+
+def best_of(func, repeats, *args):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variables", default=[10000, 100000, 1000000], type=int, nargs="+")
+    parser.add_argument("--repeats", default=3, type=int)
+    parser.add_argument("--sol_file", default="bench_model.sol")
+    args = parser.parse_args()
+
+    print(f"{'variables':>10} {'otoole':>9} {'all':>9} {'NewCapacity':>12} {'speedup':>8}")
+    for num_variables in args.variables:
+        write_solution(args.sol_file, num_variables)
+        otoole_time, expected = best_of(read_otoole, args.repeats, args.sol_file)
+        all_time, actual = best_of(solve.read_solution, args.repeats, args.sol_file, "cbc")
+        assert len(actual) == len(expected)
+        needed_time, needed = best_of(solve.read_solution, args.repeats, args.sol_file, "cbc", ["NewCapacity"])
+        assert len(needed) == (expected["Variable"] == "NewCapacity").sum()
+        print(f"{num_variables:>10} {otoole_time:>8.3f}s {all_time:>8.3f}s {needed_time:>11.3f}s {otoole_time / needed_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
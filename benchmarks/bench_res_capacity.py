@@ -0,0 +1,85 @@
+"""Benchmark passing new capacity on as residual capacity
+
+Compares main_utils.get_new_capacity_lifetime against the previous row wise
+implementation on synthetic data, for a growing number of new capacity rows
+and operational lifetimes, ie.
+
+    python benchmarks/bench_res_capacity.py --rows 100 1000 10000 --lifetimes 5 25 60
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from osemosys_step import main_utils as mu
+
+
+def get_new_capacity_lifetime_rowwise(op_life, new_capacity):
+    """Previous implementation, kept as a reference"""
+    mapper = dict(zip(op_life['TECHNOLOGY'], op_life['VALUE']))
+    regions = new_capacity["REGION"].unique()
+
+    results = []
+    for region in regions:
+        df = new_capacity.copy()
+        df = df.loc[df["REGION"] == region].reset_index(drop=True)
+        df["YEARS_ACTIVE"] = df.apply(lambda x: mu.apply_op_life(x["YEAR"], x["TECHNOLOGY"], mapper), axis=1)
+        df = df.explode(column=["YEARS_ACTIVE"])
+        df["YEAR"] = df["YEARS_ACTIVE"]
+        df = df.drop(columns=["YEARS_ACTIVE"])
+        results.append(df)
+
+    df = pd.concat(results).reset_index(drop=True)
+    df = df.groupby(by=["REGION", "TECHNOLOGY", "YEAR"]).sum().reset_index()
+
+    return df[["REGION", "TECHNOLOGY", "YEAR", "VALUE"]]
+
+
+def get_data(rows, lifetime, seed=0):
+    rng = np.random.default_rng(seed)
+    num_techs = max(1, rows // 10)
+    techs = [f"TEC{i}" for i in range(num_techs)]
+    op_life = pd.DataFrame({
+        "REGION": "R1",
+        "TECHNOLOGY": techs,
+        "VALUE": rng.integers(1, lifetime + 1, num_techs),
+    })
+    new_capacity = pd.DataFrame({
+        "REGION": rng.choice(["R1", "R2"], rows),
+        "TECHNOLOGY": rng.choice(techs, rows),
+        "YEAR": rng.integers(2020, 2030, rows),
+        "VALUE": rng.random(rows),
+    })
+    return op_life, new_capacity
+
+
+def best_of(func, repeats, *args):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default=[100, 1000, 10000], type=int, nargs="+")
+    parser.add_argument("--lifetimes", default=[5, 25, 60], type=int, nargs="+")
+    parser.add_argument("--repeats", default=3, type=int)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'lifetime':>9} {'rowwise':>10} {'vectorized':>11} {'speedup':>8}")
+    for rows in args.rows:
+        for lifetime in args.lifetimes:
+            op_life, new_capacity = get_data(rows, lifetime)
+            rowwise, expected = best_of(get_new_capacity_lifetime_rowwise, args.repeats, op_life, new_capacity)
+            vectorized, actual = best_of(mu.get_new_capacity_lifetime, args.repeats, op_life, new_capacity)
+            assert_frame_equal(actual, expected)
+            print(f"{rows:>8} {lifetime:>9} {rowwise:>9.3f}s {vectorized:>10.3f}s {rowwise / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
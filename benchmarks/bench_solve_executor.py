@@ -0,0 +1,84 @@
+"""Benchmark the native solve executor against the snakemake executor
+
+Solves every lp file of an existing step tree with both executors and reports
+the wall clock time of each. Run after a normal ``step run`` so that
+``steps/`` holds lp files, ie. from the project root
+
+    python benchmarks/bench_solve_executor.py --solver cbc --cores 4
+
+or for the steps of another project
+
+    python benchmarks/bench_solve_executor.py --step_dir ../project/steps
+
+The snakefile expects the step folder to be called ``steps``. Both executors
+write their logs to ``logs/solves`` next to it.
+"""
+
+import argparse
+import subprocess
+import time
+from pathlib import Path
+
+from osemosys_step import solve
+
+
+def remove_solutions(lp_files):
+    for lp_file in lp_files:
+        sol_file = Path(Path(lp_file).parent, "model.sol")
+        if sol_file.exists():
+            sol_file.unlink()
+
+
+def count_solutions(lp_files):
+    return sum(Path(Path(lp_file).parent, "model.sol").exists() for lp_file in lp_files)
+
+
+def run_snakemake(lp_files, solver, cores, step_dir):
+    # the snakefile expects paths relative to the snakefile location, in the working directory
+    project_dir = Path(step_dir).parent
+    snakemake_lps = [str(Path("..", "..", Path(lp_file).relative_to(project_dir))) for lp_file in lp_files]
+    snakefile_args = [
+        f"--snakefile {Path(solve.__file__).parent.resolve() / 'snakefile'}",
+        f"--directory {project_dir}",
+        f"--config solver={solver} files={[','.join(snakemake_lps)]}",
+        f"--cores {cores}",
+        "--keep-going",
+        "--quiet"
+    ]
+    subprocess.run(f"snakemake {' '.join(snakefile_args)}", shell=True)
+
+
+def run_native(lp_files, solver, cores, step_dir):
+    log_dir = Path(Path(step_dir).parent, "logs", "solves")
+    solve.solve_lps(lp_files, solver, cores, step_dir=str(step_dir), log_dir=str(log_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--solver", default="cbc")
+    parser.add_argument("--cores", default=1, type=int)
+    parser.add_argument("--repeats", default=3, type=int)
+    parser.add_argument("--step_dir", default="steps")
+    args = parser.parse_args()
+
+    if Path(args.step_dir).name != "steps":
+        raise SystemExit(f"The snakefile can only solve lp files under a folder called 'steps', not {args.step_dir}")
+    lp_files = sorted(str(p) for p in Path(args.step_dir).rglob("model.lp"))
+    if not lp_files:
+        raise SystemExit(f"No lp files found under {args.step_dir}")
+
+    print(f"{len(lp_files)} lp files, solver={args.solver}, cores={args.cores}")
+    for name, func in [("snakemake", run_snakemake), ("native", run_native)]:
+        timings = []
+        for _ in range(args.repeats):
+            remove_solutions(lp_files)
+            start = time.perf_counter()
+            func(lp_files, args.solver, args.cores, args.step_dir)
+            timings.append(time.perf_counter() - start)
+        # a failed solve is fast, so only compare timings of runs that solved every lp file
+        solved = count_solutions(lp_files)
+        print(f"{name:>10}: best {min(timings):.2f}s, mean {sum(timings) / len(timings):.2f}s, solved {solved}/{len(lp_files)}")
+
+
+if __name__ == "__main__":
+    main()
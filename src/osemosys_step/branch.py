@@ -0,0 +1,813 @@
+"""Operations on a single branch of the scenario tree
+
+A branch is identified by its step and the list of option directories leading
+to it, ie. step 2 and ["1A0-1B1", "2C0"]. A step without any options is a
+single branch with an empty option list.
+"""
+
+from typing import Dict, List, Any, Callable, Set, Union
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import shutil
+import logging
+import re
+import time
+import pandas as pd
+
+from otoole import read, write
+
+from osemosys_step import main_utils as mu
+from osemosys_step import results_store as rs
+from osemosys_step import (
+    utils,
+    cache,
+    ledger,
+    lp_builder,
+    preprocess_data,
+    solve
+)
+
+logger = logging.getLogger(__name__)
+
+# result variables read by the next step, see pass_on_capacity()
+CARRY_OVER_VARIABLES = ["NewCapacity"]
+
+def get_branch_dir(root_dir: str, step: int, option: List[str], step_directories: bool = True) -> Path:
+    """Gets the directory of a branch
+
+    Args:
+        root_dir: str
+            Root directory, ie. 'data', 'steps' or 'results'
+        step: int
+            Step number
+        option: List[str]
+            Option directories of the branch
+        step_directories: bool = True
+            Options are nested under step directories
+
+    Example:
+        >>> get_branch_dir("steps", 2, ["1A0-1B1", "2C0"])
+        >>> steps/step_2/1A0-1B1/2C0
+    """
+    if step_directories:
+        return Path(root_dir, f"step_{step}", *option)
+    else:
+        return Path(root_dir, *option)
+
+def get_parent_option(step: int, option: List[str]) -> List[str]:
+    """Gets the options of the branch in the previous step a branch starts from
+
+    Options start with the step they are applied in, so the parent keeps the
+    options of the earlier steps.
+
+    Example:
+        >>> get_parent_option(2, ["1A0-1B1", "2C0"])
+        >>> ["1A0-1B1"]
+    """
+    return [x for x in option if int(re.match(r"\d+", x).group()) < step]
+
+def get_start_basis(step: int, option: List[str], step_dir: str) -> Union[str, None]:
+    """Gets the basis of the parent branch to warm start a branch from
+
+    Returns:
+        str
+            Path to the basis of the parent branch, or None if there is none
+    """
+    if step == 0:
+        return None
+    basis_file = Path(get_branch_dir(step_dir, step - 1, get_parent_option(step, option)), solve.BASIS_FILE)
+    return str(basis_file) if basis_file.exists() else None
+
+def get_parsed_options(option: List[str]) -> List[str]:
+    """Gets the single options of a branch in the order they are applied
+
+    Example:
+        >>> get_parsed_options(["1A0-1B1", "2C0"])
+        >>> ["1A0", "1B1", "2C0"]
+    """
+    parsed_options = []
+    for grouped_option in option:
+        parsed_options.extend(grouped_option.split("-"))
+    return parsed_options
+
+def get_branch_param(
+    step_data: Dict[str, pd.DataFrame],
+    option: List[str],
+    option_data_by_param: Dict[str, Dict[str, pd.DataFrame]],
+    modelled_years: List[int],
+    param: str
+) -> pd.DataFrame:
+    """Applies the options of a branch to a single parameter of the step data
+
+    Args:
+        step_data: Dict[str, pd.DataFrame]
+            otoole data of the step, see data_split.get_step_data()
+        option: List[str]
+            Option directories of the branch
+        option_data_by_param: Dict[str, Dict[str, pd.DataFrame]]
+            output from main_utils.get_param_data_per_option()
+        modelled_years: List[int]
+            Modelled years of the step
+        param: str
+            Parameter to get
+
+    Returns:
+        pd.DataFrame
+            Parameter data in otoole format, ie. indexed by its sets
+    """
+    df = step_data[param]
+    updates = mu.get_option_updates(option_data_by_param, get_parsed_options(option), param, modelled_years)
+    if updates is None:
+        return df
+    index = list(df.index.names)
+    return mu.apply_option_data(df.reset_index(), updates).set_index(index)
+
+def get_branch_data(
+    step_data: Dict[str, pd.DataFrame],
+    option: List[str],
+    option_data_by_param: Dict[str, Dict[str, pd.DataFrame]],
+    modelled_years: List[int],
+    res_cap: pd.DataFrame = None
+) -> Dict[str, pd.DataFrame]:
+    """Gets the input data of a branch without writing it to disk
+
+    Args:
+        step_data: Dict[str, pd.DataFrame]
+            otoole data of the step, see data_split.get_step_data()
+        option: List[str]
+            Option directories of the branch
+        option_data_by_param: Dict[str, Dict[str, pd.DataFrame]]
+            output from main_utils.get_param_data_per_option()
+        modelled_years: List[int]
+            Modelled years of the step
+        res_cap: pd.DataFrame = None
+            ResidualCapacity passed on from previous steps, with the columns
+            REGION, TECHNOLOGY, YEAR and VALUE. The ResidualCapacity of the
+            step data is used if not provided
+
+    Returns:
+        Dict[str, pd.DataFrame]
+            otoole data of the branch
+    """
+    params = set()
+    for option_to_apply in get_parsed_options(option):
+        params.update(option_data_by_param[option_to_apply])
+
+    data = dict(step_data)
+    for param in params:
+        data[param] = get_branch_param(step_data, option, option_data_by_param, modelled_years, param)
+
+    if res_cap is not None:
+        index = list(step_data["ResidualCapacity"].index.names)
+        data["ResidualCapacity"] = res_cap.set_index(index)
+
+    return data
+
+def map_branches(func: Callable, step: int, options: List[List[str]], cores: int, *args, per_branch_args: List[tuple] = None) -> List[int]:
+    """Calls a branch function for several branches of a step in parallel
+
+    Args:
+        func: Callable
+            Function called as func(step, option, *args) that returns an exit code
+        step: int
+            Step number
+        options: List[List[str]]
+            Option directories of each branch
+        cores: int
+            Number of branches processed at the same time
+        *args
+            Additional arguments passed to func
+        per_branch_args: List[tuple] = None
+            Arguments passed to func after args that differ between
+            branches, in the order of options
+
+    Returns:
+        List[int]
+            Exit code for each branch, in the order of options. A function
+            that raises is logged and counts as failed.
+    """
+    if not options:
+        return []
+
+    if per_branch_args is None:
+        per_branch_args = [() for _ in options]
+
+    if int(cores) <= 1 or len(options) == 1:
+        futures = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=int(cores))
+        futures = [
+            executor.submit(func, step, option, *args, *branch_args)
+            for option, branch_args in zip(options, per_branch_args)
+        ]
+
+    exit_codes = []
+    for num, option in enumerate(options):
+        try:
+            if futures is None:
+                exit_code = func(step, option, *args, *per_branch_args[num])
+            else:
+                exit_code = futures[num].result()
+        except Exception as e:
+            logger.error(f"{func.__name__} for {option} in step {step} raised {e}")
+            exit_code = 1
+        exit_codes.append(exit_code)
+
+    if futures is not None:
+        executor.shutdown()
+
+    return exit_codes
+
+def materialize_branch(
+    step: int,
+    option: List[str],
+    data_dir: str,
+    step_dir: str,
+    option_data_by_param: Dict[str, Dict[str, pd.DataFrame]],
+    modelled_years: List[int],
+    in_memory: bool = False,
+    link: bool = False,
+    overlay: bool = False
+) -> int:
+    """Creates the folders and input data of a branch
+
+    The reference data of the step is copied into the data folder of the
+    branch and all options of the branch are applied to it. Redoing this is
+    safe, as the reference data is copied again before applying the options.
+
+    Args:
+        step: int
+        option: List[str]
+        data_dir: str
+        step_dir: str
+        option_data_by_param: Dict[str, Dict[str, pd.DataFrame]]
+            output from main_utils.get_param_data_per_option()
+        modelled_years: List[int]
+            Modelled years of the step
+        in_memory: bool = False
+            Only create the step folder, as the data is kept in memory
+        link: bool = False
+            Link the reference data instead of copying it. Only the
+            parameters the options change are written as new files
+        overlay: bool = False
+            Only write the parameters the options change. The other
+            parameters are read from the reference data, see get_branch_csv()
+
+    Returns:
+        0: int
+            If successful
+    """
+    get_branch_dir(step_dir, step, option).mkdir(parents=True, exist_ok=True)
+    if in_memory:
+        return 0
+
+    csvs = get_branch_dir(data_dir, step, option)
+    csvs.mkdir(parents=True, exist_ok=True)
+    if not overlay:
+        utils.copy_csvs(str(Path(data_dir, f"data_{step}")), str(csvs), link)
+
+    # apply all options of a parameter at once
+    parsed_options = get_parsed_options(option)
+    params = set()
+    for option_to_apply in parsed_options:
+        params.update(option_data_by_param[option_to_apply])
+
+    for param in sorted(params):
+        updates = mu.get_option_updates(option_data_by_param, parsed_options, param, modelled_years)
+        path_to_data = Path(csvs, f"{param}.csv")
+        original = pd.read_csv(Path(data_dir, f"data_{step}", f"{param}.csv") if overlay else path_to_data)
+        new = mu.apply_option_data(original, updates)
+        if path_to_data.exists():
+            path_to_data.unlink() # write a new file, not through a link to the reference data
+        new.to_csv(path_to_data, index=False)
+    return 0
+
+def get_branch_csv(data_dir: str, step: int, option: List[str], param: str) -> Path:
+    """Gets the CSV of a parameter of a branch
+
+    Branch data folders only hold the parameters their options change if
+    created with overlay, see materialize_branch(). The CSV of any other
+    parameter is taken from the reference data of the step, ie. data/data_1
+    """
+    csv = Path(get_branch_dir(data_dir, step, option), f"{param}.csv")
+    return csv if csv.exists() else Path(data_dir, f"data_{step}", f"{param}.csv")
+
+def get_key_settings(lp_builder: str = "glpsol", warm_start: bool = False, cold_baseline: bool = False) -> Dict[str, Any]:
+    """Gets the run settings the artifacts of a branch depend on besides its inputs"""
+    return {"lp_builder": lp_builder, "warm_start": warm_start, "cold_baseline": cold_baseline}
+
+def get_cache_key(step: int, option: List[str], data_dir: str, otoole_config: str, osemosys_file: str, solver: str, res_cap: pd.DataFrame = None, settings: Dict[str, Any] = None) -> str:
+    """Gets the artifact cache key of a branch from its input data
+
+    If res_cap is given, it is hashed instead of the ResidualCapacity CSV.
+    The run settings default to those of get_key_settings()
+    """
+    csvs = get_branch_dir(data_dir, step, option)
+    overrides = {"ResidualCapacity": res_cap} if res_cap is not None else None
+    reference_dir = str(Path(data_dir, f"data_{step}"))
+    settings = settings or get_key_settings()
+    return cache.ArtifactCache.get_key(str(csvs), [str(otoole_config), str(osemosys_file)], solver, overrides, reference_dir, settings)
+
+def get_data_key(data: Dict[str, pd.DataFrame], otoole_config: str, osemosys_file: str, solver: str, settings: Dict[str, Any] = None) -> str:
+    """Gets the artifact cache key of a branch from its input data in memory"""
+    settings = settings or get_key_settings()
+    return cache.ArtifactCache.get_data_key(data, [str(otoole_config), str(osemosys_file)], solver, settings)
+
+def get_branch_res_capacity(step: int, option: List[str], data_dir: str, res_cap_ledger: ledger.ResidualCapacityLedger, modelled_years: List[int]) -> pd.DataFrame:
+    """Gets the residual capacity of a branch including the capacity passed on to it
+
+    Returns:
+        pd.DataFrame
+            ResidualCapacity of the branch, or None if no capacity has been
+            passed on to it, ie. in the first step
+    """
+    if not res_cap_ledger.get_ancestor_entries(step, option):
+        return None
+    res_cap = pd.read_csv(str(get_branch_csv(data_dir, step, option, "ResidualCapacity")))
+    return res_cap_ledger.get_res_capacity(step, option, res_cap, modelled_years)
+
+def create_datafile(step: int, option: List[str], data_dir: str, step_dir: str, otoole_config: str, res_cap: pd.DataFrame = None, overlay: bool = False) -> int:
+    """Creates the datafile and preprocessed datafile of a branch
+
+    If res_cap is given, it replaces the ResidualCapacity of the branch CSVs,
+    which are left unchanged. If overlay is set, the branch CSVs only hold
+    the parameters its options change, see read_branch_data()
+
+    Returns:
+        0: int
+            If successful
+        1: int
+            If the branch directory does not exist, ie. from a failed parent
+    """
+    csvs = get_branch_dir(data_dir, step, option)
+    branch_dir = get_branch_dir(step_dir, step, option)
+    if not branch_dir.exists():
+        logger.warning(f"{str(branch_dir)} not created")
+        return 1
+    data_file = Path(branch_dir, "data.txt") # need non-preprocessed for otoole results
+    data_file_pp = Path(branch_dir, "data_pp.txt") # preprocessed
+    if res_cap is None and not overlay:
+        mu.create_datafile(csvs, data_file, otoole_config)
+        preprocess_data.main("otoole", str(data_file), str(data_file_pp))
+    else:
+        data, defaults = read_branch_data(step, option, data_dir, otoole_config, res_cap, overlay)
+        write(str(otoole_config), "datafile", str(data_file), data, defaults)
+        preprocess_data.main_from_data(data, str(data_file), str(data_file_pp))
+    return 0
+
+def create_datafile_from_data(
+    step: int,
+    option: List[str],
+    step_dir: str,
+    otoole_config: str,
+    otoole_defaults: Dict[str, float],
+    csv_dir: str,
+    data: Dict[str, pd.DataFrame]
+) -> int:
+    """Creates the datafile and preprocessed datafile of a branch from data in memory
+
+    Args:
+        step: int
+        option: List[str]
+        step_dir: str
+        otoole_config: str
+        otoole_defaults: Dict[str, float]
+        csv_dir: str
+            Root directory to also write the branch data as CSVs to, for
+            debugging. Not written if None
+        data: Dict[str, pd.DataFrame]
+            otoole data of the branch, see get_branch_data()
+
+    Returns:
+        0: int
+            If successful
+        1: int
+            If the branch directory does not exist, ie. from a failed parent
+    """
+    branch_dir = get_branch_dir(step_dir, step, option)
+    if not branch_dir.exists():
+        logger.warning(f"{str(branch_dir)} not created")
+        return 1
+    data_file = Path(branch_dir, "data.txt") # need non-preprocessed for otoole results
+    data_file_pp = Path(branch_dir, "data_pp.txt") # preprocessed
+    write(str(otoole_config), "datafile", str(data_file), data, otoole_defaults)
+    preprocess_data.main_from_data(data, str(data_file), str(data_file_pp))
+    if csv_dir:
+        write(str(otoole_config), "csv", str(get_branch_dir(csv_dir, step, option)), data, otoole_defaults)
+    return 0
+
+def create_lp(step: int, option: List[str], step_dir: str, osemosys_file: str, log_dir: str) -> int:
+    """Creates the lp file of a branch
+
+    Returns:
+        0: int
+            If successful
+        1: int
+            If not successful
+    """
+    branch_dir = get_branch_dir(step_dir, step, option)
+    lp_file = Path(branch_dir, "model.lp")
+    datafile = Path(branch_dir, "data_pp.txt")
+    lp_log_dir = get_branch_dir(log_dir, step, option)
+    lp_log_dir.mkdir(parents=True, exist_ok=True)
+    lp_log_file = Path(lp_log_dir, "lp.log")
+
+    exit_code = solve.create_lp(str(datafile), str(lp_file), str(osemosys_file), str(lp_log_file))
+    if exit_code == 1:
+        logger.error(f"{str(lp_file)} could not be created")
+    return exit_code
+
+def read_branch_data(step: int, option: List[str], data_dir: str, otoole_config: str, res_cap: pd.DataFrame = None, overlay: bool = False) -> tuple:
+    """Reads the CSVs of a branch, with the ResidualCapacity replaced by res_cap if given
+
+    If overlay is set, the reference data of the step is read and the
+    parameters in the branch CSVs replace it, see materialize_branch()
+
+    Returns:
+        tuple
+            otoole data and default values
+    """
+    csvs = get_branch_dir(data_dir, step, option)
+    if overlay:
+        data, defaults = read(str(otoole_config), "csv", str(Path(data_dir, f"data_{step}")))
+        for csv in sorted(csvs.glob("*.csv")):
+            reference = data[csv.stem]
+            dtypes = reference.reset_index().dtypes.to_dict()
+            data[csv.stem] = pd.read_csv(csv).astype(dtypes).set_index(list(reference.index.names))
+    else:
+        data, defaults = read(str(otoole_config), "csv", str(csvs))
+    if res_cap is not None:
+        data["ResidualCapacity"] = res_cap.set_index(list(data["ResidualCapacity"].index.names))
+    return data, defaults
+
+def create_lp_native(
+    step: int,
+    option: List[str],
+    data_dir: str,
+    step_dir: str,
+    otoole_config: str,
+    osemosys_file: str,
+    log_dir: str,
+    res_cap: pd.DataFrame = None,
+    data: Dict[str, pd.DataFrame] = None,
+    otoole_defaults: Dict[str, float] = None,
+    overlay: bool = False
+) -> int:
+    """Creates the lp file of a branch with the native builder
+
+    Models with features the native builder does not support are built with
+    glpsol instead, see lp_builder.get_unsupported_features()
+
+    Args:
+        step: int
+        option: List[str]
+        data_dir: str
+        step_dir: str
+        otoole_config: str
+        osemosys_file: str
+            OSeMOSYS file for the glpsol fallback
+        log_dir: str
+        res_cap: pd.DataFrame = None
+            Replaces the ResidualCapacity of the branch CSVs, as in
+            create_datafile()
+        data: Dict[str, pd.DataFrame] = None
+            otoole data of the branch if kept in memory, instead of reading
+            the branch CSVs
+        otoole_defaults: Dict[str, float] = None
+            Default values of data
+        overlay: bool = False
+            The branch CSVs only hold the parameters its options change, see
+            read_branch_data()
+
+    Returns:
+        0: int
+            If successful
+        1: int
+            If not successful
+    """
+    lp_file = Path(get_branch_dir(step_dir, step, option), "model.lp")
+    if data is None:
+        data, otoole_defaults = read_branch_data(step, option, data_dir, otoole_config, res_cap, overlay)
+
+    try:
+        lp = lp_builder.build(data, otoole_defaults)
+    except lp_builder.UnsupportedFeatureError as e:
+        logger.info(f"{str(lp_file)} built with glpsol: {e}")
+        return create_lp(step, option, step_dir, osemosys_file, log_dir)
+    except ValueError as e:
+        logger.error(f"{str(lp_file)} could not be created: {e}")
+        return 1
+
+    lp.write_lp(str(lp_file))
+    return 0
+
+def create_sibling_lps(
+    step: int,
+    options: List[List[str]],
+    data_dir: str,
+    step_dir: str,
+    otoole_config: str,
+    osemosys_file: str,
+    log_dir: str,
+    res_caps: List[pd.DataFrame] = None,
+    data: List[Dict[str, pd.DataFrame]] = None,
+    otoole_defaults: Dict[str, float] = None,
+    overlay: bool = False
+) -> List[int]:
+    """Creates the lp files of branches with the same parent with the native builder
+
+    The lp of the first branch is built and the lps of the others are patched
+    from it, so only the constraints their option data changes are built
+    again, see lp_builder.patch(). A branch whose options change which
+    variables or constraints the model has is built in full.
+
+    Args:
+        step: int
+        options: List[List[str]]
+            Option directories of branches with the same parent
+        data_dir: str
+        step_dir: str
+        otoole_config: str
+        osemosys_file: str
+            OSeMOSYS file for the glpsol fallback
+        log_dir: str
+        res_caps: List[pd.DataFrame] = None
+            ResidualCapacity of each branch, see create_lp_native()
+        data: List[Dict[str, pd.DataFrame]] = None
+            otoole data of each branch if kept in memory
+        otoole_defaults: Dict[str, float] = None
+            Default values of data
+        overlay: bool = False
+            See create_lp_native()
+
+    Returns:
+        List[int]
+            Exit code of each branch, see create_lp_native()
+    """
+    exit_codes = []
+    base_lp = None
+    base_data = None
+    for num, option in enumerate(options):
+        lp_file = Path(get_branch_dir(step_dir, step, option), "model.lp")
+        if data is None:
+            branch_data, defaults = read_branch_data(step, option, data_dir, otoole_config, res_caps[num] if res_caps else None, overlay)
+        else:
+            branch_data, defaults = data[num], otoole_defaults
+
+        try:
+            if base_lp is None:
+                lp = lp_builder.build(branch_data, defaults)
+                base_lp, base_data = lp, branch_data
+            else:
+                try:
+                    lp = lp_builder.patch(base_lp, base_data, branch_data, defaults)
+                except lp_builder.StructureChangedError as e:
+                    logger.info(f"{str(lp_file)} built without patching: {e}")
+                    lp = lp_builder.build(branch_data, defaults)
+        except lp_builder.UnsupportedFeatureError as e:
+            logger.info(f"{str(lp_file)} built with glpsol: {e}")
+            exit_codes.append(create_lp(step, option, step_dir, osemosys_file, log_dir))
+            continue
+        except ValueError as e:
+            logger.error(f"{str(lp_file)} could not be created: {e}")
+            exit_codes.append(1)
+            continue
+
+        lp.write_lp(str(lp_file))
+        exit_codes.append(0)
+    return exit_codes
+
+def solve_branch(step: int, option: List[str], step_dir: str, log_dir: str, solver: str, osemosys_file: str) -> int:
+    """Solves the lp file of a branch and checks the solution
+
+    Returns:
+        0: int
+            If an optimal solution was found
+        1: int
+            If not successful
+    """
+    branch_dir = get_branch_dir(step_dir, step, option)
+    branch_log_dir = get_branch_dir(log_dir, step, option)
+    solve.solve_lp(
+        str(Path(branch_dir, "model.lp")),
+        solver,
+        str(Path(branch_log_dir, "model.log")),
+        str(Path(branch_log_dir, "solve_time.log")),
+        str(osemosys_file)
+    )
+    return solve.check_solution(str(Path(branch_dir, "model.sol")), solver)
+
+def solve_branch_highs(step: int, option: List[str], step_dir: str, log_dir: str) -> Union[pd.DataFrame, None]:
+    """Solves the lp file of a branch with HiGHS in the current process
+
+    Returns:
+        pd.DataFrame
+            Primal values of the solution, see solve.solve_highs(). None if
+            not successful
+    """
+    branch_dir = get_branch_dir(step_dir, step, option)
+    branch_log_dir = get_branch_dir(log_dir, step, option)
+    branch_log_dir.mkdir(parents=True, exist_ok=True)
+    start_time = time.perf_counter()
+    solution = solve.solve_highs(str(Path(branch_dir, "model.lp")), str(Path(branch_dir, "model.sol")), str(Path(branch_log_dir, "model.log")))
+    with open(str(Path(branch_log_dir, "solve_time.log")), "w") as f:
+        f.write(f"Solve Time: {time.perf_counter() - start_time:.3f} seconds")
+    return solution
+
+def copy_branch_artifacts(step: int, src_option: List[str], dst_option: List[str], step_dir: str, results: bool = False) -> None:
+    """Copies the datafiles, lp file and solution of one branch to another
+
+    Used to fan out the solution of a branch to branches with identical inputs
+
+    Args:
+        step: int
+        src_option: List[str]
+            Branch to copy from
+        dst_option: List[str]
+            Branch to copy to
+        step_dir: str
+        results: bool = False
+            Only copy the result CSVs
+    """
+    src_dir = get_branch_dir(step_dir, step, src_option)
+    dst_dir = get_branch_dir(step_dir, step, dst_option)
+    if results:
+        shutil.rmtree(str(Path(dst_dir, "results")), ignore_errors=True)
+        shutil.copytree(str(Path(src_dir, "results")), str(Path(dst_dir, "results")))
+        return
+    for artifact in cache.ARTIFACTS + [solve.BASIS_FILE]:
+        if Path(src_dir, artifact).exists():
+            shutil.copy(str(Path(src_dir, artifact)), str(Path(dst_dir, artifact)))
+
+def generate_results(
+    step: int,
+    option: List[str],
+    step_dir: str,
+    solver: str,
+    otoole_config: str,
+    variables: List[str] = None,
+    solution: pd.DataFrame = None
+) -> None:
+    """Converts the solution of a branch to result CSVs
+
+    Args:
+        step: int
+        option: List[str]
+        step_dir: str
+        solver: str
+        otoole_config: str
+        variables: List[str] = None
+            Only write the CSVs of these variables, read straight from the
+            solution file. The full results are converted with otoole if
+            not provided
+        solution: pd.DataFrame = None
+            Primal values of a solve in memory, see solve_branch_highs().
+            Used instead of reading the solution file
+    """
+    sol_dir = get_branch_dir(step_dir, step, option)
+    if not sol_dir.exists():
+        return
+    if variables:
+        if solution is None:
+            solution = solve.read_solution(str(Path(sol_dir, "model.sol")), solver, variables)
+        solve.write_results(solution, otoole_config, str(Path(sol_dir, "results")), variables)
+        return
+    if solution is not None:
+        solve.generate_results_from_solution(solution, otoole_config, str(Path(sol_dir, "data.txt")), str(Path(sol_dir, "results")))
+        return
+    solve.generate_results(
+        sol_file=str(Path(sol_dir, "model.sol")),
+        solver=solver,
+        config=otoole_config,
+        data_file=str(Path(sol_dir, "data.txt"))
+    )
+
+def pass_on_capacity(
+    step: int,
+    option: List[str],
+    step_dir: str,
+    op_life: pd.DataFrame,
+    res_cap_ledger: ledger.ResidualCapacityLedger,
+    step_years: List[int]
+) -> None:
+    """Records the new capacity of a branch in the ledger for all future steps
+
+    Args:
+        step: int
+        option: List[str]
+        step_dir: str
+        op_life: pd.DataFrame
+            OperationalLife of the branch, with the columns REGION,
+            TECHNOLOGY and VALUE
+        res_cap_ledger: ledger.ResidualCapacityLedger
+        step_years: List[int]
+            Actual years of the step
+    """
+    option_dir_results = Path(get_branch_dir(step_dir, step, option), "results")
+    if not option_dir_results.exists(): # failed solve
+        return
+
+    new_cap = pd.read_csv(str(Path(option_dir_results, "NewCapacity.csv")))
+    res_cap_ledger.add(step, option, op_life, new_cap, step_years)
+
+def run_branch(step: int, option: List[str], settings: Dict[str, Any], done_stages: Set[str] = None) -> int:
+    """Builds, solves and saves a single branch, and passes its capacity on
+
+    Args:
+        step: int
+        option: List[str]
+        settings: Dict[str, Any]
+            Run settings with the keys 'data_dir', 'step_dir', 'results_dir',
+            'log_dir', 'ledger_dir', 'osemosys_file', 'otoole_config',
+            'solver', 'num_steps', 'actual_years_per_step',
+            'modelled_years_per_step' and 'option_data_by_param'.
+            Artifacts are cached if 'cache_dir' and 'cache_size' are set.
+            The lp file is built without glpsol if 'lp_builder' is 'native'.
+            Results are saved to the results store in 'results_store', in
+            the file format 'results_format'. The reference data is linked
+            into the branch if 'link_data' is set, and only the changed
+            parameters are written if 'overlay_data' is set
+        done_stages: Set[str] = None
+            Stages completed by a previous run that are skipped, see
+            state.STAGES
+
+    Returns:
+        0: int
+            If successful
+        1: int
+            If the branch failed. The caller removes the branch from the step
+            folders, see scheduler.run_tree()
+    """
+    if not done_stages:
+        done_stages = set()
+    overlay = settings.get("overlay_data", False)
+
+    if "data" not in done_stages:
+        materialize_branch(
+            step,
+            option,
+            settings["data_dir"],
+            settings["step_dir"],
+            settings["option_data_by_param"],
+            settings["modelled_years_per_step"][step],
+            link=settings.get("link_data", False),
+            overlay=overlay
+        )
+
+    res_cap_ledger = ledger.ResidualCapacityLedger(settings["ledger_dir"])
+    res_cap = None
+    if not {"data", "solved"} <= done_stages:
+        res_cap = get_branch_res_capacity(step, option, settings["data_dir"], res_cap_ledger, settings["modelled_years_per_step"][step])
+
+    artifact_cache = None
+    cached_results = False
+    branch_dir = get_branch_dir(settings["step_dir"], step, option)
+    if settings.get("cache_dir") and "solved" not in done_stages and branch_dir.exists():
+        artifact_cache = cache.ArtifactCache(settings["cache_dir"], settings["cache_size"])
+        key_settings = get_key_settings(settings.get("lp_builder", "glpsol"))
+        cache_key = get_cache_key(step, option, settings["data_dir"], settings["otoole_config"], settings["osemosys_file"], settings["solver"], res_cap, key_settings)
+        if artifact_cache.restore(cache_key, str(branch_dir)):
+            done_stages = done_stages | {"data", "lp", "solved"}
+            artifact_cache = None
+            cached_results = Path(branch_dir, "results").exists()
+
+    if "data" not in done_stages:
+        if create_datafile(step, option, settings["data_dir"], settings["step_dir"], settings["otoole_config"], res_cap, overlay) == 1:
+            return 1
+
+    exit_code = 0
+    solution = None
+    if "lp" not in done_stages and settings.get("lp_builder") == "native":
+        exit_code = create_lp_native(
+            step, option, settings["data_dir"], settings["step_dir"], settings["otoole_config"],
+            settings["osemosys_file"], settings["log_dir"], res_cap, overlay=overlay
+        )
+    elif "lp" not in done_stages:
+        exit_code = create_lp(step, option, settings["step_dir"], settings["osemosys_file"], settings["log_dir"])
+    if exit_code == 0 and "solved" not in done_stages and settings["solver"] == "highs":
+        solution = solve_branch_highs(step, option, settings["step_dir"], settings["log_dir"])
+        exit_code = 0 if solution is not None else 1
+        if exit_code == 1:
+            logger.warning(f"Model {str(get_branch_dir(settings['step_dir'], step, option))} failed solving")
+    elif exit_code == 0 and "solved" not in done_stages:
+        exit_code = solve_branch(step, option, settings["step_dir"], settings["log_dir"], settings["solver"], settings["osemosys_file"])
+        if exit_code == 1:
+            logger.warning(f"Model {str(get_branch_dir(settings['step_dir'], step, option))} failed solving")
+
+    if exit_code == 1:
+        return 1
+
+    if "results" not in done_stages:
+        if not settings["solver"] == "glpk" and not cached_results: # csvs already created
+            generate_results(step, option, settings["step_dir"], settings["solver"], settings["otoole_config"], solution=solution)
+        store = rs.ResultsStore(settings["results_store"], settings.get("results_format", "csv"))
+        store.save(step, option, str(Path(branch_dir, "results")), settings["actual_years_per_step"][step])
+
+    if artifact_cache:
+        artifact_cache.store(cache_key, str(branch_dir))
+
+    # nothing to pass on from the last step
+    if "carried" not in done_stages and step < settings["num_steps"]:
+        op_life = pd.read_csv(str(get_branch_csv(settings["data_dir"], step, option, "OperationalLife")))
+        pass_on_capacity(step, option, settings["step_dir"], op_life, res_cap_ledger, settings["actual_years_per_step"][step])
+    return 0
@@ -0,0 +1,194 @@
+"""Content addressed cache of datafiles, lp files and solutions
+
+Branches are keyed by a hash of their input CSVs, the otoole configuration,
+the OSeMOSYS model file and the solver. Branches with the same key, in the
+same run or in different runs, reuse the preprocessed datafile, the lp file,
+the solution and the result CSVs of the first one that was solved.
+"""
+
+from typing import Any, Dict, List
+from pathlib import Path
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# artifacts of a branch, stored per key
+ARTIFACTS = ["data.txt", "data_pp.txt", "model.lp", "model.sol"]
+
+def hash_dataframe(digest, name: str, df: pd.DataFrame) -> None:
+    """Adds the name, columns and values of a parameter to a hash"""
+    if not df.index.names == [None]:
+        df = df.reset_index()
+    digest.update(name.encode())
+    digest.update(",".join(str(x) for x in df.columns).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+def hash_settings(digest, settings: Dict[str, Any] = None) -> None:
+    """Adds the names and values of run settings to a hash"""
+    for name in sorted(settings or {}):
+        digest.update(f"{name}={settings[name]}".encode())
+
+class ArtifactCache:
+    """Store of branch artifacts with size based eviction
+
+    Args:
+        cache_dir: str
+            Directory of the cache. Created if it does not exist
+        max_size: float
+            Maximum size of the cache in GB. The least recently used entries
+            are removed once it is exceeded
+    """
+
+    def __init__(self, cache_dir: str, max_size: float = 10.0):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = int(max_size * 1e9)
+
+    @staticmethod
+    def get_key(csv_dir: str, input_files: List[str], solver: str, overrides: Dict[str, pd.DataFrame] = None, reference_dir: str = None, settings: Dict[str, Any] = None) -> str:
+        """Hashes the inputs of a branch
+
+        Args:
+            csv_dir: str
+                Directory of the branch input CSVs
+            input_files: List[str]
+                Other files the artifacts depend on, ie. the otoole config and
+                the model file
+            solver: str
+                Solver used for the solution
+            overrides: Dict[str, pd.DataFrame] = None
+                Parameters that replace the CSVs of the same name
+            reference_dir: str = None
+                Directory of the CSVs missing from csv_dir, see
+                branch.get_branch_csv()
+            settings: Dict[str, Any] = None
+                Run settings the artifacts depend on, ie. the lp builder and
+                the warm start settings
+
+        Returns:
+            str
+                Hex digest identifying the branch inputs
+        """
+        if not overrides:
+            overrides = {}
+        digest = hashlib.sha256()
+        csv_files = {f: reference_dir for f in os.listdir(reference_dir) if f.endswith(".csv")} if reference_dir else {}
+        csv_files.update({f: csv_dir for f in os.listdir(csv_dir) if f.endswith(".csv")})
+        for csv_file in sorted(csv_files):
+            if csv_file[:-4] in overrides:
+                continue
+            digest.update(csv_file.encode())
+            with open(Path(csv_files[csv_file], csv_file), "rb") as f:
+                digest.update(f.read())
+        for name in sorted(overrides):
+            hash_dataframe(digest, name, overrides[name])
+        for input_file in input_files:
+            with open(input_file, "rb") as f:
+                digest.update(f.read())
+        digest.update(solver.encode())
+        hash_settings(digest, settings)
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_data_key(data: Dict[str, pd.DataFrame], input_files: List[str], solver: str, settings: Dict[str, Any] = None) -> str:
+        """Hashes the inputs of a branch held in memory
+
+        Same as get_key(), but hashes otoole data instead of a folder of CSVs.
+        Keys from get_key() and get_data_key() are not interchangeable.
+        """
+        digest = hashlib.sha256()
+        for name in sorted(data):
+            hash_dataframe(digest, name, data[name])
+        for input_file in input_files:
+            with open(input_file, "rb") as f:
+                digest.update(f.read())
+        digest.update(solver.encode())
+        hash_settings(digest, settings)
+        return digest.hexdigest()
+
+    def get_entry(self, key: str) -> Path:
+        return Path(self.cache_dir, key[:2], key)
+
+    def has(self, key: str) -> bool:
+        return self.get_entry(key).exists()
+
+    def restore(self, key: str, branch_dir: str) -> bool:
+        """Copies the cached artifacts of a key into a branch directory
+
+        The result CSVs are restored if the entry holds them. Otherwise any
+        results folder of the branch is removed, so that the results are
+        generated again from the restored solution.
+
+        Returns:
+            bool
+                True if all artifacts were restored
+        """
+        entry = self.get_entry(key)
+        if not entry.exists():
+            return False
+        try:
+            for artifact in ARTIFACTS:
+                shutil.copy(str(Path(entry, artifact)), str(Path(branch_dir, artifact)))
+            shutil.rmtree(str(Path(branch_dir, "results")), ignore_errors=True)
+            if Path(entry, "results").exists():
+                shutil.copytree(str(Path(entry, "results")), str(Path(branch_dir, "results")))
+            os.utime(str(entry)) # mark as recently used
+        except OSError as e: # ie. evicted by another process
+            logger.warning(f"Could not restore cache entry {key}: {e}")
+            return False
+        logger.info(f"Restored {branch_dir} from cache entry {key}")
+        return True
+
+    def store(self, key: str, branch_dir: str) -> None:
+        """Copies the artifacts of a solved branch into the cache
+
+        The result CSVs of the branch are stored as well if they have been
+        generated, see restore()
+        """
+        entry = self.get_entry(key)
+        if entry.exists():
+            return
+        for artifact in ARTIFACTS:
+            if not Path(branch_dir, artifact).exists():
+                logger.warning(f"Can not cache {branch_dir} as {artifact} is missing")
+                return
+
+        # write to a temporary directory first so other processes never see a partial entry
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp_entry = Path(entry.parent, f".{key}.{uuid.uuid4().hex}")
+        tmp_entry.mkdir()
+        for artifact in ARTIFACTS:
+            shutil.copy(str(Path(branch_dir, artifact)), str(Path(tmp_entry, artifact)))
+        if Path(branch_dir, "results").exists():
+            shutil.copytree(str(Path(branch_dir, "results")), str(Path(tmp_entry, "results")))
+        try:
+            os.rename(str(tmp_entry), str(entry))
+        except OSError: # stored by another process in the meantime
+            shutil.rmtree(str(tmp_entry), ignore_errors=True)
+
+        self.evict()
+
+    def get_size(self, directory: Path) -> int:
+        return sum(f.stat().st_size for f in directory.rglob("*") if f.is_file())
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits its maximum size"""
+        entries = [
+            entry for prefix in self.cache_dir.iterdir() if prefix.is_dir()
+            for entry in prefix.iterdir() if entry.is_dir() and not entry.name.startswith(".")
+        ]
+        sizes = {entry: self.get_size(entry) for entry in entries}
+        total = sum(sizes.values())
+        if total <= self.max_size:
+            return
+        for entry in sorted(entries, key=lambda x: x.stat().st_mtime):
+            shutil.rmtree(str(entry), ignore_errors=True)
+            total -= sizes[entry]
+            logger.info(f"Evicted cache entry {entry.name}")
+            if total <= self.max_size:
+                break
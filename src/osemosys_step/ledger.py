@@ -0,0 +1,113 @@
+"""Residual capacity passed on between the steps of the scenario tree
+
+The residual capacity of a branch is the residual capacity of its input data
+plus the new capacity built by every branch it descends from, for as long as
+that capacity is operational. Instead of rewriting the residual capacity of
+every future branch after each solve, the capacity a branch passes on is
+recorded once and summed up when the data of a branch is built.
+"""
+
+from typing import Dict, List, Tuple
+from pathlib import Path
+import logging
+import os
+import uuid
+import pandas as pd
+
+from osemosys_step import main_utils as mu
+
+logger = logging.getLogger(__name__)
+
+class ResidualCapacityLedger:
+    """Capacity passed on by each solved branch
+
+    Every entry is checkpointed to disk, so that a resumed run, or another
+    process, can read the entries of branches solved before.
+
+    Args:
+        checkpoint_dir: str
+            Directory to checkpoint the entries to
+    """
+
+    def __init__(self, checkpoint_dir: str):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.entries = {}
+
+    def get_checkpoint(self, step: int, option: List[str]) -> Path:
+        """Gets the checkpoint file of a branch, ie. 'ledger/step_1/1A0/NewCapacity.csv'"""
+        return Path(self.checkpoint_dir, f"step_{step}", *option, "NewCapacity.csv")
+
+    def add(self, step: int, option: List[str], op_life: pd.DataFrame, new_capacity: pd.DataFrame, step_years: List[int]) -> None:
+        """Records the capacity a solved branch passes on
+
+        Adding a branch again replaces its previous entry.
+
+        Args:
+            step: int
+            option: List[str]
+            op_life: pd.DataFrame
+                OperationalLife of the branch
+            new_capacity: pd.DataFrame
+                NewCapacity result of the branch
+            step_years: List[int]
+                Actual years of the step, only capacity built in these years
+                is passed on
+        """
+        step_new_capacity = new_capacity.loc[new_capacity["YEAR"].isin(step_years)]
+        entry = mu.get_new_capacity_lifetime(op_life, step_new_capacity)
+
+        # write to a temporary file first so a crash never leaves a partial entry
+        checkpoint = self.get_checkpoint(step, option)
+        checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        tmp_checkpoint = Path(checkpoint.parent, f".{checkpoint.name}.{uuid.uuid4().hex}")
+        entry.to_csv(str(tmp_checkpoint), index=False)
+        os.replace(str(tmp_checkpoint), str(checkpoint))
+
+        self.entries[(step, tuple(option))] = entry
+
+    def get_entry(self, step: int, option: List[str]) -> pd.DataFrame:
+        """Gets the capacity a branch passed on, or None if it is not recorded"""
+        key = (step, tuple(option))
+        if key not in self.entries:
+            checkpoint = self.get_checkpoint(step, option)
+            if not checkpoint.exists():
+                return None
+            self.entries[key] = pd.read_csv(str(checkpoint))
+        return self.entries[key]
+
+    def get_ancestor_entries(self, step: int, option: List[str]) -> Dict[Tuple[int, Tuple[str, ...]], pd.DataFrame]:
+        """Gets the entries of all branches of previous steps a branch descends from
+
+        The ancestors of a branch are the branches of previous steps whose
+        option path the branch starts with.
+        """
+        entries = {}
+        for previous_step in range(step):
+            for depth in range(len(option) + 1):
+                entry = self.get_entry(previous_step, option[:depth])
+                if entry is not None:
+                    entries[(previous_step, tuple(option[:depth]))] = entry
+        return entries
+
+    def get_res_capacity(self, step: int, option: List[str], res_capacity: pd.DataFrame, modelled_years: List[int]) -> pd.DataFrame:
+        """Gets the residual capacity of a branch
+
+        Args:
+            step: int
+            option: List[str]
+            res_capacity: pd.DataFrame
+                ResidualCapacity of the input data of the branch, with the
+                columns REGION, TECHNOLOGY, YEAR and VALUE
+            modelled_years: List[int]
+                Modelled years of the step
+
+        Returns:
+            pd.DataFrame
+                ResidualCapacity including the capacity passed on by all
+                ancestors, over the modelled years
+        """
+        entries = self.get_ancestor_entries(step, option)
+        if entries:
+            res_capacity = mu.merge_res_capacites(res_capacity, pd.concat(entries.values(), ignore_index=True))
+        res_capacity = res_capacity.loc[res_capacity["YEAR"].isin(modelled_years)]
+        return res_capacity.reset_index(drop=True)
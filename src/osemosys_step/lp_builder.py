@@ -0,0 +1,1023 @@
+"""Native builder of the OSeMOSYS LP
+
+Builds the constraint matrix of an OSeMOSYS model straight from the otoole
+data of a branch with vectorized pandas operations, instead of translating the
+MathProg model with glpsol. Each block of constraints is assembled as
+(row, column, coefficient) triplets, so the build time grows with the number
+of non zeros rather than with the number of set combinations.
+
+The formulation follows the OSeMOSYS code, with the accounting variables
+substituted into the constraints that use them, as in the fast OSeMOSYS
+versions. The variables that remain keep their OSeMOSYS names, ie.
+NewCapacity(UTOPIA,E01,1990), so otoole reads the solution as usual. Storage,
+trade, technology units and user defined constraints are not built, and
+models that use them are left to glpsol.
+
+The builder implements the equations of the OSeMOSYS GNU MathProg model and
+does not read the model file itself. check_model_file() compares the LP it
+builds for some data with the LP GLPK writes from a model file for the same
+data, so a model file with other equations is built with glpsol.
+"""
+
+from typing import Any, Dict, List, Set
+from pathlib import Path
+import importlib.util
+import logging
+import re
+import shutil
+import numpy as np
+import pandas as pd
+
+from osemosys_step import solve
+
+logger = logging.getLogger(__name__)
+
+# parameters of features the builder does not support, if any value is non zero
+UNSUPPORTED_PARAMS = {
+    "TechnologyToStorage": "storage",
+    "TechnologyFromStorage": "storage",
+    "TradeRoute": "trade",
+    "CapacityOfOneTechnologyUnit": "technology units",
+    "UDCMultiplierTotalCapacity": "user defined constraints",
+    "UDCMultiplierNewCapacity": "user defined constraints",
+    "UDCMultiplierActivity": "user defined constraints",
+}
+
+# constraints of the OSeMOSYS model by their code, ie. CAa4 for
+# CAa4_Constraint_Capacity. The builder adds the BUILT_CONSTRAINTS and
+# substitutes the accounting variables of the SUBSTITUTED_CONSTRAINTS into them
+BUILT_CONSTRAINTS = {
+    "CAa4", "CAb1", "EBa11", "EBb4", "NCC1", "NCC2", "TCC1", "TCC2", "AAC2", "AAC3",
+    "TAC2", "TAC3", "RM3", "RE4", "E8", "E9", "SV4", "TDC2",
+}
+SUBSTITUTED_CONSTRAINTS = {
+    "EQ", "CAa1", "CAa2", "CAa3", "EBa1", "EBa2", "EBa3", "EBa4", "EBa5", "EBa6", "EBa7",
+    "EBa8", "EBa9", "EBb1", "EBb2", "Acc1", "Acc2", "Acc3", "Acc4", "CC1", "CC2", "SV1",
+    "SV2", "SV3", "OC1", "OC2", "OC3", "OC4", "TDC1", "AAC1", "TAC1", "RM1", "RM2", "RE1",
+    "RE2", "RE3", "RE5", "E1", "E2", "E3", "E4", "E5", "E6", "E7",
+}
+# constraints of the features in UNSUPPORTED_PARAMS, which models that use them are built with glpsol for
+FEATURE_CONSTRAINTS = re.compile(r"(S|SI|SC)\d+[a-z]?|EBa10|EBb3|CAa5|CAa6|UDC\d+")
+
+class StructureChangedError(Exception):
+    """Raised if data changes which variables or constraints a model has"""
+
+class UnsupportedFeatureError(Exception):
+    """Raised if a model uses features the builder does not support, see get_unsupported_features()"""
+
+class LinearProgram:
+    """Sparse linear program, assembled in blocks of named variables and constraints
+
+    Variables and constraints are numbered in the order they are added. The
+    matrix is kept in coordinate format, as (row, column, coefficient)
+    triplets. Adding a block of constraints that already exists replaces it,
+    if it has the same constraints, see patch()
+    """
+
+    def __init__(self):
+        self.num_cols = 0
+        self.num_rows = 0
+        self.columns = [] # [NAME, LOWER, UPPER] per block of variables
+        self.rows = [] # [NAME, SENSE, RHS] per block of constraints
+        self.entries = [] # [ROW, COL, COEF] per block of constraints
+        self.objective = [] # [COL, COEF]
+        self.variable_blocks = {} # {name: position in columns}
+        self.constraint_blocks = {} # {name: (position in rows, first row)}
+        self.added = set() # names of the blocks of constraints added or replaced
+        self.model = {} # sets and variables the constraints are built from, see build()
+
+    def copy(self) -> "LinearProgram":
+        """Gets a copy that blocks can be replaced in without changing this model"""
+        lp = LinearProgram()
+        lp.num_cols = self.num_cols
+        lp.num_rows = self.num_rows
+        lp.columns = list(self.columns)
+        lp.rows = list(self.rows)
+        lp.entries = list(self.entries)
+        lp.objective = list(self.objective)
+        lp.variable_blocks = dict(self.variable_blocks)
+        lp.constraint_blocks = dict(self.constraint_blocks)
+        lp.model = self.model
+        return lp
+
+    def add_variables(self, name: str, index: pd.DataFrame) -> pd.DataFrame:
+        """Adds a variable for each row of index, bounded by 0 <= x
+
+        Args:
+            name: str
+                Variable name, ie. 'NewCapacity'
+            index: pd.DataFrame
+                Set members of each variable, in the order of the variable
+                indices
+
+        Returns:
+            pd.DataFrame
+                index with the column number of each variable in 'COL'
+        """
+        index = index.reset_index(drop=True)
+        cols = np.arange(self.num_cols, self.num_cols + len(index))
+        self.variable_blocks[name] = len(self.columns)
+        self.columns.append(pd.DataFrame({"NAME": get_names(name, index), "LOWER": 0.0, "UPPER": np.inf}))
+        self.num_cols += len(index)
+        return index.assign(COL=cols)
+
+    def set_bounds(self, name: str, lower: np.ndarray, upper: np.ndarray) -> None:
+        """Sets the bounds of a block of variables, in the order they were added"""
+        position = self.variable_blocks[name]
+        self.columns[position] = self.columns[position].assign(LOWER=lower, UPPER=upper)
+
+    def add_constraints(self, name: str, keys: List[str], terms: pd.DataFrame, sense: str, rhs: pd.DataFrame = None) -> int:
+        """Adds a constraint for each combination of keys with a non zero term
+
+        Args:
+            name: str
+                Constraint name, ie. 'CAa4_Constraint_Capacity'
+            keys: List[str]
+                Sets the constraint is indexed over
+            terms: pd.DataFrame
+                keys, 'COL' and 'COEF' of each term. Terms of the same
+                variable in a constraint are added up
+            sense: str
+                One of '<=', '=' or '>='
+            rhs: pd.DataFrame = None
+                keys and 'RHS' of the constraints with a non zero right hand
+                side. Values of the same constraint are added up
+
+        Returns:
+            int
+                Number of constraints added
+
+        Raises:
+            ValueError
+                If a constraint without terms can not be met, ie. a demand
+                that no technology produces
+            StructureChangedError
+                If the block replaces a block with other constraints
+        """
+        terms = terms.loc[terms["COEF"] != 0, keys + ["COL", "COEF"]]
+        rows = terms[keys].drop_duplicates()
+
+        if rhs is None:
+            rows = rows.assign(RHS=0.0)
+        else:
+            rhs = rhs.groupby(keys, as_index=False, sort=False)["RHS"].sum()
+            check = rhs.merge(rows, on=keys, how="left", indicator=True)
+            empty = check.loc[check["_merge"] == "left_only", "RHS"]
+            violated = {"<=": empty < -1e-9, "=": empty.abs() > 1e-9, ">=": empty > 1e-9}[sense]
+            if violated.any():
+                first = check.loc[violated[violated].index[0], keys].to_list()
+                raise ValueError(f"{name}({','.join(str(x) for x in first)}) can not be met")
+            rows = rows.merge(rhs, on=keys, how="left").fillna({"RHS": 0.0})
+
+        rows = rows.reset_index(drop=True)
+        names = get_names(name, rows[keys])
+        if name in self.constraint_blocks:
+            position, first_row = self.constraint_blocks[name]
+            if not names.reset_index(drop=True).equals(self.rows[position]["NAME"].reset_index(drop=True)):
+                raise StructureChangedError(f"{name} has other constraints")
+        else:
+            position, first_row = len(self.rows), self.num_rows
+            self.constraint_blocks[name] = (position, first_row)
+            self.rows.append(None)
+            self.entries.append(None)
+            self.num_rows += len(rows)
+
+        self.added.add(name)
+        rows["ROW"] = np.arange(first_row, first_row + len(rows))
+        entries = terms.merge(rows[keys + ["ROW"]], on=keys)
+        entries = entries.groupby(["ROW", "COL"], as_index=False, sort=False)["COEF"].sum()
+
+        self.rows[position] = pd.DataFrame({"NAME": names, "SENSE": sense, "RHS": rows["RHS"].astype(float)})
+        self.entries[position] = entries.loc[entries["COEF"] != 0]
+        return len(rows)
+
+    def add_objective(self, terms: pd.DataFrame) -> None:
+        """Adds 'COL' and 'COEF' terms to the minimised objective"""
+        self.objective.append(terms[["COL", "COEF"]])
+
+    def get_columns(self) -> pd.DataFrame:
+        return pd.concat(self.columns, ignore_index=True)
+
+    def get_rows(self) -> pd.DataFrame:
+        if not self.rows:
+            return pd.DataFrame(columns=["NAME", "SENSE", "RHS"])
+        return pd.concat(self.rows, ignore_index=True)
+
+    def get_entries(self) -> pd.DataFrame:
+        if not self.entries:
+            return pd.DataFrame(columns=["ROW", "COL", "COEF"])
+        return pd.concat(self.entries, ignore_index=True)
+
+    def get_objective(self) -> pd.DataFrame:
+        objective = pd.concat(self.objective, ignore_index=True)
+        return objective.groupby("COL", as_index=False)["COEF"].sum()
+
+    def write_lp(self, lp_file: str) -> None:
+        """Writes the model in CPLEX LP format, as glpsol --wlp does"""
+        columns = self.get_columns()
+        rows = self.get_rows()
+        entries = self.get_entries().sort_values(["ROW", "COL"], kind="stable")
+        objective = self.get_objective()
+        names = columns["NAME"].to_numpy()
+
+        terms = format_terms(entries["COEF"].to_numpy(dtype=float), names[entries["COL"].to_numpy()])
+        row_starts = np.searchsorted(entries["ROW"].to_numpy(), np.arange(len(rows) + 1)).tolist()
+        senses = rows["SENSE"].to_list()
+        rhs = rows["RHS"].to_numpy(dtype=float).tolist()
+
+        # bounds of the variables in the model, other than 0 <= x
+        used = np.zeros(len(columns), dtype=bool)
+        used[entries["COL"].to_numpy()] = True
+        used[objective["COL"].to_numpy()] = True
+        bounds = columns.loc[used & ((columns["LOWER"] != 0) | (columns["UPPER"] != np.inf))]
+        bound_lines = [format_bound(name, lower, upper) for name, lower, upper in bounds[["NAME", "LOWER", "UPPER"]].itertuples(index=False)]
+
+        with open(lp_file, "w") as f:
+            f.write("\\* Problem: OSeMOSYS *\\\n\nMinimize\n cost:\n")
+            f.write("\n".join(format_terms(objective["COEF"].to_numpy(dtype=float), names[objective["COL"].to_numpy()])))
+            f.write("\n\nSubject To\n")
+            for row, name in enumerate(rows["NAME"].to_list()):
+                f.write(f" {name}:\n")
+                f.write("\n".join(terms[row_starts[row]:row_starts[row + 1]]))
+                f.write(f"\n {senses[row]} {rhs[row]!r}\n")
+            if bound_lines:
+                f.write("\nBounds\n" + "\n".join(bound_lines) + "\n")
+            f.write("\nEnd\n")
+
+    def to_highs(self):
+        """Passes the model to HiGHS in memory
+
+        Needs the optional highspy package.
+
+        Returns:
+            highspy.Highs
+                Solver holding the model, ready to run
+        """
+        import highspy
+
+        columns = self.get_columns()
+        rows = self.get_rows()
+        entries = self.get_entries().sort_values(["COL", "ROW"], kind="stable")
+        objective = self.get_objective()
+
+        model = highspy.HighsLp()
+        model.num_col_ = len(columns)
+        model.num_row_ = len(rows)
+        cost = np.zeros(len(columns))
+        cost[objective["COL"].to_numpy()] = objective["COEF"].to_numpy()
+        model.col_cost_ = cost
+        model.col_lower_ = columns["LOWER"].to_numpy(dtype=float)
+        model.col_upper_ = np.where(columns["UPPER"] == np.inf, highspy.kHighsInf, columns["UPPER"]).astype(float)
+        rhs = rows["RHS"].to_numpy(dtype=float)
+        model.row_lower_ = np.where(rows["SENSE"] == "<=", -highspy.kHighsInf, rhs)
+        model.row_upper_ = np.where(rows["SENSE"] == ">=", highspy.kHighsInf, rhs)
+        model.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        model.a_matrix_.start_ = np.concatenate([[0], np.cumsum(np.bincount(entries["COL"].to_numpy(dtype=int), minlength=len(columns)))])
+        model.a_matrix_.index_ = entries["ROW"].to_numpy(dtype=np.int32)
+        model.a_matrix_.value_ = entries["COEF"].to_numpy(dtype=float)
+        model.col_names_ = columns["NAME"].to_list()
+        model.row_names_ = rows["NAME"].to_list()
+
+        h = highspy.Highs()
+        h.setOptionValue("output_flag", False)
+        h.passModel(model)
+        return h
+
+def get_names(name: str, index: pd.DataFrame) -> pd.Series:
+    """Gets names in the MathProg style, ie. NewCapacity(UTOPIA,E01,1990)"""
+    if index.empty:
+        return pd.Series([], dtype=str)
+    labels = index.iloc[:, 0].astype(str)
+    for column in index.columns[1:]:
+        labels = labels + "," + index[column].astype(str)
+    return name + "(" + labels + ")"
+
+def format_terms(coefs: np.ndarray, names: np.ndarray) -> List[str]:
+    """Formats terms of an LP expression, ie. ' + 1.5 NewCapacity(UTOPIA,E01,1990)'"""
+    return [
+        f" - {-coef!r} {name}" if coef < 0 else f" + {coef!r} {name}"
+        for coef, name in zip(coefs.tolist(), names.tolist())
+    ]
+
+def format_bound(name: str, lower: float, upper: float) -> str:
+    """Formats the bounds of a variable in LP format"""
+    if lower == -np.inf and upper == np.inf:
+        return f" {name} free"
+    elif upper == np.inf:
+        return f" {name} >= {lower}"
+    elif lower == -np.inf:
+        return f" -inf <= {name} <= {upper}"
+    else:
+        return f" {lower} <= {name} <= {upper}"
+
+def get_set(data: Dict[str, pd.DataFrame], name: str) -> list:
+    """Gets the members of a set, or an empty list if it is not in the data"""
+    if name not in data:
+        return []
+    return data[name]["VALUE"].to_list()
+
+def get_grid(sets: Dict[str, list]) -> pd.DataFrame:
+    """Gets all combinations of the members of several sets"""
+    return pd.MultiIndex.from_product(list(sets.values()), names=list(sets.keys())).to_frame(index=False)
+
+def get_param(data: Dict[str, pd.DataFrame], defaults: Dict[str, float], name: str, keys: pd.DataFrame) -> np.ndarray:
+    """Gets the value of a parameter for each row of keys
+
+    Args:
+        data: Dict[str, pd.DataFrame]
+            otoole data
+        defaults: Dict[str, float]
+            otoole default values
+        name: str
+            Parameter name
+        keys: pd.DataFrame
+            Holds a column for each index of the parameter
+
+    Returns:
+        np.ndarray
+            Values in the order of keys, the default value where not set
+    """
+    default = defaults.get(name, 0)
+    if name not in data or data[name].empty:
+        return np.full(len(keys), default, dtype=float)
+    param = data[name].reset_index()
+    index = [x for x in param.columns if x != "VALUE"]
+    values = keys[index].merge(param, on=index, how="left")["VALUE"]
+    return values.fillna(default).to_numpy(dtype=float)
+
+def get_param_rows(data: Dict[str, pd.DataFrame], name: str, index: List[str] = None) -> pd.DataFrame:
+    """Gets the non zero rows of a parameter that defaults to zero
+
+    Args:
+        data: Dict[str, pd.DataFrame]
+            otoole data
+        name: str
+            Parameter name
+        index: List[str] = None
+            Index columns of the empty frame returned if the parameter is not
+            in data
+
+    Returns:
+        pd.DataFrame
+            Index columns and 'VALUE' of each non zero row
+    """
+    if name not in data:
+        return pd.DataFrame(columns=(index or []) + ["VALUE"])
+    param = data[name].reset_index()
+    return param.loc[param["VALUE"] != 0].reset_index(drop=True)
+
+def get_unsupported_features(data: Dict[str, pd.DataFrame], defaults: Dict[str, float]) -> List[str]:
+    """Gets the features of a model the native builder does not support"""
+    features = []
+    for param, feature in UNSUPPORTED_PARAMS.items():
+        if defaults.get(param, 0) != 0 or not get_param_rows(data, param).empty:
+            if feature not in features:
+                features.append(feature)
+    for param in ["InputActivityRatio", "OutputActivityRatio", "EmissionActivityRatio"]:
+        if defaults.get(param, 0) != 0:
+            features.append(f"a non zero default {param}")
+    return features
+
+def get_formulation_differences(osemosys_file: str) -> List[str]:
+    """Gets the differences between the constraints of an OSeMOSYS model file and the builder
+
+    Only the names of the constraints declared with 's.t.' are compared, not
+    their equations.
+
+    Args:
+        osemosys_file: str
+            GNU MathProg OSeMOSYS model
+
+    Returns:
+        List[str]
+            Description of each difference, empty if the model file has the
+            constraints the builder implements
+    """
+    if not Path(osemosys_file).exists():
+        return [f"{osemosys_file} does not exist"]
+    with open(osemosys_file, "r") as f:
+        model = f.read()
+    model = re.sub(r"/\*.*?\*/", "", model, flags=re.DOTALL)
+    model = re.sub(r"#[^\n]*", "", model)
+    names = re.findall(r"\b(?:s\.t\.|subject\s+to|subj\s+to)\s+([A-Za-z_]\w*)", model)
+    codes = {name.split("_")[0] for name in names}
+
+    differences = []
+    missing = sorted(BUILT_CONSTRAINTS - codes)
+    if missing:
+        differences.append(f"{osemosys_file} does not have the constraints {', '.join(missing)}")
+    known = BUILT_CONSTRAINTS | SUBSTITUTED_CONSTRAINTS
+    unknown = [name for name in names if name.split("_")[0] not in known and not FEATURE_CONSTRAINTS.fullmatch(name.split("_")[0])]
+    if unknown:
+        differences.append(f"{osemosys_file} has the constraints {', '.join(unknown)}, which the native builder does not build")
+    return differences
+
+def get_equation_differences(lp: LinearProgram, glpk_lp_file: str, tolerance: float = 1e-6) -> List[str]:
+    """Gets the differences between a native LP and the LP GLPK writes for the same data
+
+    The native LP substitutes the accounting variables of the GLPK LP, so the
+    two are compared at the optimum. Both are solved with HiGHS, and their
+    objective values, and the slack of each native constraint at the GLPK
+    solution, have to agree. Needs the optional highspy package.
+
+    Args:
+        lp: LinearProgram
+            Native LP, see build()
+        glpk_lp_file: str
+            LP written by glpsol --wlp for the same data
+        tolerance: float = 1e-6
+            Relative tolerance of the objective value and the slacks
+
+    Returns:
+        List[str]
+            Description of each difference, empty if the LPs agree
+    """
+    import highspy
+
+    native = lp.to_highs()
+    native.run()
+    full = highspy.Highs()
+    full.setOptionValue("output_flag", False)
+    full.readModel(glpk_lp_file)
+    full.run()
+    for name, h in [("native LP", native), (glpk_lp_file, full)]:
+        if h.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            return [f"The {name} is {h.modelStatusToString(h.getModelStatus())}"]
+
+    native_lp, full_lp = native.getLp(), full.getLp()
+    cols = {name: i for i, name in enumerate(full_lp.col_names_)}
+    rows = {name: i for i, name in enumerate(full_lp.row_names_)}
+    missing = [name for name in native_lp.col_names_ if name not in cols] + [name for name in native_lp.row_names_ if name not in rows]
+    if missing:
+        return [f"{glpk_lp_file} does not have {', '.join(missing[:5])}"]
+
+    differences = []
+    objective = native.getInfo().objective_function_value
+    expected = full.getInfo().objective_function_value
+    if abs(objective - expected) > tolerance * max(1.0, abs(expected)):
+        differences.append(f"The objective value of the native LP is {objective!r} instead of {expected!r}")
+
+    # slack of each native constraint at the GLPK solution
+    solution = full.getSolution()
+    x = np.array(solution.col_value)[[cols[name] for name in native_lp.col_names_]]
+    start = np.array(native_lp.a_matrix_.start_)
+    activity = np.zeros(native_lp.num_row_)
+    np.add.at(activity, np.array(native_lp.a_matrix_.index_), np.array(native_lp.a_matrix_.value_) * np.repeat(x, np.diff(start)))
+    slack = np.minimum(activity - np.array(native_lp.row_lower_), np.array(native_lp.row_upper_) - activity)
+    index = [rows[name] for name in native_lp.row_names_]
+    full_activity = np.array(solution.row_value)[index]
+    expected_slack = np.minimum(full_activity - np.array(full_lp.row_lower_)[index], np.array(full_lp.row_upper_)[index] - full_activity)
+    wrong = np.abs(slack - expected_slack) > tolerance * np.maximum(1.0, np.abs(expected_slack))
+    if wrong.any():
+        names = [native_lp.row_names_[i] for i in np.flatnonzero(wrong)[:5]]
+        differences.append(f"{int(wrong.sum())} constraints have another slack than in {glpk_lp_file}, ie. {', '.join(names)}")
+    return differences
+
+def check_model_file(osemosys_file: str, datafile: str, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], lp_file: str) -> List[str]:
+    """Checks that the builder builds the same model as glpsol does from a model file
+
+    The constraint names are compared with get_formulation_differences(), and
+    the equations by building the LP of the data with both, see
+    get_equation_differences(). Needs glpsol and the optional highspy
+    package, and the check fails if either is missing.
+
+    Args:
+        osemosys_file: str
+            GNU MathProg OSeMOSYS model
+        datafile: str
+            GNU MathProg datafile of data, as passed to glpsol
+        data: Dict[str, pd.DataFrame]
+            otoole data
+        defaults: Dict[str, float]
+            otoole default values
+        lp_file: str
+            LP file glpsol writes
+
+    Returns:
+        List[str]
+            Description of each difference, empty if the builder builds the
+            same model
+    """
+    differences = get_formulation_differences(osemosys_file)
+    if differences:
+        return differences
+    unsupported = get_unsupported_features(data, defaults)
+    if unsupported:
+        return [f"The model uses {', '.join(unsupported)}, which the native builder does not support"]
+    if shutil.which("glpsol") is None:
+        return [f"glpsol is needed to check the equations of {osemosys_file}"]
+    if importlib.util.find_spec("highspy") is None:
+        return [f"highspy is needed to check the equations of {osemosys_file}"]
+
+    if Path(lp_file).exists():
+        Path(lp_file).unlink()
+    if solve.create_lp(datafile, lp_file, osemosys_file) != 0:
+        return [f"glpsol can not write the lp of {datafile} with {osemosys_file}"]
+    try:
+        lp = build(data, defaults)
+    except ValueError as e:
+        return [f"The native builder can not build {datafile}: {e}"]
+    return get_equation_differences(lp, lp_file)
+
+def get_discount_factors(data: Dict[str, pd.DataFrame], defaults: Dict[str, float], keys: pd.DataFrame, first_year: int, offset: float = 0.0) -> np.ndarray:
+    """Gets (1 + DiscountRate) ^ (YEAR - first year + offset) for each row of keys"""
+    discount_rate = get_param(data, defaults, "DiscountRate", keys)
+    return (1 + discount_rate) ** (keys["YEAR"].to_numpy(dtype=float) - first_year + offset)
+
+def get_annualised_capital_factors(data: Dict[str, pd.DataFrame], defaults: Dict[str, float], keys: pd.DataFrame) -> np.ndarray:
+    """Gets CapitalRecoveryFactor * PvAnnuity of each REGION and TECHNOLOGY in keys
+
+    Both are one if the technology discount rate equals the discount rate.
+    """
+    op_life = get_param(data, defaults, "OperationalLife", keys)
+    discount_rate = get_param(data, defaults, "DiscountRate", keys)
+    if "DiscountRateIdv" in data or "DiscountRateIdv" in defaults:
+        discount_rate_idv = get_param(data, defaults, "DiscountRateIdv", keys)
+    else:
+        discount_rate_idv = discount_rate
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crf = np.where(
+            discount_rate_idv == 0,
+            1 / op_life,
+            (1 - (1 + discount_rate_idv) ** -1) / (1 - (1 + discount_rate_idv) ** -op_life)
+        )
+        pv_annuity = np.where(
+            discount_rate == 0,
+            op_life,
+            (1 - (1 + discount_rate) ** -op_life) * (1 + discount_rate) / discount_rate
+        )
+    return crf * pv_annuity
+
+
+def get_changed_params(base_data: Dict[str, pd.DataFrame], data: Dict[str, pd.DataFrame]) -> Set[str]:
+    """Gets the sets and parameters with other values in data than in base_data"""
+    changed = set()
+    for name in set(base_data) | set(data):
+        if name not in base_data or name not in data:
+            changed.add(name)
+        elif base_data[name] is not data[name] and not base_data[name].equals(data[name]):
+            changed.add(name)
+    return changed
+
+def get_model(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float]) -> Dict[str, Any]:
+    """Adds the variables of a model, and gets the sets and expressions the constraints are built from
+
+    Only depends on STRUCTURE_PARAMS
+    """
+    years = sorted(get_set(data, "YEAR"))
+    model = {
+        "years": years,
+        "first_year": years[0],
+        "last_year": years[-1],
+        "sets": {
+            "REGION": get_set(data, "REGION"),
+            "TECHNOLOGY": get_set(data, "TECHNOLOGY"),
+            "EMISSION": get_set(data, "EMISSION"),
+            "YEAR": years,
+        },
+        "timeslices": pd.DataFrame({"TIMESLICE": get_set(data, "TIMESLICE")}),
+    }
+    timeslices = model["timeslices"]
+
+    # NewCapacity[r,t,y], bounded in add_investment_limits()
+    grid = get_grid({x: model["sets"][x] for x in ["REGION", "TECHNOLOGY", "YEAR"]})
+    new_capacity = lp.add_variables("NewCapacity", grid)
+    model["grid"] = grid
+    model["new_capacity"] = new_capacity
+
+    # RateOfActivity[r,l,t,m,y] of the modes of each technology with an activity ratio
+    tech_modes = [
+        get_param_rows(data, param)[["REGION", "TECHNOLOGY", "MODE_OF_OPERATION"]]
+        for param in ["InputActivityRatio", "OutputActivityRatio", "EmissionActivityRatio"]
+        if not get_param_rows(data, param).empty
+    ]
+    # and of all modes of technologies with an activity lower limit, which
+    # activity in a mode without activity ratios counts towards in OSeMOSYS
+    lower_limits = [
+        get_param_rows(data, param)[["REGION", "TECHNOLOGY"]]
+        for param in ["TotalTechnologyAnnualActivityLowerLimit", "TotalTechnologyModelPeriodActivityLowerLimit"]
+        if not get_param_rows(data, param).empty
+    ]
+    if lower_limits:
+        modes = pd.DataFrame({"MODE_OF_OPERATION": get_set(data, "MODE_OF_OPERATION")})
+        tech_modes.append(pd.concat(lower_limits).drop_duplicates().merge(modes, how="cross"))
+    tech_modes = pd.concat(tech_modes).drop_duplicates()
+    activity_index = (
+        tech_modes
+        .merge(timeslices, how="cross")
+        .merge(pd.DataFrame({"YEAR": years}), how="cross")
+        [["REGION", "TIMESLICE", "TECHNOLOGY", "MODE_OF_OPERATION", "YEAR"]]
+    )
+    activity = lp.add_variables("RateOfActivity", activity_index)
+    activity["YEARSPLIT"] = get_param(data, defaults, "YearSplit", activity)
+    model["activity"] = activity
+    model["active_techs"] = tech_modes[["REGION", "TECHNOLOGY"]].drop_duplicates()
+
+    # total capacity in each year, as the new capacity of earlier years still in operation plus residual capacity
+    op_life = get_param(data, defaults, "OperationalLife", new_capacity)
+    capacity = (
+        new_capacity
+        .assign(BUILD_YEAR=new_capacity["YEAR"], OPERATIONAL_LIFE=op_life)
+        .drop(columns=["YEAR"])
+        .merge(pd.DataFrame({"YEAR": years}), how="cross")
+    )
+    model["capacity"] = capacity.loc[
+        (capacity["YEAR"] >= capacity["BUILD_YEAR"])
+        & (capacity["YEAR"] - capacity["BUILD_YEAR"] < capacity["OPERATIONAL_LIFE"])
+    ][["REGION", "TECHNOLOGY", "YEAR", "COL"]].reset_index(drop=True)
+
+    # production and use of each fuel, per unit of activity in a timeslice
+    flows = []
+    for param, sign in [("OutputActivityRatio", 1), ("InputActivityRatio", -1)]:
+        ratio = get_param_rows(data, param)
+        if ratio.empty:
+            continue
+        flow = activity.merge(ratio, on=["REGION", "TECHNOLOGY", "MODE_OF_OPERATION", "YEAR"])
+        flows.append(flow.assign(RATIO=flow["VALUE"], SIGN=sign).drop(columns=["VALUE"]))
+    if flows:
+        flows = pd.concat(flows, ignore_index=True)
+    else:
+        flows = activity.assign(FUEL=None, RATIO=0.0, SIGN=1).iloc[:0]
+    model["flows"] = flows
+    model["production"] = flows.loc[flows["SIGN"] == 1]
+
+    ratio = get_param_rows(data, "EmissionActivityRatio")
+    if ratio.empty:
+        model["emissions"] = activity.assign(EMISSION=None, RATIO=0.0).iloc[:0]
+    else:
+        model["emissions"] = activity.merge(ratio, on=["REGION", "TECHNOLOGY", "MODE_OF_OPERATION", "YEAR"]).rename(columns={"VALUE": "RATIO"})
+
+    # DiscountedSalvageValue[r,t,y] of capacity that outlives the model period
+    salvage = new_capacity.assign(OPERATIONAL_LIFE=op_life)
+    salvage = salvage.loc[salvage["YEAR"] + salvage["OPERATIONAL_LIFE"] - 1 > model["last_year"]].reset_index(drop=True)
+    model["salvage"] = salvage
+    model["discounted_salvage"] = lp.add_variables("DiscountedSalvageValue", salvage[["REGION", "TECHNOLOGY", "YEAR"]])
+
+    model["total_cost"] = lp.add_variables("TotalDiscountedCost", get_grid({"REGION": model["sets"]["REGION"], "YEAR": years}))
+    lp.add_objective(model["total_cost"].assign(COEF=1.0))
+    return model
+
+def get_residual_capacity(data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> pd.DataFrame:
+    return model["grid"].assign(RESIDUAL=get_param(data, defaults, "ResidualCapacity", model["grid"]))
+
+def add_investment_limits(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> None:
+    """NCC1, NCC2: investment limits, as bounds of NewCapacity"""
+    max_investment = get_param(data, defaults, "TotalAnnualMaxCapacityInvestment", model["grid"])
+    min_investment = get_param(data, defaults, "TotalAnnualMinCapacityInvestment", model["grid"])
+    lp.set_bounds(
+        "NewCapacity",
+        np.where(min_investment > 0, min_investment, 0.0),
+        np.where(max_investment >= 0, max_investment, np.inf)
+    )
+
+def add_capacity_adequacy(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> None:
+    """CAa4, CAb1: activity is limited by the available capacity"""
+    activity = model["activity"]
+    capacity = model["capacity"]
+    residual = get_residual_capacity(data, defaults, model)
+
+    # CAa4: in each timeslice
+    capacity_factor = model["active_techs"].merge(model["timeslices"], how="cross").merge(pd.DataFrame({"YEAR": model["years"]}), how="cross")
+    capacity_factor["FACTOR"] = (
+        get_param(data, defaults, "CapacityFactor", capacity_factor)
+        * get_param(data, defaults, "CapacityToActivityUnit", capacity_factor)
+    )
+    keys = ["REGION", "TIMESLICE", "TECHNOLOGY", "YEAR"]
+    terms = capacity.merge(capacity_factor, on=["REGION", "TECHNOLOGY", "YEAR"])
+    rhs = capacity_factor.merge(residual, on=["REGION", "TECHNOLOGY", "YEAR"])
+    lp.add_constraints(
+        "CAa4_Constraint_Capacity",
+        keys,
+        pd.concat([activity.assign(COEF=1.0), terms.assign(COEF=-terms["FACTOR"])]),
+        "<=",
+        rhs.assign(RHS=rhs["FACTOR"] * rhs["RESIDUAL"])
+    )
+
+    # CAb1: over the year, with planned maintenance
+    keys = ["REGION", "TECHNOLOGY", "YEAR"]
+    availability = capacity_factor.assign(YEARSPLIT=get_param(data, defaults, "YearSplit", capacity_factor))
+    availability["FACTOR"] = availability["FACTOR"] * availability["YEARSPLIT"]
+    availability = availability.groupby(keys, as_index=False)["FACTOR"].sum()
+    availability["FACTOR"] = availability["FACTOR"] * get_param(data, defaults, "AvailabilityFactor", availability)
+    terms = capacity.merge(availability, on=keys)
+    rhs = availability.merge(residual, on=keys)
+    lp.add_constraints(
+        "CAb1_PlannedMaintenance",
+        keys,
+        pd.concat([activity.assign(COEF=activity["YEARSPLIT"]), terms.assign(COEF=-terms["FACTOR"])]),
+        "<=",
+        rhs.assign(RHS=rhs["FACTOR"] * rhs["RESIDUAL"])
+    )
+
+def add_energy_balance(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> None:
+    """EBa11, EBb4: production meets demand and use"""
+    flows = model["flows"]
+
+    # EBa11: in each timeslice
+    keys = ["REGION", "TIMESLICE", "FUEL", "YEAR"]
+    demand = get_param_rows(data, "SpecifiedAnnualDemand")
+    if not demand.empty:
+        demand = demand.merge(model["timeslices"], how="cross")
+        demand["RHS"] = demand["VALUE"] * get_param(data, defaults, "SpecifiedDemandProfile", demand)
+        demand = demand[keys + ["RHS"]]
+    else:
+        demand = None
+    lp.add_constraints(
+        "EBa11_EnergyBalanceEachTS5",
+        keys,
+        flows.assign(COEF=flows["SIGN"] * flows["RATIO"] * flows["YEARSPLIT"]),
+        ">=",
+        demand
+    )
+
+    # EBb4: over the year, for the accumulated annual demand
+    keys = ["REGION", "FUEL", "YEAR"]
+    demand = get_param_rows(data, "AccumulatedAnnualDemand")
+    if not demand.empty:
+        terms = flows.merge(demand[keys], on=keys)
+        lp.add_constraints(
+            "EBb4_EnergyBalanceEachYear4",
+            keys,
+            terms.assign(COEF=terms["SIGN"] * terms["RATIO"] * terms["YEARSPLIT"]),
+            ">=",
+            demand.assign(RHS=demand["VALUE"])
+        )
+
+def add_capacity_limits(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> None:
+    """TCC1, TCC2: total capacity limits"""
+    keys = ["REGION", "TECHNOLOGY", "YEAR"]
+    residual = get_residual_capacity(data, defaults, model)
+    for param, name, sense in [
+        ("TotalAnnualMaxCapacity", "TCC1_TotalAnnualMaxCapacityConstraint", "<="),
+        ("TotalAnnualMinCapacity", "TCC2_TotalAnnualMinCapacityConstraint", ">="),
+    ]:
+        limit = residual.assign(LIMIT=get_param(data, defaults, param, residual))
+        limit = limit.loc[limit["LIMIT"] >= 0] if sense == "<=" else limit.loc[limit["LIMIT"] > 0]
+        if limit.empty:
+            continue
+        lp.add_constraints(
+            name,
+            keys,
+            model["capacity"].merge(limit[keys], on=keys).assign(COEF=1.0),
+            sense,
+            limit.assign(RHS=limit["LIMIT"] - limit["RESIDUAL"])
+        )
+
+def add_activity_limits(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> None:
+    """AAC2, AAC3, TAC2, TAC3: annual and model period activity limits"""
+    for param, name, sense, keys in [
+        ("TotalTechnologyAnnualActivityUpperLimit", "AAC2_TotalAnnualTechnologyActivityUpperLimit", "<=", ["REGION", "TECHNOLOGY", "YEAR"]),
+        ("TotalTechnologyAnnualActivityLowerLimit", "AAC3_TotalAnnualTechnologyActivityLowerLimit", ">=", ["REGION", "TECHNOLOGY", "YEAR"]),
+        ("TotalTechnologyModelPeriodActivityUpperLimit", "TAC2_TotalModelHorizonTechnologyActivityUpperLimit", "<=", ["REGION", "TECHNOLOGY"]),
+        ("TotalTechnologyModelPeriodActivityLowerLimit", "TAC3_TotalModelHorizonTechnologyActivityLowerLimit", ">=", ["REGION", "TECHNOLOGY"]),
+    ]:
+        limit = get_grid({x: model["sets"][x] for x in keys})
+        limit["RHS"] = get_param(data, defaults, param, limit)
+        limit = limit.loc[limit["RHS"] >= 0] if sense == "<=" else limit.loc[limit["RHS"] > 0]
+        if limit.empty:
+            continue
+        terms = model["activity"].merge(limit[keys], on=keys)
+        lp.add_constraints(name, keys, terms.assign(COEF=terms["YEARSPLIT"]), sense, limit)
+
+def add_reserve_margin(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> None:
+    """RM3: capacity tagged for the reserve margin covers the production of tagged fuels in each timeslice"""
+    tech_tags = get_param_rows(data, "ReserveMarginTagTechnology", ["REGION", "TECHNOLOGY", "YEAR"])
+    fuel_tags = get_param_rows(data, "ReserveMarginTagFuel", ["REGION", "FUEL", "YEAR"]).rename(columns={"VALUE": "TAG"})
+    if tech_tags.empty and fuel_tags.empty:
+        return
+    keys = ["REGION", "TIMESLICE", "YEAR"]
+    timeslices = model["timeslices"]
+    margin = get_grid({x: model["sets"][x] for x in ["REGION", "YEAR"]})
+    margin["MARGIN"] = get_param(data, defaults, "ReserveMargin", margin)
+
+    tech_tags = tech_tags.rename(columns={"VALUE": "TAG"})[["REGION", "TECHNOLOGY", "YEAR", "TAG"]]
+    tech_tags["FACTOR"] = tech_tags["TAG"] * get_param(data, defaults, "CapacityToActivityUnit", tech_tags)
+    capacity_terms = model["capacity"].merge(tech_tags, on=["REGION", "TECHNOLOGY", "YEAR"]).merge(timeslices, how="cross")
+    production_terms = model["production"].merge(fuel_tags[["REGION", "FUEL", "YEAR", "TAG"]], on=["REGION", "FUEL", "YEAR"]).merge(margin, on=["REGION", "YEAR"])
+    rhs = tech_tags.merge(get_residual_capacity(data, defaults, model), on=["REGION", "TECHNOLOGY", "YEAR"]).merge(timeslices, how="cross")
+    lp.add_constraints(
+        "RM3_ReserveMargin_Constraint",
+        keys,
+        pd.concat([
+            capacity_terms.assign(COEF=capacity_terms["FACTOR"]),
+            production_terms.assign(COEF=-production_terms["RATIO"] * production_terms["TAG"] * production_terms["MARGIN"]),
+        ]),
+        ">=",
+        rhs.assign(RHS=-rhs["FACTOR"] * rhs["RESIDUAL"])
+    )
+
+def add_renewable_target(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> None:
+    """RE4: production of tagged technologies is a share of the production of tagged fuels"""
+    target = get_param_rows(data, "REMinProductionTarget")
+    if target.empty:
+        return
+    keys = ["REGION", "YEAR"]
+    terms = model["production"].merge(target[keys], on=keys)
+    terms["COEF"] = terms["RATIO"] * terms["YEARSPLIT"] * (
+        get_param(data, defaults, "RETagTechnology", terms)
+        - get_param(data, defaults, "RETagFuel", terms) * get_param(data, defaults, "REMinProductionTarget", terms)
+    )
+    lp.add_constraints("RE4_EnergyConstraint", keys, terms, ">=", target.assign(RHS=0.0)[keys + ["RHS"]])
+
+def add_emission_limits(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> None:
+    """E8, E9: annual and model period emission limits"""
+    for param, exogenous, name, keys in [
+        ("AnnualEmissionLimit", "AnnualExogenousEmission", "E8_AnnualEmissionsLimit", ["REGION", "EMISSION", "YEAR"]),
+        ("ModelPeriodEmissionLimit", "ModelPeriodExogenousEmission", "E9_ModelPeriodEmissionsLimit", ["REGION", "EMISSION"]),
+    ]:
+        limit = get_grid({x: model["sets"][x] for x in keys})
+        limit["LIMIT"] = get_param(data, defaults, param, limit)
+        limit = limit.loc[limit["LIMIT"] >= 0]
+        if limit.empty:
+            continue
+        terms = model["emissions"].merge(limit[keys], on=keys)
+        lp.add_constraints(
+            name,
+            keys,
+            terms.assign(COEF=terms["RATIO"] * terms["YEARSPLIT"]),
+            "<=",
+            limit.assign(RHS=limit["LIMIT"] - get_param(data, defaults, exogenous, limit))
+        )
+
+def add_costs(lp: LinearProgram, data: Dict[str, pd.DataFrame], defaults: Dict[str, float], model: Dict[str, Any]) -> None:
+    """SV4, TDC2: discounted costs of each year"""
+    first_year, last_year = model["first_year"], model["last_year"]
+
+    # SV1 - SV4: salvage value of capacity that outlives the model period, discounted to the first year
+    salvage = model["salvage"].copy()
+    capital_cost = get_param(data, defaults, "CapitalCost", salvage) * get_annualised_capital_factors(data, defaults, salvage)
+    discount_rate = get_param(data, defaults, "DiscountRate", salvage)
+    depreciation = get_param(data, defaults, "DepreciationMethod", salvage)
+    remaining_years = last_year - salvage["YEAR"].to_numpy(dtype=float) + 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sinking_fund = 1 - ((1 + discount_rate) ** remaining_years - 1) / ((1 + discount_rate) ** salvage["OPERATIONAL_LIFE"].to_numpy(dtype=float) - 1)
+    straight_line = 1 - remaining_years / salvage["OPERATIONAL_LIFE"].to_numpy(dtype=float)
+    salvage["COEF"] = -(
+        capital_cost
+        * np.where((depreciation == 1) & (discount_rate > 0), sinking_fund, straight_line)
+        / (1 + discount_rate) ** (1 + last_year - first_year)
+    )
+    keys = ["REGION", "TECHNOLOGY", "YEAR"]
+    discounted_salvage = model["discounted_salvage"]
+    lp.add_constraints(
+        "SV4_SalvageValueDiscountedToStartYear",
+        keys,
+        pd.concat([discounted_salvage.assign(COEF=1.0), salvage]),
+        "="
+    )
+
+    # TDC2: capital, operating and emission penalty costs less salvage value
+    investment = model["new_capacity"].copy()
+    investment["COEF"] = (
+        -get_param(data, defaults, "CapitalCost", investment)
+        * get_annualised_capital_factors(data, defaults, investment)
+        / get_discount_factors(data, defaults, investment, first_year)
+    )
+
+    variable_cost = model["activity"].copy()
+    variable_cost["COEF"] = (
+        -variable_cost["YEARSPLIT"]
+        * get_param(data, defaults, "VariableCost", variable_cost)
+        / get_discount_factors(data, defaults, variable_cost, first_year, 0.5)
+    )
+
+    penalty = model["emissions"].copy()
+    penalty["COEF"] = (
+        -penalty["RATIO"] * penalty["YEARSPLIT"]
+        * get_param(data, defaults, "EmissionsPenalty", penalty)
+        / get_discount_factors(data, defaults, penalty, first_year, 0.5)
+    )
+
+    fixed_cost = get_residual_capacity(data, defaults, model)
+    fixed_cost["FACTOR"] = (
+        get_param(data, defaults, "FixedCost", fixed_cost)
+        / get_discount_factors(data, defaults, fixed_cost, first_year, 0.5)
+    )
+    fixed_terms = model["capacity"].merge(fixed_cost, on=["REGION", "TECHNOLOGY", "YEAR"])
+
+    lp.add_constraints(
+        "TDC2_TotalDiscountedCost",
+        ["REGION", "YEAR"],
+        pd.concat([
+            model["total_cost"].assign(COEF=1.0),
+            investment,
+            variable_cost,
+            penalty,
+            fixed_terms.assign(COEF=-fixed_terms["FACTOR"]),
+            discounted_salvage.assign(COEF=1.0),
+        ]),
+        "=",
+        fixed_cost.assign(RHS=fixed_cost["FACTOR"] * fixed_cost["RESIDUAL"])
+    )
+
+# sets and parameters that change the variables of a model, see get_model()
+STRUCTURE_PARAMS = {
+    "REGION", "TECHNOLOGY", "TIMESLICE", "FUEL", "EMISSION", "MODE_OF_OPERATION", "YEAR",
+    "InputActivityRatio", "OutputActivityRatio", "EmissionActivityRatio", "YearSplit", "OperationalLife",
+    "TotalTechnologyAnnualActivityLowerLimit", "TotalTechnologyModelPeriodActivityLowerLimit",
+}
+
+# blocks of constraints, in the order they are built, and the parameters each reads
+BLOCKS = [
+    (add_investment_limits, {"TotalAnnualMaxCapacityInvestment", "TotalAnnualMinCapacityInvestment"}),
+    (add_capacity_adequacy, {"CapacityFactor", "CapacityToActivityUnit", "AvailabilityFactor", "ResidualCapacity"}),
+    (add_energy_balance, {"SpecifiedAnnualDemand", "SpecifiedDemandProfile", "AccumulatedAnnualDemand"}),
+    (add_capacity_limits, {"TotalAnnualMaxCapacity", "TotalAnnualMinCapacity", "ResidualCapacity"}),
+    (add_activity_limits, {
+        "TotalTechnologyAnnualActivityUpperLimit", "TotalTechnologyAnnualActivityLowerLimit",
+        "TotalTechnologyModelPeriodActivityUpperLimit", "TotalTechnologyModelPeriodActivityLowerLimit"
+    }),
+    (add_reserve_margin, {"ReserveMargin", "ReserveMarginTagTechnology", "ReserveMarginTagFuel", "CapacityToActivityUnit", "ResidualCapacity"}),
+    (add_renewable_target, {"REMinProductionTarget", "RETagTechnology", "RETagFuel"}),
+    (add_emission_limits, {"AnnualEmissionLimit", "AnnualExogenousEmission", "ModelPeriodEmissionLimit", "ModelPeriodExogenousEmission"}),
+    (add_costs, {
+        "CapitalCost", "DiscountRate", "DiscountRateIdv", "DepreciationMethod",
+        "VariableCost", "FixedCost", "EmissionsPenalty", "ResidualCapacity"
+    }),
+]
+
+def build(data: Dict[str, pd.DataFrame], defaults: Dict[str, float]) -> LinearProgram:
+    """Builds the OSeMOSYS LP of a model
+
+    Args:
+        data: Dict[str, pd.DataFrame]
+            otoole data of the model
+        defaults: Dict[str, float]
+            otoole default values
+
+    Returns:
+        LinearProgram
+            The model
+
+    Raises:
+        UnsupportedFeatureError
+            If the model uses features the builder does not support, see
+            get_unsupported_features()
+        ValueError
+            If a constraint without variables can not be met
+    """
+    unsupported = get_unsupported_features(data, defaults)
+    if unsupported:
+        raise UnsupportedFeatureError(f"The native LP builder does not support {', '.join(unsupported)}")
+
+    lp = LinearProgram()
+    lp.model = get_model(lp, data, defaults)
+    lp.model["blocks"] = {}
+    for add_block, _ in BLOCKS:
+        lp.added = set()
+        add_block(lp, data, defaults, lp.model)
+        lp.model["blocks"][add_block.__name__] = lp.added
+
+    logger.info(f"Built an LP with {lp.num_rows} rows and {lp.num_cols} columns")
+    return lp
+
+def patch(base_lp: LinearProgram, base_data: Dict[str, pd.DataFrame], data: Dict[str, pd.DataFrame], defaults: Dict[str, float]) -> LinearProgram:
+    """Builds the OSeMOSYS LP of a model from the LP of a model with mostly the same data
+
+    Only the blocks of constraints that read a changed parameter are built
+    again, ie. a new TotalAnnualMaxCapacityInvestment only changes the bounds
+    of NewCapacity. Used for branches that share a parent, which only differ
+    by the data of their options.
+
+    Args:
+        base_lp: LinearProgram
+            LP built from base_data, see build(). Not changed
+        base_data: Dict[str, pd.DataFrame]
+            otoole data of base_lp
+        data: Dict[str, pd.DataFrame]
+            otoole data of the model
+        defaults: Dict[str, float]
+            otoole default values, the same as of base_data
+
+    Returns:
+        LinearProgram
+            The same model as build(data, defaults)
+
+    Raises:
+        StructureChangedError
+            If data changes which variables or constraints the model has, so
+            it needs to be built with build()
+        UnsupportedFeatureError
+            If the model uses features the builder does not support
+        ValueError
+            If a constraint without variables can not be met
+    """
+    unsupported = get_unsupported_features(data, defaults)
+    if unsupported:
+        raise UnsupportedFeatureError(f"The native LP builder does not support {', '.join(unsupported)}")
+
+    changed = get_changed_params(base_data, data)
+    if changed & STRUCTURE_PARAMS:
+        raise StructureChangedError(f"{', '.join(sorted(changed & STRUCTURE_PARAMS))} changed")
+
+    lp = base_lp.copy()
+    for add_block, params in BLOCKS:
+        if not changed & params:
+            continue
+        lp.added = set()
+        add_block(lp, data, defaults, lp.model)
+        if lp.added != lp.model["blocks"][add_block.__name__]:
+            raise StructureChangedError(f"{add_block.__name__} adds other constraints")
+    logger.info(f"Patched {', '.join(sorted(changed))} into an LP with {lp.num_rows} rows and {lp.num_cols} columns")
+    return lp
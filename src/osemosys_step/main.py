@@ -11,14 +11,25 @@ be indicate in the following way 'solver=gurobi'
 
 import click
 from osemosys_step import data_split as ds
+from osemosys_step import lp_builder as lb
 from osemosys_step import main_utils as mu
+from osemosys_step import results_store as rs
 from osemosys_step import (
     utils,
+    branch,
+    scheduler,
+    state,
+    cache,
+    ledger,
+    manifest,
     preprocess_data,
+    sampling,
     solve
 )
+import importlib.util
 import os
 from pathlib import Path
+from typing import Dict, List
 import pandas as pd
 import shutil
 from tqdm import tqdm
@@ -26,6 +37,7 @@ import logging
 import sys
 import glob
 import subprocess
+import time
 
 from otoole import read, write
 
@@ -49,9 +61,121 @@ def cli():
 @click.option("--input_data", required=True, default= '../data/utopia.txt',
               help="The path to the input datafile. relative from the src folder, e.g. '../data/utopia.txt'")
 @click.option("--solver", default="cbc",
-              help="Available solvers are 'glpk', 'cbc', and 'gurobi'. Default is 'cbc'")
+              help="""Available solvers are 'glpk', 'cbc', 'gurobi', 'cplex' and
+              'highs'. Default is 'cbc'. 'highs' solves in the worker process
+              and needs the optional highspy package.
+              """)
 @click.option("--cores", default=1, show_default=True,
-              help="Number of cores snakemake is allowed to use.")
+              help="Number of models that are built and solved in parallel.")
+@click.option("--executor", default="native", show_default=True,
+              type=click.Choice(["native", "snakemake"]),
+              help="""Run the solves in a native process pool or through the
+              snakefile. The snakefile is not available with --pipeline.
+              """)
+@click.option("--pipeline", is_flag=True, default=False,
+              help="""Start each branch as soon as its parent branch is solved,
+              instead of waiting for all branches of a step to finish.
+              """)
+@click.option("--resume", is_flag=True, default=False,
+              help="""Continue a previous run with the same settings from the
+              first branch that has not finished, instead of starting over.
+              """)
+@click.option("--cache_dir", default=None,
+              help="""Directory of a cache of datafiles, lp files, solutions and results.
+              Branches with identical inputs reuse cached artifacts, also
+              across runs. No cache is used if not provided.
+              """)
+@click.option("--cache_size", default=10.0, show_default=True,
+              help="Maximum size of the cache in GB.")
+@click.option("--collapse/--no-collapse", default=None,
+              help="""Only build and solve one of the branches of a step that
+              have identical input data, and copy its solution to the others.
+              On by default, not available with --pipeline.
+              """)
+@click.option("--in_memory", is_flag=True, default=False,
+              help="""Keep the data of each branch in memory and only write
+              its datafile, instead of writing CSVs for every branch. Not
+              available with --pipeline.
+              """)
+@click.option("--write_csvs", is_flag=True, default=False,
+              help="Also write the CSVs of each branch with --in_memory, for debugging.")
+@click.option("--link_data", is_flag=True, default=False,
+              help="""Link the reference data of each step into the data
+              folder of each branch, as copy on write clones where the file
+              system supports them or else as hardlinks, instead of copying
+              it. Only the parameters changed by options are written.
+              """)
+@click.option("--overlay_data", is_flag=True, default=False,
+              help="""Only write the parameters changed by options to the data
+              folder of each branch. All other parameters are read from the
+              reference data of the step.
+              """)
+@click.option("--sample", default=None,
+              type=click.Choice(sampling.SAMPLE_METHODS),
+              help="""Only run a sample of the paths through the scenario tree.
+              'uniform' picks paths at random, 'stratified' makes sure every
+              option is run and 'list' reads the paths from --sample_file.
+              """)
+@click.option("--sample_size", default=100, show_default=True,
+              help="Number of paths to sample.")
+@click.option("--sample_seed", default=0, show_default=True,
+              help="Seed of the sample, the same seed gives the same paths.")
+@click.option("--sample_file", default=None,
+              help="""File with one path per line, written as its results
+              folder, ie. '1A0-1B1/2C0'. Used with '--sample list'.
+              """)
+@click.option("--expand_top_k", default=None, type=int,
+              help="""Only expand the k branches of each step with the lowest
+              objective value into the options of the next step. Not
+              available with --pipeline.
+              """)
+@click.option("--cost_gap", default=None, type=float,
+              help="""Only expand the branches of each step whose objective
+              value is within this relative gap of the best branch, ie. 0.05
+              for 5%%. Not available with --pipeline.
+              """)
+@click.option("--max_branches_per_step", default=None, type=int,
+              help="""Maximum number of branches run in a step. Children of
+              the branches with the lowest objective value are run first.
+              Not available with --pipeline.
+              """)
+@click.option("--warm_start", is_flag=True, default=False,
+              help="""Start each solve from the basis of its parent branch, and
+              siblings from the first solved sibling. Needs cbc, gurobi,
+              cplex or highs. Not available with --pipeline.
+              """)
+@click.option("--cold_baseline", is_flag=True, default=False,
+              help="""With --warm_start, solve each branch a second time
+              without a start basis, to measure the solve time the warm
+              starts save. Doubles the solve time.
+              """)
+@click.option("--lp_builder", default="glpsol", show_default=True,
+              type=click.Choice(["glpsol", "native"]),
+              help="""Build the lp files with glpsol, or natively from the
+              branch data. Models with storage, trade, technology units or
+              user defined constraints are always built with glpsol, as are
+              all models if the native builder does not build the same lp as
+              glpsol from model/osemosys.txt for the first step. The check
+              needs the optional highspy package.
+              """)
+@click.option("--patch_lps", is_flag=True, default=False,
+              help="""Build the lp of one branch per parent with --lp_builder
+              native, and patch the lps of its siblings with their option
+              data. Not available with --pipeline.
+              """)
+@click.option("--defer_results", is_flag=True, default=False,
+              help="""Only read the new capacity passed on to the next step
+              from each solution while running, and convert and save the
+              full results of all branches at the end. Not available with
+              --pipeline or --solver glpk.
+              """)
+@click.option("--results_store", default="csv", show_default=True,
+              type=click.Choice(["csv", "parquet"]),
+              help="""File format the results of each branch are stored in
+              under steps/results_store, until they are written to the result
+              CSVs of every path at the end of the run. 'parquet' needs the
+              optional pyarrow package.
+              """)
 @click.option("--foresight", default=None,
               help="""Allows the user to indicated the number of years of foresight,
                 i.e., beyond the years in a step.
@@ -61,21 +185,62 @@ def cli():
               saved elsewhere than '../data/scenarios/' on can use this option to
               indicate the path.
               """)
-def run(input_data: str, step_length: int, path_param: str, cores: int, solver=None, foresight=None):
+def run(input_data: str, step_length: int, path_param: str, cores: int, executor: str, pipeline: bool, resume: bool, cache_dir: str, cache_size: float, collapse: bool, in_memory: bool, write_csvs: bool, link_data: bool, overlay_data: bool, sample: str, sample_size: int, sample_seed: int, sample_file: str, expand_top_k: int, cost_gap: float, max_branches_per_step: int, warm_start: bool, cold_baseline: bool, lp_builder: str, patch_lps: bool, defer_results: bool, results_store: str, solver=None, foresight=None):
     """Main entry point for workflow"""
 
     ##########################################################################
     # Check for needed software
     ##########################################################################
 
-    # GLPK is needed for the generation of lp file. Hence, it is always needed for running OSeMOSYS_step.
-    try:
-        cmd = f"glpsol --help"
-        subprocess.run(cmd, shell = True)
-    except:
-        logger.error(f"Can't call GLPK. Make sure GLPK is installed on your computer.")
-        print("Can't call GLPK. Make sure GLPK is installed on your computer.")
-        sys.exit()
+    if sample == "list" and not sample_file:
+        raise click.UsageError("--sample list needs a --sample_file")
+
+    rank_branches = expand_top_k is not None or cost_gap is not None or max_branches_per_step is not None
+
+    # options the pipelined scheduler does not honor, see scheduler.run_tree()
+    if pipeline:
+        unsupported = {
+            "--collapse": collapse,
+            "--in_memory": in_memory,
+            "--patch_lps": patch_lps,
+            "--defer_results": defer_results,
+            "--expand_top_k, --cost_gap, --max_branches_per_step": rank_branches,
+            "--warm_start": warm_start,
+            "--executor snakemake": executor == "snakemake",
+        }
+        used = [name for name, value in unsupported.items() if value]
+        if used:
+            raise click.UsageError(f"{', '.join(used)} can not be combined with --pipeline")
+    elif collapse is None:
+        collapse = True
+
+    if solver == "highs" and executor == "snakemake":
+        raise click.UsageError("--solver highs can not be combined with --executor snakemake")
+
+    if warm_start and solver not in solve.WARM_START_SOLVERS:
+        raise click.UsageError(f"--warm_start is only supported for {solve.WARM_START_SOLVERS}")
+
+    if warm_start and executor == "snakemake":
+        raise click.UsageError("--warm_start can not be combined with --executor snakemake")
+
+    if cold_baseline and not warm_start:
+        raise click.UsageError("--cold_baseline needs --warm_start")
+
+    if lp_builder == "native" and solver == "glpk":
+        raise click.UsageError("--lp_builder native can not be combined with --solver glpk")
+
+    if patch_lps and lp_builder != "native":
+        raise click.UsageError("--patch_lps needs --lp_builder native")
+
+    if defer_results and solver == "glpk":
+        raise click.UsageError("--defer_results can not be combined with --solver glpk")
+
+    if results_store == "parquet":
+        if importlib.util.find_spec("pyarrow") is None:
+            raise click.UsageError("--results_store parquet needs pyarrow, install it with 'pip install pyarrow'")
+
+    if link_data and overlay_data:
+        raise click.UsageError("--link_data can not be combined with --overlay_data")
 
     ##########################################################################
     # Setup directories
@@ -89,48 +254,89 @@ def run(input_data: str, step_length: int, path_param: str, cores: int, solver=N
     model_dir = Path("model")
     logs_dir = Path("logs")
 
-    for f in glob.glob(str(logs_dir / "*.log")):
-        os.remove(f)
+    # Create scenarios folder
+    if path_param:
+        scenario_dir = Path(path_param)
+    else:
+        scenario_dir = Path(data_dir, "scenarios")
+
+    # format step length
+    step_length = utils.format_step_input(step_length)
+
+    # check if a previous run can be continued
+    if not step_dir.exists():
+        step_dir.mkdir()
+    run_state = state.RunState(str(step_dir))
+    run_settings = {
+        "input_data": str(input_data),
+        "step_length": step_length,
+        "foresight": foresight,
+        "scenario_dir": str(scenario_dir),
+        "solver": solver,
+        "sample": [sample, sample_size, sample_seed, sample_file],
+        "expand": [expand_top_k, cost_gap, max_branches_per_step],
+        "defer_results": defer_results,
+        "results_store": results_store,
+        "lp_builder": [lp_builder, patch_lps],
+        "data_layout": [in_memory, write_csvs, link_data, overlay_data],
+        "cache": [cache_dir, cache_size],
+        "warm_start": [warm_start, cold_baseline],
+        "collapse": collapse,
+    }
+    resuming = resume and run_state.can_resume(run_settings)
+    if resume and not resuming:
+        logger.warning("Can not resume previous run, starting a new run")
+
+    if not resuming:
+        for f in glob.glob(str(logs_dir / "*.log")):
+            os.remove(f)
     logging.basicConfig(filename=str(Path(logs_dir, "log.log")), level=logging.WARNING)
 
+    # GLPK is needed to generate the lp files with glpsol, to check the model
+    # file for the native lp builder, and to solve with glpk
+    if shutil.which("glpsol") is None:
+        raise click.UsageError("Can't call GLPK. Make sure GLPK is installed on your computer.")
+
     ##########################################################################
     # Remove previous run data
     ##########################################################################
 
-    for dir in glob.glob(str(data_dir / "data*/")):
-        # remove both "data/" and "data_*/" folders
-        shutil.rmtree(dir)
-    utils.check_for_directory(Path(data_dir, "data"))
+    if not resuming:
+
+        # pathlib drops the trailing slash of "*/", so the patterns also match
+        # files, ie. the input datafile or steps/settings.json
+        for dir in glob.glob(str(data_dir / "data*/")):
+            # remove both "data/" and "data_*/" folders
+            if Path(dir).is_dir():
+                shutil.rmtree(dir)
+        utils.check_for_directory(Path(data_dir, "data"))
 
-    for dir in glob.glob(str(data_dir / "step_*/")):
-        shutil.rmtree(dir)
+        for dir in glob.glob(str(data_dir / "step_*/")):
+            if Path(dir).is_dir():
+                shutil.rmtree(dir)
 
-    for dir in glob.glob(str(results_dir / "*/")):
-        shutil.rmtree(dir)
+        for dir in glob.glob(str(results_dir / "*/")):
+            if Path(dir).is_dir():
+                shutil.rmtree(dir)
 
-    for dir in glob.glob(str(step_dir / "*/")):
-        shutil.rmtree(dir)
+        for dir in glob.glob(str(step_dir / "*/")):
+            if Path(dir).is_dir():
+                shutil.rmtree(dir)
 
-    if Path(logs_dir, "solves").exists():
-        shutil.rmtree(str(Path(logs_dir, "solves")))
+        if Path(logs_dir, "solves").exists():
+            shutil.rmtree(str(Path(logs_dir, "solves")))
+
+        run_state.reset(run_settings)
 
     ##########################################################################
     # Setup data and folder structure
     ##########################################################################
 
-    # Create scenarios folder
-    if path_param:
-        scenario_dir = Path(path_param)
-    else:
-        scenario_dir = Path(data_dir, "scenarios")
-
-    # format step length
-    step_length = utils.format_step_input(step_length)
-
     # Create folder of csvs from datafile
     otoole_csv_dir = Path(data_dir, "data")
     otoole_config_path = Path(data_dir, "otoole_config.yaml")
-    utils.datafile_to_csv(str(input_data), str(otoole_csv_dir), otoole_config_path)
+    if not resuming:
+        utils.datafile_to_csv(str(input_data), str(otoole_csv_dir), otoole_config_path)
 
     # get step length parameters
     otoole_data, otoole_defaults = read(otoole_config_path, "csv", str(otoole_csv_dir))
@@ -139,12 +345,6 @@ def run(input_data: str, step_length: int, path_param: str, cores: int, solver=N
     else:
         actual_years_per_step, modelled_years_per_step, num_steps = ds.split_data(otoole_data, step_length)
 
-    # write out original parsed step data
-    for step, years_per_step in modelled_years_per_step.items():
-        step_data = ds.get_step_data(otoole_data, years_per_step)
-        write(otoole_config_path, "csv", str(Path(data_dir, f"data_{step}")), step_data, otoole_defaults)
-        logger.info(f"Wrote data for step {step}")
-
     # dictionary for steps with new scenarios
     steps = mu.get_step_data(str(scenario_dir)) # returns Dict[int, Dict[str, pd.DataFrame]]
 
@@ -153,157 +353,349 @@ def run(input_data: str, step_length: int, path_param: str, cores: int, solver=N
     step_options = mu.add_missing_steps(step_options, num_steps)
     step_options = mu.append_step_num_to_option(step_options)
 
-    # create option directores in data/
-    mu.create_option_directories(str(data_dir), step_options, step_directories=True)
+    if resuming:
+        print("Resuming previous run")
+    else:
+        setup_data(
+            data_dir=data_dir,
+            results_dir=results_dir,
+            otoole_config_path=otoole_config_path,
+            otoole_data=otoole_data,
+            otoole_defaults=otoole_defaults,
+            step_options=step_options,
+            modelled_years_per_step=modelled_years_per_step,
+            in_memory=in_memory and not write_csvs
+        )
+        run_state.mark_setup()
+
+    # the native lp builder implements the equations of the OSeMOSYS model
+    # instead of reading the model file, so it is only used if it builds the
+    # same lp as glpsol does from the model file
+    if lp_builder == "native":
+        differences = check_lp_builder(
+            step_dir=step_dir,
+            osemosys_file=Path(model_dir, "osemosys.txt"),
+            otoole_config_path=otoole_config_path,
+            otoole_data=otoole_data,
+            otoole_defaults=otoole_defaults,
+            years=modelled_years_per_step[min(modelled_years_per_step)]
+        )
+        if differences:
+            msg = f"{'; '.join(differences)}. Building the lp files with glpsol instead of --lp_builder native"
+            logger.warning(msg)
+            print(msg)
+            lp_builder = "glpsol"
+            patch_lps = False
 
-    # create option directories in steps/
-    if not step_dir.exists():
-        step_dir.mkdir()
-    mu.create_option_directories(str(step_dir), step_options, step_directories=True)
+    ##########################################################################
+    # Loop over steps
+    ##########################################################################
 
-    # create option directories in results/
-    if not results_dir.exists():
-        results_dir.mkdir()
-    mu.create_option_directories(str(results_dir), step_options, step_directories=False)
-    if not utils.check_for_subdirectory(results_dir):
-        all_res_dir = Path(results_dir, 'the_scen')
-        all_res_dir.mkdir(exist_ok=True)
+    if sample:
+        if sample == "uniform":
+            paths = sampling.sample_uniform(step_options, sample_size, sample_seed)
+        elif sample == "stratified":
+            paths = sampling.sample_stratified(step_options, sample_size, sample_seed)
+        else:
+            try:
+                paths = sampling.read_paths(sample_file, step_options)
+            except ValueError as e:
+                raise click.BadParameter(str(e), param_hint="--sample_file") from e
+        csv_dirs = sampling.get_option_combinations_per_step(step_options, paths)
+        msg = (
+            f"Running {len(paths)} of {sampling.get_num_paths(step_options)} paths, "
+            f"{sum(len(options) for options in csv_dirs.values())} branches"
+        )
+        logger.info(msg)
+        print(msg)
+    else:
+        csv_dirs = mu.get_option_combinations_per_step(step_options)
+
+    osemosys_file = Path(model_dir, "osemosys.txt")
+    solve_log_dir = Path(logs_dir, "solves")
+    ledger_dir = Path(step_dir, "ledger")
+    store_dir = Path(step_dir, "results_store")
+
+    option_data_by_param = mu.get_param_data_per_option(mu.get_option_data_per_step(steps))
+
+    # branches of the scenario tree and the folders of each branch
+    children = scheduler.get_branch_children(scheduler.get_branches_per_step(csv_dirs))
+    run_manifest = manifest.RunManifest(str(step_dir), children, str(data_dir), str(step_dir), str(results_dir), str(solve_log_dir))
+    if not resuming:
+        run_manifest.reset()
+
+    if pipeline:
+        settings = {
+            "data_dir": str(data_dir),
+            "step_dir": str(step_dir),
+            "results_dir": str(results_dir),
+            "log_dir": str(solve_log_dir),
+            "ledger_dir": str(ledger_dir),
+            "osemosys_file": str(osemosys_file),
+            "otoole_config": str(otoole_config_path),
+            "solver": solver,
+            "num_steps": num_steps,
+            "actual_years_per_step": actual_years_per_step,
+            "modelled_years_per_step": modelled_years_per_step,
+            "option_data_by_param": option_data_by_param,
+            "cache_dir": cache_dir,
+            "cache_size": cache_size,
+            "lp_builder": lp_builder,
+            "results_store": str(store_dir),
+            "results_format": results_store,
+            "link_data": link_data,
+            "overlay_data": overlay_data,
+        }
+        scheduler.run_tree(csv_dirs, settings, run_manifest, cores, run_state)
+        rs.ResultsStore(str(store_dir), results_store).export_csv(str(results_dir), get_result_options(run_manifest, step_options))
+        return
+
+    if in_memory:
+        step_data = {
+            step: ds.get_step_data(otoole_data, years)
+            for step, years in modelled_years_per_step.items()
+        }
+        csv_dir = data_dir if write_csvs else None
+
+    # capacity passed on by each solved branch
+    res_cap_ledger = ledger.ResidualCapacityLedger(str(ledger_dir))
+
+    # results of each branch, written to the result folders at the end
+    store = rs.ResultsStore(str(store_dir), results_store)
+
+    if cache_dir:
+        artifact_cache = cache.ArtifactCache(cache_dir, cache_size)
+    else:
+        artifact_cache = None
 
-    # copy over step/scenario/option data
-    mu.copy_reference_option_data(src_dir=data_dir, dst_dir=data_dir, options_per_step=step_options)
+    # parent of each branch, a branch is only created once its parent is solved
+    parents = scheduler.get_branch_parents(children)
 
-    ##########################################################################
-    # Apply options to input data
-    ##########################################################################
+    # branches selected for expansion per step, best first. All branches are expanded if not ranked
+    expanded = {}
 
-    step_option_data = mu.get_option_data_per_step(steps) # {int, Dict[str, pd.DataFrame]}
-    option_data_by_param = mu.get_param_data_per_option(step_option_data) # Dict[str, Dict[str, pd.DataFrame]]
+    phase_times = [] # [step, phase, number of branches, seconds]
+    warm_starts = [] # [step, branch, start, seconds, cold seconds]
 
-    for step_num in range(0, num_steps + 1):
+    for step, options in tqdm(csv_dirs.items(), total=len(csv_dirs), desc="Building and Solving Models", bar_format='{l_bar}{bar:10}{r_bar}{bar:-10b}'):
 
-        step_dir_number = Path(data_dir, f"step_{step_num}")
+        # a step without options is a single branch
+        branches = options if options else [[]]
 
-        # get grouped list of options to apply - ie. [A0-B1, C0]
+        # skip branches below failed branches
+        branches = [
+            option for option in branches
+            if (step, tuple(option)) not in parents
+            or run_manifest.is_created(*parents[(step, tuple(option))])
+        ]
 
-        for option_dir in utils.get_subdirectories(str(step_dir_number)):
-            grouped_options_to_apply = Path(option_dir).parts
-            parsed_options_to_apply = []
+        # skip branches below branches that are not expanded
+        branches = [
+            option for option in branches
+            if (step, tuple(option)) not in parents
+            or parents[(step, tuple(option))][0] not in expanded
+            or parents[(step, tuple(option))][1] in expanded[parents[(step, tuple(option))][0]]
+        ]
+        if max_branches_per_step is not None and len(branches) > max_branches_per_step:
+            def get_parent_rank(option):
+                parent_step, parent_option = parents.get((step, tuple(option)), (None, None))
+                if parent_step not in expanded:
+                    return 0
+                return expanded[parent_step].index(parent_option)
+            logger.info(f"Step {step}: running {max_branches_per_step} of {len(branches)} branches")
+            branches = sorted(branches, key=get_parent_rank)[:max_branches_per_step]
+
+        if not branches:
+            continue
 
-            # get parsed list of options to apply - ie. [A0, B1, C0]
+        # stages finished by a previous run
+        done_stages = {
+            tuple(option): run_state.get_done_stages(step, option, step_dir, solver, store, res_cap_ledger, num_steps)
+            for option in branches
+        }
 
-            for grouped_option_to_apply in grouped_options_to_apply:
-                if grouped_option_to_apply in ["..", "data", f"step_{step_num}"]:
-                    continue
-                parsed_options = grouped_option_to_apply.split("-")
-                for parsed_option_to_apply in parsed_options:
-                    parsed_options_to_apply.append(parsed_option_to_apply)
+        ######################################################################
+        # Create branches
+        ######################################################################
 
-            #  at this point, parsed_options_to_apply = [A0, B1, C0]
+        start_time = time.perf_counter()
+        new_options = [option for option in branches if "data" not in done_stages[tuple(option)]]
+        exit_codes = branch.map_branches(
+            branch.materialize_branch, step, new_options, cores,
+            data_dir, step_dir, option_data_by_param, modelled_years_per_step[step], in_memory, link_data, overlay_data
+        )
+        for option, exit_code in zip(new_options, exit_codes):
+            if exit_code == 0:
+                run_manifest.mark_created(step, option)
+        phase_times.append([step, "branches", len(new_options), time.perf_counter() - start_time])
+
+        # residual capacity including the capacity passed on from previous steps
+        if in_memory:
+            branch_data = {}
+            for option in branches:
+                res_cap = branch.get_branch_param(
+                    step_data[step], option, option_data_by_param, modelled_years_per_step[step], "ResidualCapacity"
+                ).reset_index()
+                branch_data[tuple(option)] = branch.get_branch_data(
+                    step_data[step],
+                    option,
+                    option_data_by_param,
+                    modelled_years_per_step[step],
+                    res_cap_ledger.get_res_capacity(step, option, res_cap, modelled_years_per_step[step])
+                )
+        else:
+            res_caps = {
+                tuple(option): branch.get_branch_res_capacity(step, option, data_dir, res_cap_ledger, modelled_years_per_step[step])
+                for option in branches
+                if not {"data", "solved"} <= done_stages[tuple(option)]
+            }
 
-            for option_to_apply in parsed_options_to_apply:
-                for param, param_data in option_data_by_param[option_to_apply].items():
-                    path_to_data = Path(option_dir, f"{param}.csv")
-                    original = pd.read_csv(path_to_data)
-                    param_data_year_filtered = param_data.loc[param_data["YEAR"].isin(modelled_years_per_step[step_num])].reset_index(drop=True)
-                    new = mu.apply_option_data(original, param_data_year_filtered)
-                    new.to_csv(path_to_data, index=False)
+        ######################################################################
+        # Find branches with identical inputs
+        ######################################################################
 
-    ##########################################################################
-    # Loop over steps
-    ##########################################################################
+        input_keys = {}
+        duplicates = {} # {branch: branch with identical inputs that is solved}
 
-    csv_dirs = mu.get_option_combinations_per_step(step_options)
+        if collapse or artifact_cache:
+            representatives = {}
+            key_settings = branch.get_key_settings(lp_builder, warm_start, cold_baseline)
+            for option in branches:
+                if "solved" in done_stages[tuple(option)] or not run_manifest.is_created(step, option):
+                    continue
+                if in_memory:
+                    input_key = branch.get_data_key(branch_data[tuple(option)], otoole_config_path, osemosys_file, solver, key_settings)
+                else:
+                    input_key = branch.get_cache_key(step, option, data_dir, otoole_config_path, osemosys_file, solver, res_caps[tuple(option)], key_settings)
+                input_keys[tuple(option)] = input_key
+                if not collapse:
+                    continue
+                if input_key in representatives:
+                    duplicates[tuple(option)] = representatives[input_key]
+                else:
+                    representatives[input_key] = option
 
-    for step, options in tqdm(csv_dirs.items(), total=len(csv_dirs), desc="Building and Solving Models", bar_format='{l_bar}{bar:10}{r_bar}{bar:-10b}'):
+        if duplicates:
+            msg = (
+                f"Step {step}: {len(duplicates)} of {len(branches)} branches have the same inputs "
+                f"as another branch, building and solving {len(input_keys) - len(duplicates)} models"
+            )
+            logger.info(msg)
+            tqdm.write(msg)
+
+        ######################################################################
+        # Restore cached artifacts
+        ######################################################################
+
+        cache_keys = {}
+        cached_results = set() # branches with result CSVs restored from the cache
+
+        if artifact_cache:
+            for option in branches:
+                if tuple(option) not in input_keys or tuple(option) in duplicates:
+                    continue
+                cache_key = input_keys[tuple(option)]
+                if artifact_cache.restore(cache_key, str(run_manifest.get(step, option).path)):
+                    for stage in ["data", "lp", "solved"]:
+                        if stage not in done_stages[tuple(option)]:
+                            run_state.mark(step, option, stage)
+                            done_stages[tuple(option)].add(stage)
+                    if run_manifest.get(step, option).artifacts["results"].exists():
+                        cached_results.add(tuple(option))
+                else:
+                    cache_keys[tuple(option)] = cache_key
 
         ######################################################################
         # Create Datafile
         ######################################################################
 
-        if not options:
-            csvs = Path(data_dir, f"step_{step}")
-            data_file = Path(step_dir, f"step_{step}", "data.txt")
-            data_file_pp = Path(step_dir, f"step_{step}", "data_pp.txt")
-            mu.create_datafile(csvs, data_file, otoole_config_path)
-            preprocess_data.main("otoole", str(data_file), str(data_file_pp))
+        start_time = time.perf_counter()
+        data_options = [
+            option for option in branches
+            if "data" not in done_stages[tuple(option)] and tuple(option) not in duplicates
+        ]
+        if in_memory:
+            exit_codes = branch.map_branches(
+                branch.create_datafile_from_data, step, data_options, cores,
+                step_dir, otoole_config_path, otoole_defaults, csv_dir,
+                per_branch_args=[(branch_data[tuple(option)],) for option in data_options]
+            )
         else:
-            for option in options:
-                csvs = Path(data_dir, f"step_{step}")
-                data_file = Path(step_dir, f"step_{step}")
-                for each_option in option:
-                    csvs = csvs.joinpath(each_option)
-                    data_file = data_file.joinpath(each_option)
-                if not data_file.exists():
-                    logger.warning(f"{str(data_file)} not created")
-                    # failed = True
-                else:
-                    data_file_pp = data_file.joinpath("data_pp.txt") # preprocessed
-                    data_file = data_file.joinpath("data.txt") # need non-preprocessed for otoole results
-                    mu.create_datafile(csvs, data_file, otoole_config_path)
-                    preprocess_data.main("otoole", str(data_file), str(data_file_pp))
+            exit_codes = branch.map_branches(
+                branch.create_datafile, step, data_options, cores,
+                data_dir, step_dir, otoole_config_path,
+                per_branch_args=[(res_caps[tuple(option)], overlay_data) for option in data_options]
+            )
+        for option, exit_code in zip(data_options, exit_codes):
+            if exit_code == 0:
+                run_state.mark(step, option, "data")
+        phase_times.append([step, "datafile", len(data_options), time.perf_counter() - start_time])
 
         ######################################################################
         # Create LP file
         ######################################################################
 
-        osemosys_file = Path(model_dir, "osemosys.txt")
+        start_time = time.perf_counter()
+        lp_options = [
+            option for option in branches
+            if "lp" not in done_stages[tuple(option)] and tuple(option) not in duplicates
+            and run_manifest.is_created(step, option)
+        ]
+        if patch_lps:
+            siblings = {}
+            for option in lp_options:
+                siblings.setdefault(tuple(branch.get_parent_option(step, option)), []).append(option)
+            groups = list(siblings.values())
+            if in_memory:
+                per_group_args = [(None, [branch_data[tuple(x)] for x in group], otoole_defaults) for group in groups]
+            else:
+                per_group_args = [([res_caps[tuple(x)] for x in group], None, None, overlay_data) for group in groups]
+            group_exit_codes = branch.map_branches(
+                branch.create_sibling_lps, step, groups, cores,
+                data_dir, step_dir, otoole_config_path, osemosys_file, solve_log_dir,
+                per_branch_args=per_group_args
+            )
+            # a group that raised counts as failed for all its branches
+            exit_codes = {}
+            for group, codes in zip(groups, group_exit_codes):
+                if isinstance(codes, int):
+                    codes = [codes] * len(group)
+                exit_codes.update({tuple(x): code for x, code in zip(group, codes)})
+            exit_codes = [exit_codes[tuple(option)] for option in lp_options]
+        elif lp_builder == "native" and in_memory:
+            exit_codes = branch.map_branches(
+                branch.create_lp_native, step, lp_options, cores,
+                data_dir, step_dir, otoole_config_path, osemosys_file, solve_log_dir,
+                per_branch_args=[(None, branch_data[tuple(option)], otoole_defaults) for option in lp_options]
+            )
+        elif lp_builder == "native":
+            exit_codes = branch.map_branches(
+                branch.create_lp_native, step, lp_options, cores,
+                data_dir, step_dir, otoole_config_path, osemosys_file, solve_log_dir,
+                per_branch_args=[(res_caps[tuple(option)], None, None, overlay_data) for option in lp_options]
+            )
+        else:
+            exit_codes = branch.map_branches(branch.create_lp, step, lp_options, cores, step_dir, osemosys_file, solve_log_dir)
         failed_lps = []
-
-        if not options:
-            lp_file = Path(step_dir, f"step_{step}", "model.lp")
-            datafile = Path(step_dir, f"step_{step}", "data_pp.txt")
-            lp_log_dir = Path("logs", "solves", f"step_{step}")
-            lp_log_dir.mkdir(parents=True, exist_ok=True)
-            lp_log_file = Path(lp_log_dir,"lp.log")
-
-            exit_code = solve.create_lp(str(datafile), str(lp_file), str(osemosys_file), str(lp_log_file))
+        for option, exit_code in zip(lp_options, exit_codes):
             if exit_code == 1:
-                logger.error(f"{str(lp_file)} could not be created")
-                failed_lps.append(lp_file)
-        else:
-            for option in options:
-                lp_file = Path(step_dir, f"step_{step}")
-                datafile = Path(step_dir, f"step_{step}")
-                lp_log_dir = Path("logs", "solves", f"step_{step}")
-                lp_log_file = Path(lp_log_dir,"lp.log")
-                for each_option in option:
-                    lp_file = lp_file.joinpath(each_option)
-                    datafile = datafile.joinpath(each_option)
-                    lp_log_dir = lp_log_dir.joinpath(each_option)
-                lp_file = lp_file.joinpath("model.lp")
-                datafile = datafile.joinpath("data_pp.txt")
-                lp_log_dir.mkdir(parents=True, exist_ok=True)
-                lp_log_file = Path(lp_log_dir,"lp.log")
-                exit_code = solve.create_lp(str(datafile), str(lp_file), str(osemosys_file), str(lp_log_file))
-                if exit_code == 1:
-                    logger.error(f"{str(lp_file)} could not be created")
-                    failed_lps.append(lp_file)
+                failed_lps.append(option)
+            else:
+                run_state.mark(step, option, "lp")
+        phase_times.append([step, "lp", len(lp_options), time.perf_counter() - start_time])
 
         ######################################################################
         # Remove failed builds
         ######################################################################
 
-        for failed_lp in failed_lps:
-
-            # remove the step folder
-            directory_path = Path(failed_lp).parent
-            if directory_path.exists():
-                shutil.rmtree(str(directory_path))
-
-            # remove the corresponding folder in results/
-            result_options = []
-            while directory_path.name != f"step_{step}":
-                result_options.insert(0, directory_path.name)
-                directory_path = directory_path.parent
-            result_option_path = Path(results_dir).joinpath(*result_options)
-            if result_option_path == results_dir:
+        for option in failed_lps:
+            run_state.remove(step, option)
+            if run_manifest.fail(step, option):
                 logger.error("Top level run failed :(")
-                for item in result_option_path.glob('*'):
+                for item in results_dir.glob('*'):
                     if not item.name == ".gitkeep":
                         shutil.rmtree(item)
                 sys.exit()
-            elif result_option_path.exists():
-                shutil.rmtree(str(result_option_path))
 
         ######################################################################
         # Solve the model
@@ -311,340 +703,318 @@ def run(input_data: str, step_length: int, path_param: str, cores: int, solver=N
 
         # get lps to solve
 
+        solve_options = []
         lps_to_solve = []
 
-        if not options:
-            lp_file = Path("..", "..", step_dir, f"step_{step}", "model.lp")
-            sol_dir = Path(step_dir, f"step_{step}")
-            lps_to_solve.append(str(lp_file))
+        for option in branches:
+            if "solved" in done_stages[tuple(option)] or tuple(option) in duplicates:
+                continue
+            if run_manifest.is_created(step, option):
+                solve_options.append(option)
+                lps_to_solve.append(str(run_manifest.get(step, option).artifacts["lp"]))
+
+        start_time = time.perf_counter()
+
+        highs_solutions = {} # primal values of the branches solved with highs, kept to skip reading the solution files
+
+        if executor == "snakemake":
+            # the snakefile expects paths relative to the snakefile location
+            snakemake_lps = [str(Path("..", "..", lp_file)) for lp_file in lps_to_solve]
+            snakefile_args = [
+                "--snakefile src/osemosys_step/snakefile",
+                f"--config solver={solver} files={[','.join(snakemake_lps)]}",
+                f"--cores {cores}",
+                "--keep-going",
+                "--quiet"
+            ]
+            subprocess.run(f"snakemake {' '.join(snakefile_args)}", shell = True)
+        elif solver == "highs" and not warm_start:
+            solutions = branch.map_branches(branch.solve_branch_highs, step, solve_options, cores, step_dir, solve_log_dir)
+            solve_status = {}
+            for option, lp_file, solution in zip(solve_options, lps_to_solve, solutions):
+                if isinstance(solution, pd.DataFrame): # failed solves return None, or 1 if they raised
+                    highs_solutions[tuple(option)] = solution
+                solve_status[lp_file] = 0 if tuple(option) in highs_solutions else 1
+        elif not warm_start:
+            solve_status = solve.solve_lps(
+                lp_files=lps_to_solve,
+                solver=solver,
+                cores=cores,
+                step_dir=str(step_dir),
+                log_dir=str(solve_log_dir),
+                osemosys=str(osemosys_file)
+            )
         else:
-            for option in options:
-                lp_file = Path(step_dir, f"step_{step}")
-                sol_dir = Path(step_dir, f"step_{step}")
-                for each_option in option:
-                    lp_file = lp_file.joinpath(each_option)
-                lp_file = lp_file.joinpath("model.lp")
-                if lp_file.exists():
-                    lp_file = Path("..", "..", lp_file)
-                    lps_to_solve.append(str(lp_file))
-
-        # run snakemake
-
-        #######
-        # I think the multiprocessing library may be a better option then this
-        # since snakemake is a little overkill for running a single function
-        # when the goal is to just parallize multiple function calls
-        #######
-
-        # pretty sure there is a way to directly use the SnakemakeApi class! 
-        snakefile_args = [
-            "--snakefile src/osemosys_step/snakefile", 
-            f"--config solver={solver} files={[','.join(lps_to_solve)]}",
-            f"--cores {cores}",
-            "--keep-going",
-            "--quiet"
-        ]
-        subprocess.run(f"snakemake {' '.join(snakefile_args)}", shell = True)
-        
+            # the first branch below each parent starts from the parent basis
+            # and its siblings start from the basis of that first branch
+            first_branches = {}
+            for option in solve_options:
+                first_branches.setdefault(tuple(branch.get_parent_option(step, option)), option)
+            start_bases = {}
+            for option in solve_options:
+                lp_file = str(run_manifest.get(step, option).artifacts["lp"])
+                first_branch = first_branches[tuple(branch.get_parent_option(step, option))]
+                if option == first_branch:
+                    start_bases[lp_file] = (None, branch.get_start_basis(step, option, step_dir))
+                else:
+                    start_bases[lp_file] = (first_branch, str(run_manifest.get(step, first_branch).artifacts["basis"]))
+
+            solve_status = {}
+            for first in [True, False]:
+                wave = [lp_file for lp_file, (first_branch, _) in start_bases.items() if (first_branch is None) == first]
+                solve_status.update(solve.solve_lps(
+                    lp_files=wave,
+                    solver=solver,
+                    cores=cores,
+                    step_dir=str(step_dir),
+                    log_dir=str(solve_log_dir),
+                    osemosys=str(osemosys_file),
+                    start_bases={lp_file: start_bases[lp_file][1] for lp_file in wave},
+                    write_basis=True
+                ))
+
+            # the same lps solved without a start basis, to measure the warm starts against
+            cold_log_dir = Path(logs_dir, "cold_solves")
+            if cold_baseline:
+                solve.solve_lps(
+                    lp_files=lps_to_solve,
+                    solver=solver,
+                    cores=cores,
+                    step_dir=str(step_dir),
+                    log_dir=str(cold_log_dir),
+                    sol_name=solve.COLD_SOLUTION_FILE
+                )
+
+            for option in solve_options:
+                lp_file = str(run_manifest.get(step, option).artifacts["lp"])
+                _, start_basis = start_bases[lp_file]
+                cold_seconds = None
+                if cold_baseline:
+                    cold_seconds = solve.read_solve_time(str(Path(branch.get_branch_dir(cold_log_dir, step, option), "solve_time.log")))
+                    cold_sol_file = Path(Path(lp_file).parent, solve.COLD_SOLUTION_FILE)
+                    if cold_sol_file.exists():
+                        cold_sol_file.unlink()
+                warm_starts.append([
+                    step,
+                    "/".join(option),
+                    str(Path(start_basis).parent) if start_basis and Path(start_basis).exists() else None,
+                    solve.read_solve_time(str(Path(run_manifest.get(step, option).log_path, "solve_time.log"))),
+                    cold_seconds
+                ])
+            utils.write_warm_starts(warm_starts, str(Path(logs_dir, "warm_starts.csv")))
+
+        if executor != "snakemake":
+            for lp_file, exit_code in solve_status.items():
+                if exit_code == 1:
+                    logger.warning(f"{lp_file} did not return a solution")
+
+        phase_times.append([step, "solve", len(lps_to_solve), time.perf_counter() - start_time])
+        utils.write_phase_times(phase_times, str(Path(logs_dir, "phase_times.csv")))
+
         ######################################################################
         # Check for solutions
         ######################################################################
 
         failed_sols = []
 
-        if not options:
-            sol_file = Path(step_dir, f"step_{step}", "model.sol")
-            if not sol_file.exists():
-                failed_sols.append(str(sol_file))
-            elif solver == "cbc":
-                if solve.check_cbc_feasibility(str(sol_file)) == 1:
-                    failed_sols.append(str(sol_file))
-            elif solver == "glpk":
-                if solve.check_glpk_feasibility(str(sol_file)) == 1:
-                    failed_sols.append(str(sol_file))
-            elif solver == "gurobi":
-                if solve.check_gurobi_feasibility(str(sol_file)) == 1:
-                    failed_sols.append(str(sol_file))
-            elif solver == "cplex":
-                print("CPLEX solution not checked")
-
-        else:
-            for option in options:
-                sol_file = Path(step_dir, f"step_{step}")
-                for each_option in option:
-                    sol_file = sol_file.joinpath(each_option)
-                sol_file = sol_file.joinpath("model.sol")
-                if not sol_file.exists():
-                    failed_sols.append(str(sol_file))
-                elif solver == "cbc":
-                    if solve.check_cbc_feasibility(str(sol_file)) == 1:
-                        failed_sols.append(str(sol_file))
-                elif solver == "glpk":
-                    if solve.check_glpk_feasibility(str(sol_file)) == 1:
-                        failed_sols.append(str(sol_file))
-                elif solver == "gurobi":
-                    if solve.check_gurobi_feasibility(str(sol_file)) == 1:
-                        failed_sols.append(str(sol_file))
-                elif solver == "cplex":
-                    print("CPLEX solution not checked")
+        for option in solve_options:
+            sol_file = run_manifest.get(step, option).artifacts["sol"]
+            if solve.check_solution(str(sol_file), solver) == 1:
+                failed_sols.append(option)
+            else:
+                run_state.mark(step, option, "solved")
+                if tuple(option) in cache_keys and defer_results: # only the full results are cached
+                    artifact_cache.store(cache_keys[tuple(option)], str(sol_file.parent))
+
+        # copy solutions to branches with identical inputs
+        for option, representative in duplicates.items():
+            if not run_manifest.is_created(step, representative): # failed build
+                failed_sols.append(list(option))
+            elif representative in failed_sols:
+                failed_sols.append(list(option))
+            else:
+                branch.copy_branch_artifacts(step, representative, list(option), step_dir)
+                for stage in ["data", "lp", "solved"]:
+                    run_state.mark(step, list(option), stage)
 
         ######################################################################
         # Remove failed solves
         ######################################################################
 
-        if failed_sols:
-            for failed_sol in failed_sols:
-
-                logger.warning(f"Model {failed_sol} failed solving")
-
-                # get failed options
-                failed_options = utils.get_options_from_path(failed_sol, ".sol") # returns ["1E0-1C0", "2C1"]
-
-                # remove options from results
-                result_option_path = Path(results_dir).joinpath(*failed_options)
-                if result_option_path == results_dir:
-                    logger.error("All runs failed, quitting...")
-                    sys.exit()
-                elif result_option_path.exists():
-                    shutil.rmtree(str(result_option_path))
+        for option in failed_sols:
+            logger.warning(f"Model {str(run_manifest.get(step, option).path)} failed solving")
+            run_state.remove(step, option)
+            if run_manifest.fail(step, option):
+                logger.error("All runs failed, quitting...")
+                sys.exit()
 
-                # remove options from current and future steps
-                step_to_delete = step
-                while step_to_delete <= num_steps:
-                    step_option_path = Path(step_dir, f"step_{step_to_delete}").joinpath(*failed_options)
-                    if step_option_path.exists():
-                        shutil.rmtree(str(step_option_path))
-                    step_to_delete += 1
+        # remaining branches to finish
+        solved_options = [option for option in branches if run_manifest.is_created(step, option)]
 
         ######################################################################
         # Generate result CSVs
         ######################################################################
-        if not solver == "glpk": #csvs already created
-            if not options:
-                sol_dir = Path(step_dir, f"step_{step}")
-                if sol_dir.exists():
-                    sol_file = Path(sol_dir, "model.sol")
-                    data_file = Path(sol_dir, "data.txt")
-                    solve.generate_results(
-                        sol_file=str(sol_file),
-                        solver=solver,
-                        config=otoole_config_path,
-                        data_file=str(data_file)
-                    )
-            else:
-                for option in options:
-                    sol_dir = Path(step_dir, f"step_{step}")
-                    for each_option in option:
-                        sol_dir = sol_dir.joinpath(each_option)
-                    if sol_dir.exists():
-                        sol_file = Path(sol_dir, "model.sol")
-                        data_file = Path(sol_dir, "data.txt")
-                        solve.generate_results(
-                            sol_file=str(sol_file),
-                            solver=solver,
-                            config=otoole_config_path,
-                            data_file=str(data_file)
-                        )
-
-        ######################################################################
-        # Save Results
-        ######################################################################
 
-        if not options:
-            # apply data to all options
-            sol_results_dir = Path(step_dir, f"step_{step}", "results")
-            if not sol_results_dir.exists():
-                logger.error("All runs failed")
-                sys.exit()
-            for subdir in utils.get_subdirectories(str(results_dir)):
-                for result_file in sol_results_dir.glob("*"):
-                    src = result_file
-                    dst = Path(subdir, result_file.name)
-                    src_df = pd.read_csv(str(src))
-                    if not dst.exists():
-                        if "YEAR" in src_df.columns:
-                            result_df = src_df.loc[src_df["YEAR"].isin(actual_years_per_step[step])].reset_index(drop=True)
-                        else:
-                            result_df = src_df
-                    else:
-                        dst_df = pd.read_csv(str(dst))
-                        result_df = utils.concat_dataframes(src=src_df, dst=dst_df, years=actual_years_per_step[step])
-                    result_df.to_csv(str(dst), index=False)
+        result_options = [option for option in solved_options if "results" not in done_stages[tuple(option)]]
 
-        else:
-            for option in options:
+        # only the variables passed on to the next step if the full results are deferred
+        result_variables = branch.CARRY_OVER_VARIABLES if defer_results else None
 
-                # get top level result paths
-                sol_results_dir = Path(step_dir, f"step_{step}")
-                dst_results_dir = results_dir
+        if not solver == "glpk": #csvs already created
+            for option in result_options:
+                if tuple(option) not in duplicates and tuple(option) not in cached_results:
+                    branch.generate_results(step, option, step_dir, solver, otoole_config_path, result_variables, highs_solutions.get(tuple(option)))
 
-                # apply max option level for the step
-                for each_option in option:
-                    sol_results_dir = sol_results_dir.joinpath(each_option)
-                    dst_results_dir = dst_results_dir.joinpath(each_option)
+        for option in result_options:
+            if tuple(option) in duplicates:
+                branch.copy_branch_artifacts(step, duplicates[tuple(option)], option, step_dir, results=True)
+            elif tuple(option) in cache_keys and not defer_results:
+                artifact_cache.store(cache_keys[tuple(option)], str(run_manifest.get(step, option).path))
 
-                if not dst_results_dir.exists(): # failed solve
-                    continue
+        ######################################################################
+        # Save Results
+        ######################################################################
 
-                # find if there are more nested options for each step
-                dst_result_subdirs = utils.get_subdirectories(str(dst_results_dir))
-                if not dst_result_subdirs:
-                    dst_result_subdirs = [dst_results_dir]
-
-                # copy results
-                sol_results_dir = Path(sol_results_dir, "results")
-                for result_file in sol_results_dir.glob("*"):
-                    for dst_results_dir in dst_result_subdirs:
-                        src = result_file
-                        dst = Path(dst_results_dir, result_file.name)
-                        if not dst.exists():
-                            shutil.copy(str(src), str(dst))
-                        else:
-                            src_df = pd.read_csv(str(src))
-                            dst_df = pd.read_csv(str(dst))
-                            result_df = utils.concat_dataframes(src=src_df, dst=dst_df, years=actual_years_per_step[step])
-                            result_df.to_csv(str(dst), index=False)
+        if not defer_results:
+            for option in result_options:
+                store.save(step, option, str(run_manifest.get(step, option).artifacts["results"]), actual_years_per_step[step])
+                run_state.mark(step, option, "results")
 
         ######################################################################
         # Update data for next step
         ######################################################################
 
-        # skip on last step
-        if step + 1 > num_steps:
-            continue
-
-        step_dir_data = Path(data_dir, f"step_{step}")
-
-        options_next_step = csv_dirs[step + 1]
-
-        # no options in current step or next step
-        if not options_next_step:
-            logger.info(f"Step {step} does not have options, and step {step + 1} does not have options")
-
-            # Get updated residual capacity values
-            step_dir_results = Path(step_dir, f"step_{step}", "results")
-
-            old_res_cap = mu.get_res_cap_next_steps(step, num_steps, data_dir, actual_years_per_step)
-
-            op_life = pd.read_csv(str(Path(step_dir_data, "OperationalLife.csv")))
-            new_cap = pd.read_csv(str(Path(step_dir_results, "NewCapacity.csv")))
-
-            res_cap = mu.update_res_capacity(
-                res_capacity=old_res_cap,
-                op_life=op_life,
-                new_capacity=new_cap,
-                step_years=actual_years_per_step[step]
-            )
-
-            # overwrite residual capacity values for all subsequent steps
-            next_step = step + 1
-            while next_step < num_steps + 1:
-
-                step_res_cap = res_cap.loc[res_cap["YEAR"].isin(modelled_years_per_step[next_step])]
-
-                # no more res capacity to pass on
-                if step_res_cap.empty:
-                    break
-
-                step_dir_to_update = Path(data_dir, f"step_{next_step}")
-
-                if not utils.check_for_subdirectory(str(step_dir_to_update)):
-                    step_res_cap.to_csv(str(Path(step_dir_to_update, "ResidualCapacity.csv")), index=False)
-
+        for option in solved_options:
+            if "carried" in done_stages[tuple(option)]:
+                continue
+            # nothing to pass on from the last step
+            if step + 1 <= num_steps:
+                if in_memory:
+                    op_life = branch_data[tuple(option)]["OperationalLife"].reset_index()
                 else:
-                    for subdir in utils.get_subdirectories(str(step_dir_to_update)):
-                        step_res_cap.to_csv(str(Path(subdir, "ResidualCapacity.csv")), index=False)
-
-                next_step += 1
+                    op_life = pd.read_csv(str(branch.get_branch_csv(data_dir, step, option, "OperationalLife")))
+                branch.pass_on_capacity(step, option, step_dir, op_life, res_cap_ledger, actual_years_per_step[step])
+            run_state.mark(step, option, "carried")
 
-        # no options in current step, but options in next step
-        elif (not options) and (options_next_step):
-            logger.info(f"Step {step} does not have options, and step {step + 1} does have options")
+        ######################################################################
+        # Select branches to expand
+        ######################################################################
 
-            option_dir_data = Path(data_dir, f"step_{step}")
-            option_dir_results = Path(step_dir, f"step_{step}", "results")
+        if rank_branches and step < num_steps:
+            objectives = {
+                tuple(option): solve.get_objective(str(run_manifest.get(step, option).artifacts["sol"]), solver)
+                for option in solved_options
+            }
+            expanded[step] = scheduler.select_branches(objectives, expand_top_k, cost_gap)
+            msg = f"Step {step}: expanding {len(expanded[step])} of {len(objectives)} branches"
+            logger.info(msg)
+            tqdm.write(msg)
 
-            if not option_dir_results.exists(): # failed solve
-                continue
-
-            # Get updated residual capacity values
-            op_life = pd.read_csv(str(Path(option_dir_data, "OperationalLife.csv")))
-            new_cap = pd.read_csv(str(Path(option_dir_results, "NewCapacity.csv")))
+    ##########################################################################
+    # Save deferred results
+    ##########################################################################
 
-            # overwrite residual capacity values for all subsequent steps
-            next_step = step + 1
-            while next_step < num_steps + 1:
+    if defer_results:
+        for step, option in tqdm(run_state.get_unsaved(), desc="Saving Results", bar_format='{l_bar}{bar:10}{r_bar}{bar:-10b}'):
+            branch.generate_results(step, option, step_dir, solver, otoole_config_path)
+            store.save(step, option, str(run_manifest.get(step, option).artifacts["results"]), actual_years_per_step[step])
+            run_state.mark(step, option, "results")
 
-                # apply to max option level for the step
-                option_dir_to_update = Path(data_dir, f"step_{next_step}")
+    store.export_csv(str(results_dir), get_result_options(run_manifest, step_options))
 
-                for subdir in utils.get_subdirectories(str(option_dir_to_update)):
-                    old_res_cap = pd.read_csv(str(Path(subdir, "ResidualCapacity.csv")))
-                    res_cap = mu.update_res_capacity(
-                        res_capacity=old_res_cap,
-                        op_life=op_life,
-                        new_capacity=new_cap,
-                        step_years=actual_years_per_step[step]
-                    )
-                    res_cap = res_cap.loc[res_cap["YEAR"].isin(modelled_years_per_step[next_step])]
-                    res_cap.to_csv(str(Path(subdir, "ResidualCapacity.csv")), index=False)
+def get_result_options(run_manifest: manifest.RunManifest, step_options: Dict[int, List[str]]) -> List[List[str]]:
+    """Gets the options of the result folders to write the result CSVs to
 
-                next_step += 1
+    A run without any options writes its results to results/the_scen, see
+    setup_data()
+    """
+    if not any(step_options.values()):
+        return [["the_scen"]]
+    return run_manifest.get_result_options()
+
+def setup_data(
+    data_dir: Path,
+    results_dir: Path,
+    otoole_config_path: Path,
+    otoole_data: Dict[str, pd.DataFrame],
+    otoole_defaults: Dict[str, float],
+    step_options: Dict[int, List[str]],
+    modelled_years_per_step: Dict[int, List[int]],
+    in_memory: bool = False
+) -> None:
+    """Writes the input data of every step and creates the result folder
+
+    The folders and data of each branch are only created once its parent
+    branch has been solved, see branch.materialize_branch()
+
+    Args:
+        data_dir: Path
+        results_dir: Path
+        otoole_config_path: Path
+        otoole_data: Dict[str, pd.DataFrame]
+            Reference data of the full model horizon
+        otoole_defaults: Dict[str, float]
+        step_options: Dict[int, List[str]]
+            Options per step, with the step number appended
+        modelled_years_per_step: Dict[int, List[int]]
+        in_memory: bool = False
+            Only create the result folder. The data of each branch is kept
+            in memory instead
+    """
 
-        # options in current step and next step
-        else:
-            logger.info(f"Step {step} has options, and step {step + 1} has options")
+    # result folders of branches are created when the results are written at the end of the run
+    if not results_dir.exists():
+        results_dir.mkdir()
+    if not any(step_options.values()):
+        all_res_dir = Path(results_dir, 'the_scen')
+        all_res_dir.mkdir(exist_ok=True)
 
-            for option in options:
+    if in_memory:
+        return
 
-                option_dir_data = Path(data_dir, f"step_{step}")
-                option_dir_results = Path(step_dir, f"step_{step}")
+    # write out original parsed step data, copied to each branch when it is run
+    for step, years_per_step in modelled_years_per_step.items():
+        step_data = ds.get_step_data(otoole_data, years_per_step)
+        write(otoole_config_path, "csv", str(Path(data_dir, f"data_{step}")), step_data, otoole_defaults)
+        logger.info(f"Wrote data for step {step}")
 
-                # apply max option level for the step
-                for each_option in option:
-                    option_dir_data = option_dir_data.joinpath(each_option)
-                    option_dir_results = option_dir_results.joinpath(each_option)
-                option_dir_results = option_dir_results.joinpath("results")
-                if not option_dir_results.exists(): # failed solve
-                    continue
+def check_lp_builder(
+    step_dir: Path,
+    osemosys_file: Path,
+    otoole_config_path: Path,
+    otoole_data: Dict[str, pd.DataFrame],
+    otoole_defaults: Dict[str, float],
+    years: List[int]
+) -> List[str]:
+    """Checks that the native lp builder builds the same lp as glpsol from the model file
+
+    The reference data of the first step is written to steps/model_check and
+    built with both, see lp_builder.check_model_file()
+
+    Args:
+        step_dir: Path
+        osemosys_file: Path
+        otoole_config_path: Path
+        otoole_data: Dict[str, pd.DataFrame]
+            Reference data of the full model horizon
+        otoole_defaults: Dict[str, float]
+        years: List[int]
+            Modelled years of the first step
+
+    Returns:
+        List[str]
+            Description of each difference, empty if the native builder can
+            be used
+    """
+    check_dir = Path(step_dir, "model_check")
+    check_dir.mkdir(parents=True, exist_ok=True)
+    data = ds.get_step_data(otoole_data, years)
+    datafile = Path(check_dir, "data.txt")
+    datafile_pp = Path(check_dir, "data_pp.txt")
+    write(str(otoole_config_path), "datafile", str(datafile), data, otoole_defaults)
+    preprocess_data.main_from_data(data, str(datafile), str(datafile_pp))
+    return lb.check_model_file(str(osemosys_file), str(datafile_pp), data, otoole_defaults, str(Path(check_dir, "model.lp")))
 
-                # Get updated residual capacity values
-
-                op_life = pd.read_csv(str(Path(option_dir_data, "OperationalLife.csv")))
-                new_cap = pd.read_csv(str(Path(option_dir_results, "NewCapacity.csv")))
-
-                # overwrite residual capacity values for all subsequent steps
-                next_step = step + 1
-                while next_step < num_steps + 1:
-
-                    # apply to max option level for the step
-                    option_dir_to_update = Path(data_dir, f"step_{next_step}")
-                    for each_option in option:
-                        option_dir_to_update = option_dir_to_update.joinpath(each_option)
-
-                    if utils.check_for_subdirectory(str(option_dir_to_update)):
-                        for subdir in utils.get_subdirectories(str(option_dir_to_update)):
-                            old_res_cap = pd.read_csv(str(Path(subdir, "ResidualCapacity.csv")))
-                            res_cap = mu.update_res_capacity(
-                                res_capacity=old_res_cap,
-                                op_life=op_life,
-                                new_capacity=new_cap,
-                                step_years=actual_years_per_step[step]
-                            )
-                            res_cap = res_cap.loc[res_cap["YEAR"].isin(modelled_years_per_step[next_step])]
-                            res_cap.to_csv(str(Path(subdir, "ResidualCapacity.csv")), index=False)
-                    else:
-                        old_res_cap = pd.read_csv(str(Path(option_dir_to_update, "ResidualCapacity.csv")))
-                        res_cap = mu.update_res_capacity(
-                            res_capacity=old_res_cap,
-                            op_life=op_life,
-                            new_capacity=new_cap,
-                            step_years=actual_years_per_step[step]
-                        )
-                        res_cap = res_cap.loc[res_cap["YEAR"].isin(modelled_years_per_step[next_step])]
-                        res_cap.to_csv(str(Path(option_dir_to_update, "ResidualCapacity.csv")), index=False)
-
-                    next_step += 1
 
 @click.command()
 @click.option("--path", required=True, default= '.',
@@ -1,11 +1,12 @@
 """utility functions for the main script"""
 
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Any, Iterator
+import itertools
+import numpy as np
 import pandas as pd
 import os
 from pathlib import Path
 import logging
-from osemosys_step import utils
 import sys
 from otoole import convert
 
@@ -99,26 +100,34 @@ def get_options_per_step(steps: Dict[int, Dict[str, pd.DataFrame]]) -> Dict[int,
 
         # create all the combinations
         options_per_scenario = get_options_per_scenario(scenarios) # {A:[0,1], B:[1,2,3], C:[0]}
-        grouped_options = []
-        if len(options_per_scenario) == 1:
-            for scenario, options in options_per_scenario.items():
-                for option in options:
-                    grouped_options.append(f"{scenario}{option}")
-            options_per_step[int(step)] = grouped_options
-        else:
-            for scenario, options in options_per_scenario.items():
-                for next_scenario, next_options in options_per_scenario.items():
-                    if next_scenario == scenario:
-                        continue
-                    for option in options:
-                        for next_option in next_options:
-                            grouped_options.append([f"{scenario}{option}",f"{next_scenario}{next_option}"])
-            grouped_options = remove_duplicate_combinations(grouped_options)
-            expanded_options = ["-".join(x) for x in grouped_options]
-            options_per_step[int(step)] = expanded_options
+        options_per_step[int(step)] = list(iter_option_combinations(options_per_scenario))
 
     return options_per_step
 
+def iter_option_combinations(options_per_scenario: Dict[str, List[Any]]) -> Iterator[str]:
+    """Yields every combination of one option per scenario
+
+    Scenarios are combined in alphabetical order, so each combination is
+    only created once.
+
+    Args:
+        options_per_scenario: Dict[str, List[Any]]
+            output from get_options_per_scenario()
+
+    Example:
+        >>> list(iter_option_combinations({B:[0,1], A:[0,1], C:[0]}))
+        >>> [A0-B0-C0, A0-B1-C0, A1-B0-C0, A1-B1-C0]
+    """
+    if not options_per_scenario:
+        return
+    scenarios = sorted(options_per_scenario)
+    grouped_options = [
+        [f"{scenario}{option}" for option in options_per_scenario[scenario]]
+        for scenario in scenarios
+    ]
+    for combination in itertools.product(*grouped_options):
+        yield "-".join(combination)
+
 def get_option_data(steps: Dict[int, Dict[str, pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
     """Gets option data in DataFrames.
 
@@ -148,29 +157,6 @@ def get_option_data(steps: Dict[int, Dict[str, pd.DataFrame]]) -> Dict[str, pd.D
                 option_data[f"{scenario}{option}"] = df.loc[df["OPTION"] == option].reset_index(drop=True)
     return option_data
 
-def remove_duplicate_combinations(options: List[Tuple]) -> List[Tuple]:
-    """Removes duplicate options from each step
-
-    Args:
-        options: List[Tuple]
-            List of tuples
-
-    Returns:
-        combinations: List[Tuple]
-            List of tuples
-
-    Example:
-        >>> remove_duplicate_combinations([(A0, A1), (A0, B0), (A0, B1), (A1, B0), (A1, B1)])
-        >>> [(A0, B0), (A0, B1), (A1, B0), (A1, B1)]
-    """
-
-    unique_options = []
-    for option in options:
-        option_set = set(option)
-        if option_set not in [set(x) for x in unique_options]:
-            unique_options.append(option)
-    return unique_options
-
 def get_option_combinations_per_step(options_per_step: Dict[int, List[List[str]]]) -> Dict[int, List[str]]:
     """Gets full permutations of file paths in each step
 
@@ -183,8 +169,8 @@ def get_option_combinations_per_step(options_per_step: Dict[int, List[List[str]]
             0: [],
             1:[[A0-B0], [A0-B1], [A1-B0], [A1-B1]],
             2:[
-                [A0-B0,C0], [A0-B1,C0], [A1-B0,C0], [A1-B1,C0],
-                [A0-B0,C1], [A0-B1,C1], [A1-B0,C1], [A1-B1,C1]
+                [A0-B0,C0], [A0-B0,C1], [A0-B1,C0], [A0-B1,C1],
+                [A1-B0,C0], [A1-B0,C1], [A1-B1,C0], [A1-B1,C1]
             ]
         }
     """
@@ -197,7 +183,7 @@ def get_option_combinations_per_step(options_per_step: Dict[int, List[List[str]]
 
        # first step
         if current_step == 0:
-            option_combos_per_step[0] = options_per_step[0]
+            option_combos_per_step[0] = [[option] for option in options_per_step[0]]
             continue
 
         # no new options for this step
@@ -205,19 +191,19 @@ def get_option_combinations_per_step(options_per_step: Dict[int, List[List[str]]
             option_combos_per_step[current_step] = option_combos_per_step[last_step][:]
             continue
 
-        # no options for previous step
-        if not options_per_step[last_step]:
+        # no options for any previous step
+        if not option_combos_per_step[last_step]:
             option_combos_this_step = []
             for current_step_option in options_per_step[current_step]:
                 option_combos_this_step.append([current_step_option])
             option_combos_per_step[current_step] = option_combos_this_step
             continue
 
-        # permutate in new options
+        # permutate in new options below every branch of the previous step
         option_combos_this_step = []
-        for last_step_option in options_per_step[last_step]:
+        for last_step_combo in option_combos_per_step[last_step]:
             for current_step_option in options_per_step[current_step]:
-                option_combos_this_step.append([last_step_option, current_step_option])
+                option_combos_this_step.append(last_step_combo + [current_step_option])
         option_combos_per_step[current_step] = option_combos_this_step
 
     return option_combos_per_step
@@ -241,80 +227,6 @@ def get_options_per_scenario(scenarios: Dict[str, pd.DataFrame]) -> List[str]:
         options[scenario] = df['OPTION'].unique().tolist()
     return options
 
-def create_option_directories(root_dir: str, options_per_step: Dict[int, List[str]], step_directories: bool = True) -> None:
-    """Create directories at the option level
-
-    Args:
-        root_dir: str
-            Root dirctory to expand options directories
-        options_per_step: Dict[int, List[str]]
-            All options per step
-        step_directories: bool = True
-            Nest options under step directories
-    """
-
-    option_combos = get_option_combinations_per_step(options_per_step)
-    max_step = max(list(options_per_step))
-    for step_num in range(0, max_step + 1):
-
-        if step_num not in list(option_combos):
-            logger.info(f"No scenario data for step {step_num}")
-            continue
-
-        # step has no options
-        # combos = list(option_combos[step_num])
-        if not option_combos[step_num]:
-            new_dirs = []
-        else:
-            new_dirs = option_combos[step_num]
-
-        # no options
-        if not new_dirs:
-            new_dir_copy = []
-            if step_directories:
-                new_dir_copy.insert(0, f"step_{step_num}")
-            new_dir_copy.insert(0, root_dir)
-            dir_path = Path(*new_dir_copy)
-            dir_path.mkdir(parents=True, exist_ok=True)
-            logger.info(f"Created directory {str(dir_path)}")
-
-        else:
-            for new_dir in new_dirs:
-                new_dir_copy = new_dir[:]
-                if step_directories:
-                    new_dir_copy.insert(0, f"step_{step_num}")
-                new_dir_copy.insert(0, root_dir)
-                dir_path = Path(*new_dir_copy)
-                dir_path.mkdir(parents=True, exist_ok=True)
-                logger.info(f"Created directory {str(dir_path)}")
-
-def copy_reference_option_data(src_dir: str, dst_dir: str, options_per_step: Dict[int, List[str]]) -> None:
-    """Copies original data to step/option folders
-
-    Args:
-        src_dir: str
-            Root data folder
-        dst_dir: str
-            Root destination folder
-        options_per_step: Dict[int, List[str]]
-            All options per step
-    """
-
-    option_combos = get_option_combinations_per_step(options_per_step)
-    max_step = max(list(options_per_step))
-    for step_num in range(0, max_step + 1):
-        if step_num not in list(option_combos):
-            logger.info(f"No scenario data for step {step_num}")
-            continue
-        if not option_combos[step_num]:
-            src = Path(src_dir,f"data_{step_num}")
-            dst = Path(dst_dir, f"step_{step_num}")
-            utils.copy_csvs(src, dst)
-        for dsts in option_combos[step_num]:
-            src = Path(src_dir,f"data_{step_num}")
-            dst = Path(dst_dir, f"step_{step_num}", *dsts)
-            utils.copy_csvs(src, dst)
-
 def split_path_name(directory: str) -> List[str]:
     """Splits path name into sub directories
 
@@ -470,7 +382,8 @@ def get_param_data_per_option(step_option_data: Dict[int, Dict[str, pd.DataFrame
 
     Returns:
         Dict[str, Dict[str, pd.DataFrame]]
-            Param data per option per step
+            Param data per option per step. Each dataframe only holds the
+            rows of its parameter
 
     Example:
         >>> get_param_data_per_option()
@@ -480,17 +393,53 @@ def get_param_data_per_option(step_option_data: Dict[int, Dict[str, pd.DataFrame
     param_per_option = {}
     for step, option in step_option_data.items():
         for option_name, option_data in option.items():
-            params = option_data["PARAMETER"].unique()
             option_values = option_data["OPTION"].unique()
             for option_value in option_values: # as listed in the actual df
                 if not option_name.endswith(str(option_value)):
                     continue
                 param_per_option[f"{step}{option_name}"] = {}
-                for param in params:
-                    df = option_data.drop(columns = ["PARAMETER", "OPTION"])
+                for param, df in option_data.groupby("PARAMETER", sort=False):
+                    df = df.drop(columns = ["PARAMETER", "OPTION"]).reset_index(drop=True)
                     param_per_option[f"{step}{option_name}"][param] = df
     return param_per_option
 
+def get_option_updates(
+    option_data_by_param: Dict[str, Dict[str, pd.DataFrame]],
+    options: List[str],
+    param: str,
+    years: List[int]
+) -> pd.DataFrame:
+    """Combines the rows of several options for one parameter
+
+    Options are applied in order, so a later option overwrites the rows of an
+    earlier option with the same index.
+
+    Args:
+        option_data_by_param: Dict[str, Dict[str, pd.DataFrame]]
+            output from get_param_data_per_option()
+        options: List[str]
+            parsed options to apply, ie. [1A0, 1B1, 2C0]
+        param: str
+            parameter to get the rows for
+        years: List[int]
+            modelled years to get the rows for
+
+    Returns:
+        pd.DataFrame
+            Rows to apply to the parameter, indexed by all columns but VALUE,
+            or None if none of the options changes the parameter
+    """
+    updates = [
+        option_data_by_param[option][param] for option in options
+        if param in option_data_by_param[option]
+    ]
+    if not updates:
+        return None
+    df = pd.concat(updates, ignore_index=True)
+    df = df.loc[df["YEAR"].isin(years)]
+    df = df.set_index([column for column in df.columns if column != "VALUE"])
+    return df.loc[~df.index.duplicated(keep="last")]
+
 def apply_option_data(original: pd.DataFrame, option: pd.DataFrame) -> pd.DataFrame:
     """Overwrites original dataframe values with option values
 
@@ -498,75 +447,43 @@ def apply_option_data(original: pd.DataFrame, option: pd.DataFrame) -> pd.DataFr
         original: pd.DataFrame
             original dataframe to be modified
         option: pd.DataFrame
-            option dataframe
+            option rows indexed by all columns but VALUE, see
+            get_option_updates()
 
     Returns:
         pd.DataFrame
-            dataframe with option values applied
+            dataframe with option values applied, sorted by its index
     """
-    if not (original.columns.to_list()) == (option.columns.to_list()):
-        logger.error(f"columns for original are {original.columns} and columns to apply are {option.columns}")
+    index = [column for column in original.columns if column != "VALUE"]
+    if not (set(option.index.names) == set(index) and option.columns.to_list() == ["VALUE"]):
+        logger.error(f"columns for original are {original.columns} and columns to apply are {option.index.names + option.columns.to_list()}")
         logger.error("Exiting...")
         sys.exit()
-    option = option[list(original)] # align column headers
-    df = pd.concat([original, option])
-    subset = list(df)
-    subset.remove("VALUE") # For dropping duplicates
-    df = df.drop_duplicates(keep="last", subset=subset).reset_index(drop=True)
-    return df
-
-def get_res_cap_next_steps(step: int, n_steps: int, data_path: str, actual_yrs_in_steps: Dict) -> pd.DataFrame:
-    """Gets a dataframe of the ResidualCapacity in the steps that still need to be run.
+    if len(index) > 1:
+        option = option.reorder_levels(index) # align index levels
+    df = option.combine_first(original.set_index(index))
+    return df.reset_index()[original.columns.to_list()]
 
-    Args:
-        step: int
-            current step, that has just been run
-        n_steps: int
-            overall number of steps
-        data_path: str
-            Path to the directory that contains the directories with the step data
-        actual_yrs_in_steps: Dict
-            Dictionary with actual years for each step
+def get_new_capacity_lifetime(op_life: pd.DataFrame, new_capacity: pd.DataFrame) -> pd.DataFrame:
+    """Gets new capacity to apply to next steps
 
-    Returns:
-        pd.DataFrame
-            One dataframe with the ResidualCapacity of all remaining steps
+    Each row of new capacity is repeated once for every year of the
+    operational life of its technology, starting in the year it is built.
+    Technologies without an operational life are available for one year,
+    same as apply_op_life().
     """
-    res_cap = pd.DataFrame(columns=['REGION', 'TECHNOLOGY', 'YEAR', 'VALUE'])
-
-    next_step = step + 1
-    while next_step < n_steps + 1:
-        if not utils.check_for_subdirectory(str(Path(data_path, f"step_{next_step}"))):
-            res_cap_next_step = pd.read_csv(str(Path(data_path, f"step_{next_step}", "ResidualCapacity.csv")))
-
-        else:
-            sub_dir = utils.get_subdirectories(str(Path(data_path, f"step_{next_step}")))[0]
-            res_cap_next_step = pd.read_csv(str(Path(sub_dir, "ResidualCapacity.csv")))
 
-        res_cap_next_step = res_cap_next_step[res_cap_next_step['YEAR'].isin(actual_yrs_in_steps[next_step])]
-        res_cap = pd.concat([res_cap, res_cap_next_step], ignore_index=True)
+    mapper = dict(zip(op_life['TECHNOLOGY'], op_life['VALUE']))
 
-        next_step += 1
+    df = new_capacity.reset_index(drop=True)
+    life = df["TECHNOLOGY"].map(mapper).fillna(1).astype(int).clip(lower=0).to_numpy()
 
-    return res_cap
+    # offset of each repeated row from the start year of its capacity
+    offsets = np.arange(life.sum()) - np.repeat(np.cumsum(life) - life, life)
 
-def get_new_capacity_lifetime(op_life: pd.DataFrame, new_capacity: pd.DataFrame) -> pd.DataFrame:
-    """Gets new capacity to apply to next steps"""
+    df = df.loc[df.index.repeat(life)].reset_index(drop=True)
+    df["YEAR"] = df["YEAR"].astype(int).to_numpy() + offsets
 
-    mapper = dict(zip(op_life['TECHNOLOGY'], op_life['VALUE']))
-    regions = new_capacity["REGION"].unique()
-
-    results = []
-    for region in regions:
-        df = new_capacity.copy()
-        df = df.loc[df["REGION"] == region].reset_index(drop=True)
-        df["YEARS_ACTIVE"] = df.apply(lambda x: apply_op_life(x["YEAR"], x["TECHNOLOGY"], mapper), axis=1)
-        df = df.explode(column=["YEARS_ACTIVE"])
-        df["YEAR"] = df["YEARS_ACTIVE"]
-        df = df.drop(columns=["YEARS_ACTIVE"])
-        results.append(df)
-
-    df = pd.concat(results).reset_index(drop=True)
     df = df.groupby(by=["REGION", "TECHNOLOGY", "YEAR"]).sum().reset_index()
 
     return df[["REGION", "TECHNOLOGY", "YEAR", "VALUE"]]
@@ -0,0 +1,196 @@
+"""Manifest of the branches of the scenario tree of a run
+
+Every branch of the scenario tree is a node of the manifest, with its parent,
+its children, the folders of its data, artifacts, logs and results, and
+whether it has been created or has failed. Instead of scanning the step and
+result folders or checking which branch folders exist, the run looks up the
+nodes of the manifest.
+
+The state of each node is appended as a line to ``manifest.csv``, the same
+way as the stages in ``state.csv``, so that a resumed run knows which
+branches were created or failed before.
+"""
+
+from typing import Dict, List, Tuple
+from pathlib import Path
+import logging
+import shutil
+
+from osemosys_step import branch, solve, state
+
+logger = logging.getLogger(__name__)
+
+# states of a node, in the order they are reached
+NODE_STATES = ["planned", "created", "failed"]
+
+# artifacts in the step folder of a branch
+ARTIFACTS = {
+    "data": "data.txt",
+    "data_pp": "data_pp.txt",
+    "lp": "model.lp",
+    "sol": "model.sol",
+    "basis": solve.BASIS_FILE,
+    "results": "results",
+}
+
+class Node:
+    """A branch of the scenario tree and the locations of its files
+
+    Args:
+        step: int
+        option: Tuple[str, ...]
+            Option directories of the branch
+        parent: Tuple[int, Tuple[str, ...]]
+            Step and option of the parent branch, None for a root branch
+        data_dir: str
+        step_dir: str
+        results_dir: str
+        log_dir: str
+    """
+
+    def __init__(
+        self,
+        step: int,
+        option: Tuple[str, ...],
+        parent: Tuple[int, Tuple[str, ...]],
+        data_dir: str,
+        step_dir: str,
+        results_dir: str,
+        log_dir: str
+    ):
+        self.step = step
+        self.option = option
+        self.parent = parent
+        self.children = []
+        self.state = "planned"
+        self.path = branch.get_branch_dir(step_dir, step, list(option))
+        self.data_path = branch.get_branch_dir(data_dir, step, list(option))
+        self.log_path = branch.get_branch_dir(log_dir, step, list(option))
+        self.results_path = branch.get_branch_dir(results_dir, step, list(option), step_directories=False)
+        self.artifacts = {name: Path(self.path, artifact) for name, artifact in ARTIFACTS.items()}
+
+class RunManifest:
+    """Nodes of the scenario tree with O(1) lookup by step and option
+
+    Args:
+        manifest_dir: str
+            Directory to keep the manifest file in
+        children: Dict[Tuple[int, Tuple[str, ...]], List[Tuple[int, Tuple[str, ...]]]]
+            output from scheduler.get_branch_children()
+        data_dir: str
+        step_dir: str
+        results_dir: str
+        log_dir: str
+            Root directories the folders of each branch are nested in
+    """
+
+    def __init__(
+        self,
+        manifest_dir: str,
+        children: Dict[Tuple[int, Tuple[str, ...]], List[Tuple[int, Tuple[str, ...]]]],
+        data_dir: str,
+        step_dir: str,
+        results_dir: str,
+        log_dir: str
+    ):
+        self.manifest_file = Path(manifest_dir, "manifest.csv")
+        parents = {child: node for node, child_nodes in children.items() for child in child_nodes}
+        self.nodes = {
+            node: Node(node[0], node[1], parents.get(node), data_dir, step_dir, results_dir, log_dir)
+            for node in children
+        }
+        for node, child_nodes in children.items():
+            self.nodes[node].children = list(child_nodes)
+        self._load()
+
+    def _load(self) -> None:
+        if not self.manifest_file.exists():
+            return
+        keys = {state.RunState.get_key(step, list(option)): node for (step, option), node in self.nodes.items()}
+        with open(self.manifest_file, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                key, node_state = line.rsplit(",", 1)
+                if key in keys:
+                    keys[key].state = node_state
+
+    def _set_state(self, node: Node, node_state: str) -> None:
+        node.state = node_state
+        with open(self.manifest_file, "a") as f:
+            f.write(f"{state.RunState.get_key(node.step, list(node.option))},{node_state}\n")
+
+    def reset(self) -> None:
+        """Clears the manifest file and sets all nodes back to planned"""
+        if self.manifest_file.exists():
+            self.manifest_file.unlink()
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        for node in self.nodes.values():
+            node.state = "planned"
+
+    def get(self, step: int, option: List[str]) -> Node:
+        """Gets the node of a branch"""
+        return self.nodes[(step, tuple(option))]
+
+    def get_parent(self, step: int, option: List[str]) -> Node:
+        """Gets the node of the parent of a branch, or None for a root branch"""
+        parent = self.get(step, option).parent
+        return self.nodes[parent] if parent else None
+
+    def is_created(self, step: int, option: List[str]) -> bool:
+        """Checks if the folders of a branch were created and it has not failed"""
+        return self.get(step, option).state == "created"
+
+    def mark_created(self, step: int, option: List[str]) -> None:
+        """Records that the folders of a branch were created"""
+        node = self.get(step, option)
+        if node.state != "created":
+            self._set_state(node, "created")
+
+    def get_descendants(self, step: int, option: List[str]) -> List[Node]:
+        """Gets the nodes of all branches that depend directly or indirectly on a branch"""
+        descendants = []
+        pending = list(self.get(step, option).children)
+        while pending:
+            node = self.nodes[pending.pop()]
+            descendants.append(node)
+            pending.extend(node.children)
+        return descendants
+
+    def fail(self, step: int, option: List[str]) -> bool:
+        """Removes a failed branch and all branches below it
+
+        The step folders of the branch and its created descendants are
+        removed and all of them are marked as failed. The step folder of the
+        branch is removed even if it was not marked as created, ie. when
+        created by another process.
+
+        Returns:
+            bool
+                True if the top level branch failed, ie. there is nothing left to run
+        """
+        node = self.get(step, option)
+        for failed in [node] + self.get_descendants(step, option):
+            if failed is node or failed.state == "created":
+                shutil.rmtree(str(failed.path), ignore_errors=True)
+            if failed.state != "failed":
+                self._set_state(failed, "failed")
+
+        return not node.option
+
+    def get_result_options(self) -> List[List[str]]:
+        """Gets the options of the deepest result folders of the branches that were created
+
+        The results of a path are written to the folder of the deepest branch
+        created along it, see results_store.ResultsStore.export_csv().
+        Branches with the options of a failed branch are left out.
+
+        Returns:
+            List[List[str]]
+                Options of each result folder, ie. [['1A0-1B1', '2C0']]
+        """
+        options = {node.option for node in self.nodes.values() if node.state == "created"}
+        options -= {node.option for node in self.nodes.values() if node.state == "failed"}
+        prefixes = {option[:depth] for option in options for depth in range(len(option))}
+        return [list(option) for option in sorted(options - prefixes)]
@@ -243,6 +243,94 @@ def main(data_format, data_infile, data_outfile):
                     param_current = details[-2]
                     parsing = True
 
+    write_sets(
+        lines, data_outfile, data_format,
+        fuel_list, tech_list, storage_list, emission_list,
+        data_out, data_inp, data_all, storage_to, storage_from, emission_table
+    )
+
+
+def main_from_data(data, data_infile, data_outfile):
+    """Preprocesses an otoole datafile using the data it was written from
+
+    Instead of parsing the parameter sections of the datafile, the
+    commodity-technology-mode combinations are read from the otoole
+    DataFrames that the datafile was written from.
+
+    Args:
+        data: Dict[str, pd.DataFrame]
+            otoole internal datastore structure
+        data_infile: str
+            datafile written from data
+        data_outfile: str
+            preprocessed datafile to write
+    """
+
+    lines = []
+
+    with open(data_infile, 'r') as f1:
+        for line in f1:
+            if not line.startswith(('set MODEper','set MODEx', 'end;')):
+                lines.append(line)
+
+    def get_set(name):
+        if name not in data:
+            return []
+        return data[name]["VALUE"].astype(str).to_list()
+
+    def get_rows(name, condition):
+        if name not in data or data[name].empty:
+            return []
+        df = data[name]
+        df = df.loc[condition(df["VALUE"])]
+        return [tuple(str(x) for x in row) for row in df.index.to_list()]
+
+    fuel_list = get_set('FUEL') if 'FUEL' in data else get_set('COMMODITY')
+    tech_list = get_set('TECHNOLOGY')
+    storage_list = get_set('STORAGE')
+    emission_list = get_set('EMISSION')
+
+    data_out = []
+    data_inp = []
+    data_all = []
+    storage_to = []
+    storage_from = []
+    emission_table = []
+
+    # index is (REGION, TECHNOLOGY, FUEL, MODE_OF_OPERATION, YEAR)
+    for _, tech, fuel, mode, _ in get_rows('OutputActivityRatio', lambda x: x != 0):
+        data_out.append(tuple([fuel, tech, mode]))
+        data_all.append(tuple([tech, mode]))
+
+    for _, tech, fuel, mode, _ in get_rows('InputActivityRatio', lambda x: x != 0):
+        data_inp.append(tuple([fuel, tech, mode]))
+        data_all.append(tuple([tech, mode]))
+
+    # index is (REGION, TECHNOLOGY, STORAGE, MODE_OF_OPERATION)
+    for _, tech, storage, mode in get_rows('TechnologyToStorage', lambda x: x > 0):
+        storage_to.append(tuple([storage, tech, mode]))
+        data_all.append(tuple([storage, mode]))
+
+    for _, tech, storage, mode in get_rows('TechnologyFromStorage', lambda x: x > 0):
+        storage_from.append(tuple([storage, tech, mode]))
+        data_all.append(tuple([storage, mode]))
+
+    # index is (REGION, TECHNOLOGY, EMISSION, MODE_OF_OPERATION, YEAR)
+    for _, tech, emission, mode, _ in get_rows('EmissionActivityRatio', lambda x: x != 0):
+        emission_table.append(tuple([emission, tech, mode]))
+        data_all.append(tuple([tech, mode]))
+
+    write_sets(
+        lines, data_outfile, 'otoole',
+        fuel_list, tech_list, storage_list, emission_list,
+        data_out, data_inp, data_all, storage_to, storage_from, emission_table
+    )
+
+
+def write_sets(lines, data_outfile, data_format, fuel_list, tech_list, storage_list, emission_list,
+               data_out, data_inp, data_all, storage_to, storage_from, emission_table):
+    """Writes the datafile lines followed by the preprocessed sets"""
+
     data_out = list(set(data_out))
     data_inp = list(set(data_inp))
     data_all = list(set(data_all))
@@ -311,6 +399,7 @@ def main(data_format, data_infile, data_outfile):
         file_out.write('end;')
 
 
+
 if __name__ == '__main__':
 
     if len(sys.argv) != 4:
@@ -0,0 +1,228 @@
+"""Results of the scenario tree, stored once per branch
+
+Instead of appending the results of a step to the result CSVs of every path
+below a branch, the results of the actual years of a branch are written
+once, as one file per variable, step and branch:
+
+    results_store/variable=NewCapacity/step=1/branch=1A0-1B1/part.csv
+
+Every branch saved is recorded in a small index, results_store/index.csv.
+The results of a path through the tree are assembled from the files of the
+branches it descends from, found through the index, when they are read. They
+are written to the usual result CSVs once, at the end of a run. Files are
+written as CSV or, with the optional pyarrow package, as Parquet.
+"""
+
+from typing import Dict, List, Tuple
+from pathlib import Path
+from urllib.parse import quote
+import logging
+import os
+import uuid
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FILE_FORMATS = ["csv", "parquet"]
+INDEX_FILE = "index.csv"
+
+class ResultsStore:
+    """Results saved by each branch, partitioned by variable, step and branch
+
+    Args:
+        store_dir: str
+            Directory of the dataset
+        file_format: str = "csv"
+            One of 'csv' or 'parquet'
+    """
+
+    def __init__(self, store_dir: str, file_format: str = "csv"):
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"Results can not be stored as {file_format}")
+        self.store_dir = Path(store_dir)
+        self.file_format = file_format
+        self.index_file = Path(store_dir, INDEX_FILE)
+        self.nodes = None # {option: [steps]} of the saved branches, see get_nodes()
+
+    def get_part(self, variable: str, step: int, option: List[str]) -> Path:
+        """Gets the file of a variable of a branch, ie. 'variable=NewCapacity/step=1/branch=1A0/part.csv'"""
+        return Path(
+            self.store_dir,
+            f"variable={variable}",
+            f"step={step}",
+            f"branch={quote('/'.join(option), safe='')}",
+            f"part.{self.file_format}"
+        )
+
+    def _write_part(self, df: pd.DataFrame, part: Path) -> None:
+        # write to a temporary file first so a crash never leaves a partial file
+        part.parent.mkdir(parents=True, exist_ok=True)
+        tmp_part = Path(part.parent, f".{part.name}.{uuid.uuid4().hex}")
+        if self.file_format == "parquet":
+            df.to_parquet(str(tmp_part), index=False)
+        else:
+            df.to_csv(str(tmp_part), index=False)
+        os.replace(str(tmp_part), str(part))
+
+    def _read_part(self, part: Path) -> pd.DataFrame:
+        if self.file_format == "parquet":
+            return pd.read_parquet(str(part))
+        else:
+            return pd.read_csv(str(part))
+
+    def get_nodes(self) -> Dict[Tuple[str, ...], List[int]]:
+        """Gets the steps each saved branch option was saved in, from the index"""
+        if self.nodes is None:
+            self.nodes = {}
+            if self.index_file.exists():
+                with open(self.index_file, "r") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        step, option = line.split(",", 1)
+                        self._add_node(int(step), tuple(option.split("/")) if option else ())
+        return self.nodes
+
+    def _add_node(self, step: int, option: Tuple[str, ...]) -> None:
+        steps = self.nodes.setdefault(option, [])
+        if step not in steps:
+            steps.append(step)
+            steps.sort()
+
+    def save(self, step: int, option: List[str], sol_results_dir: str, actual_years: List[int]) -> None:
+        """Saves the results of the actual years of a branch
+
+        Saving a branch again replaces its previous results.
+
+        Args:
+            step: int
+            option: List[str]
+            sol_results_dir: str
+                Folder of the result CSVs of the branch
+            actual_years: List[int]
+                Actual years of the step to save results for
+        """
+        if not Path(sol_results_dir).exists(): # failed solve
+            return
+
+        for result_file in Path(sol_results_dir).glob("*.csv"):
+            df = pd.read_csv(str(result_file))
+            if "YEAR" in df.columns:
+                df = df.loc[df["YEAR"].isin(actual_years)].reset_index(drop=True)
+            self._write_part(df, self.get_part(result_file.stem, step, option))
+
+        nodes = self.get_nodes()
+        if step not in nodes.get(tuple(option), []):
+            self._add_node(step, tuple(option))
+            with open(self.index_file, "a") as f:
+                f.write(f"{step},{'/'.join(option)}\n")
+
+    def get_path_nodes(self, option: List[str]) -> List[Tuple[int, Tuple[str, ...]]]:
+        """Gets the saved branches a path through the tree descends from, in the order of the steps
+
+        Args:
+            option: List[str]
+                Options of the path, ie. ['1A0-1B1', '2C0']
+
+        Returns:
+            List[Tuple[int, Tuple[str, ...]]]
+                Step and option of each branch
+        """
+        nodes = self.get_nodes()
+        path_nodes = []
+        for depth in range(len(option) + 1):
+            prefix = tuple(option[:depth])
+            path_nodes.extend((step, prefix) for step in nodes.get(prefix, []))
+        return sorted(path_nodes, key=lambda node: node[0])
+
+    def get_variables(self) -> List[str]:
+        """Gets the names of all saved variables"""
+        return sorted(path.name.split("=", 1)[1] for path in self.store_dir.glob("variable=*"))
+
+    def read_path(self, option: List[str], variable: str, parts: Dict[Path, pd.DataFrame] = None) -> pd.DataFrame:
+        """Reads the results of a variable along a path through the tree
+
+        Args:
+            option: List[str]
+                Options of the path, ie. ['1A0-1B1', '2C0']
+            variable: str
+            parts: Dict[Path, pd.DataFrame] = None
+                Files read before, to share between paths
+
+        Returns:
+            pd.DataFrame
+                Results saved by the branches the path descends from, or None
+                if there are none
+        """
+        if parts is None:
+            parts = {}
+        dfs = []
+        for step, node in self.get_path_nodes(option):
+            part = self.get_part(variable, step, list(node))
+            if part not in parts:
+                parts[part] = self._read_part(part) if part.exists() else None
+            if parts[part] is not None:
+                dfs.append(parts[part])
+        if not dfs:
+            return None
+
+        df = pd.concat(dfs)
+        if all(param in df.columns.to_list() for param in ["REGION", "TECHNOLOGY", "YEAR"]):
+            df = df.sort_values(by = ["REGION", "TECHNOLOGY", "YEAR"])
+        elif all(param in df.columns.to_list() for param in ["REGION", "YEAR"]):
+            df = df.sort_values(by = ["REGION", "YEAR"])
+        return df
+
+    def read(self, variables: List[str] = None) -> pd.DataFrame:
+        """Reads the results of all branches as one table
+
+        Args:
+            variables: List[str] = None
+                Only read these variables. All variables are read if not
+                provided
+
+        Returns:
+            pd.DataFrame
+                Results with the columns VARIABLE, STEP and BRANCH, the
+                indices of all variables and VALUE
+        """
+        if not variables:
+            variables = self.get_variables()
+        nodes = sorted((step, option) for option, steps in self.get_nodes().items() for step in steps)
+        dfs = []
+        for variable in variables:
+            for step, option in nodes:
+                part = self.get_part(variable, step, list(option))
+                if not part.exists():
+                    continue
+                df = self._read_part(part)
+                df.insert(0, "BRANCH", "/".join(option))
+                df.insert(0, "STEP", step)
+                df.insert(0, "VARIABLE", variable)
+                dfs.append(df)
+        if not dfs:
+            return pd.DataFrame(columns=["VARIABLE", "STEP", "BRANCH", "VALUE"])
+        df = pd.concat(dfs, ignore_index=True)
+        return df[[column for column in df.columns if column != "VALUE"] + ["VALUE"]]
+
+    def export_csv(self, results_dir: str, options: List[List[str]]) -> None:
+        """Writes the result CSVs of every path through the tree
+
+        The results of a path are written to its deepest result folder, ie.
+        results/1A0-1B1/2C0, see read_path()
+
+        Args:
+            results_dir: str
+                Result folder with a nested folder for every path
+            options: List[List[str]]
+                Options of the deepest result folders, see
+                manifest.RunManifest.get_result_options()
+        """
+        for variable in self.get_variables():
+            parts = {}
+            for option in options:
+                df = self.read_path(option, variable, parts)
+                if df is not None:
+                    Path(results_dir, *option).mkdir(parents=True, exist_ok=True)
+                    df.to_csv(str(Path(results_dir, *option, f"{variable}.csv")), index=False)
@@ -0,0 +1,179 @@
+"""Sampling of paths through the scenario tree
+
+A path picks one option combination in every step with options, ie.
+('1A0-1B1', '2C0'), and ends in a leaf of the tree. Instead of running every
+path, a reproducible subset of paths is run. Only the branches on the sampled
+paths are built and solved, and branches shared by several paths are solved
+once.
+"""
+
+from typing import Dict, List, Tuple
+from pathlib import Path
+from functools import reduce
+import logging
+import operator
+import random
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_METHODS = ["uniform", "stratified", "list"]
+
+def get_option_steps(options_per_step: Dict[int, List[str]]) -> List[int]:
+    """Gets the steps with options, in order"""
+    return [step for step in sorted(options_per_step) if options_per_step[step]]
+
+def get_num_paths(options_per_step: Dict[int, List[str]]) -> int:
+    """Gets the number of paths through the full scenario tree"""
+    return reduce(operator.mul, (len(options_per_step[step]) for step in get_option_steps(options_per_step)), 1)
+
+def sample_uniform(options_per_step: Dict[int, List[str]], size: int, seed: int = 0) -> List[Tuple[str, ...]]:
+    """Samples paths uniformly at random, without replacement
+
+    Paths are drawn by their position in the full tree, so the tree is never
+    enumerated.
+
+    Args:
+        options_per_step: Dict[int, List[str]]
+            Options per step, with the step number appended
+        size: int
+            Number of paths to sample
+        seed: int = 0
+            Seed of the random number generator
+
+    Returns:
+        List[Tuple[str, ...]]
+            Sampled paths, in the order of the full tree
+    """
+    option_steps = get_option_steps(options_per_step)
+    num_paths = get_num_paths(options_per_step)
+    rng = random.Random(seed)
+    positions = sorted(rng.sample(range(num_paths), min(size, num_paths)))
+
+    paths = []
+    for position in positions:
+        path = []
+        for step in reversed(option_steps):
+            position, index = divmod(position, len(options_per_step[step]))
+            path.insert(0, options_per_step[step][index])
+        paths.append(tuple(path))
+    return paths
+
+def sample_stratified(options_per_step: Dict[int, List[str]], size: int, seed: int = 0) -> List[Tuple[str, ...]]:
+    """Samples paths so that every option of every scenario is run
+
+    Each scenario cycles through its options, shuffled again in every cycle
+    and independently of the other scenarios, as in a Latin hypercube. All
+    options are covered once size is at least the largest number of options
+    of a scenario. Paths drawn more than once are replaced by paths sampled
+    uniformly, see sample_uniform().
+
+    Args:
+        options_per_step: Dict[int, List[str]]
+            Options per step, with the step number appended
+        size: int
+            Number of paths to sample
+        seed: int = 0
+            Seed of the random number generator
+
+    Returns:
+        List[Tuple[str, ...]]
+            Sampled paths. Fewer than size only if the tree has fewer paths
+    """
+    rng = random.Random(seed)
+
+    # options of each scenario, by their position in the option name, ie. A and B in 1A0-1B1
+    scenario_options = []
+    for step in get_option_steps(options_per_step):
+        num_scenarios = len(options_per_step[step][0].split("-"))
+        for position in range(num_scenarios):
+            options = []
+            for grouped_option in options_per_step[step]:
+                option = grouped_option.split("-")[position]
+                if option not in options:
+                    options.append(option)
+            scenario_options.append((step, options))
+
+    max_options = max([len(options) for _, options in scenario_options], default=0)
+    if size < max_options:
+        logger.warning(f"A sample of {size} paths can not cover all {max_options} options of a scenario")
+
+    size = min(size, get_num_paths(options_per_step))
+    cycles = [[] for _ in scenario_options] # options left in the current cycle of each scenario
+    paths = []
+    seen = set()
+    for _ in range(size):
+        grouped_options = {}
+        for cycle, (step, options) in zip(cycles, scenario_options):
+            if not cycle:
+                cycle.extend(rng.sample(options, len(options)))
+            grouped_options.setdefault(step, []).append(cycle.pop())
+        path = tuple("-".join(grouped_options[step]) for step in sorted(grouped_options))
+        if path not in seen:
+            seen.add(path)
+            paths.append(path)
+
+    for path in sample_uniform(options_per_step, size, seed):
+        if len(paths) == size:
+            break
+        if path not in seen:
+            seen.add(path)
+            paths.append(path)
+    return paths
+
+def read_paths(path_file: str, options_per_step: Dict[int, List[str]]) -> List[Tuple[str, ...]]:
+    """Reads paths from a file
+
+    The file holds one path per line, written as its results folder, ie.
+    '1A0-1B1/2C0'. Empty lines and lines starting with '#' are skipped.
+
+    Raises:
+        ValueError
+            If a path does not exist in the scenario tree
+    """
+    option_steps = get_option_steps(options_per_step)
+    paths = []
+    seen = set()
+    with open(path_file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = tuple(Path(line).parts)
+            if len(path) != len(option_steps):
+                raise ValueError(f"Path {line} does not pick an option for each of the steps {option_steps}")
+            for step, option in zip(option_steps, path):
+                if option not in options_per_step[step]:
+                    raise ValueError(f"Path {line} uses {option}, which is not an option of step {step}")
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+def get_option_combinations_per_step(options_per_step: Dict[int, List[str]], paths: List[Tuple[str, ...]]) -> Dict[int, List[List[str]]]:
+    """Gets the branches of each step that are on the sampled paths
+
+    Same as main_utils.get_option_combinations_per_step(), but limited to the
+    branches that lead to a sampled path. Branches shared by several paths
+    are only listed once.
+
+    Example:
+        >>> get_option_combinations_per_step(
+            {0: [], 1: [1A0, 1A1], 2: [2C0, 2C1]},
+            [(1A0, 2C1), (1A0, 2C0)]
+        )
+        >>> {0: [], 1: [[1A0]], 2: [[1A0, 2C1], [1A0, 2C0]]}
+    """
+    option_combos_per_step = {}
+    depth = 0
+    for step in range(0, max(options_per_step) + 1):
+        if options_per_step.get(step):
+            depth += 1
+        combos = []
+        seen = set()
+        if depth > 0:
+            for path in paths:
+                if path[:depth] not in seen:
+                    seen.add(path[:depth])
+                    combos.append(list(path[:depth]))
+        option_combos_per_step[step] = combos
+    return option_combos_per_step
@@ -0,0 +1,225 @@
+"""Pipelined execution of the scenario tree
+
+Each branch of the scenario tree only depends on its parent branch in the
+previous step. Instead of waiting for all branches of a step to finish, a
+branch is created and submitted as soon as its parent has been solved and has
+passed its capacity on.
+"""
+
+from typing import Dict, List, Tuple, Any
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import logging
+import sys
+from tqdm import tqdm
+
+from osemosys_step import branch, ledger, manifest, state
+from osemosys_step import results_store as rs
+
+logger = logging.getLogger(__name__)
+
+def get_branches_per_step(option_combos_per_step: Dict[int, List[List[str]]]) -> Dict[int, List[Tuple[str, ...]]]:
+    """Gets the branches of each step
+
+    A step without options is a single branch with an empty option tuple
+
+    Args:
+        option_combos_per_step: Dict[int, List[List[str]]]
+            output from main_utils.get_option_combinations_per_step()
+
+    Example:
+        >>> get_branches_per_step({0: [], 1: [[1A0], [1A1]]})
+        >>> {0: [()], 1: [(1A0,), (1A1,)]}
+    """
+    branches = {}
+    for step, options in option_combos_per_step.items():
+        if not options:
+            branches[step] = [()]
+        else:
+            branches[step] = [tuple(option) for option in options]
+    return branches
+
+def get_branch_children(branches_per_step: Dict[int, List[Tuple[str, ...]]]) -> Dict[Tuple[int, Tuple[str, ...]], List[Tuple[int, Tuple[str, ...]]]]:
+    """Maps each branch to the branches of the next step that depend on it
+
+    The parent of a branch is the branch of the previous step with the
+    longest option path that the branch starts with.
+
+    Args:
+        branches_per_step: Dict[int, List[Tuple[str, ...]]]
+            output from get_branches_per_step()
+
+    Returns:
+        Dict[Tuple[int, Tuple[str, ...]], List[Tuple[int, Tuple[str, ...]]]]
+            {(step, option): [(step + 1, child_option), ...]}
+
+    Example:
+        >>> get_branch_children({0: [()], 1: [(1A0,), (1A1,)], 2: [(1A0,), (1A1,)]})
+        >>> {
+            (0, ()): [(1, (1A0,)), (1, (1A1,))],
+            (1, (1A0,)): [(2, (1A0,))],
+            (1, (1A1,)): [(2, (1A1,))],
+            (2, (1A0,)): [],
+            (2, (1A1,)): [],
+        }
+    """
+    children = {}
+    for step in sorted(branches_per_step):
+        for option in branches_per_step[step]:
+            children[(step, option)] = []
+        if step - 1 not in branches_per_step:
+            continue
+        for option in branches_per_step[step]:
+            parents = [
+                parent for parent in branches_per_step[step - 1]
+                if option[:len(parent)] == parent
+            ]
+            if not parents:
+                logger.warning(f"No parent found for {option} in step {step}")
+                continue
+            parent = max(parents, key=len)
+            children[(step - 1, parent)].append((step, option))
+    return children
+
+def get_branch_parents(children: Dict[Tuple[int, Tuple[str, ...]], List[Tuple[int, Tuple[str, ...]]]]) -> Dict[Tuple[int, Tuple[str, ...]], Tuple[int, Tuple[str, ...]]]:
+    """Maps each branch that depends on another branch to its parent"""
+    return {child: node for node, child_branches in children.items() for child in child_branches}
+
+def select_branches(objectives: Dict[Tuple[str, ...], float], top_k: int = None, cost_gap: float = None) -> List[Tuple[str, ...]]:
+    """Selects the branches with the lowest objective values to expand
+
+    Args:
+        objectives: Dict[Tuple[str, ...], float]
+            Objective value of each solved branch of a step. Branches without
+            an objective value are ranked last
+        top_k: int = None
+            Maximum number of branches to select
+        cost_gap: float = None
+            Only select branches within this relative gap of the best
+            objective value, ie. 0.05 for 5%
+
+    Returns:
+        List[Tuple[str, ...]]
+            Selected branches, best first
+    """
+    ranked = sorted(objectives, key=lambda x: (objectives[x] is None, objectives[x] or 0))
+    if cost_gap is not None and ranked and objectives[ranked[0]] is not None:
+        best = objectives[ranked[0]]
+        ranked = [
+            option for option in ranked
+            if objectives[option] is not None and objectives[option] - best <= cost_gap * abs(best)
+        ]
+    if top_k is not None:
+        ranked = ranked[:top_k]
+    return ranked
+
+def get_root_branches(children: Dict[Tuple[int, Tuple[str, ...]], List[Tuple[int, Tuple[str, ...]]]]) -> List[Tuple[int, Tuple[str, ...]]]:
+    """Gets all branches that do not depend on another branch"""
+    has_parent = set()
+    for child_branches in children.values():
+        has_parent.update(child_branches)
+    return [node for node in children if node not in has_parent]
+
+def run_tree(
+    option_combos_per_step: Dict[int, List[List[str]]],
+    settings: Dict[str, Any],
+    run_manifest: manifest.RunManifest,
+    cores: int = 1,
+    run_state: state.RunState = None
+) -> Dict[Tuple[int, Tuple[str, ...]], int]:
+    """Runs all branches of the scenario tree as soon as their parent is done
+
+    Args:
+        option_combos_per_step: Dict[int, List[List[str]]]
+            output from main_utils.get_option_combinations_per_step()
+        settings: Dict[str, Any]
+            Run settings passed to branch.run_branch()
+        run_manifest: manifest.RunManifest
+            Nodes of the scenario tree. Failed branches are removed through
+            it, see manifest.RunManifest.fail(), and every finished branch is
+            marked as created.
+        cores: int
+            Number of branches to run at the same time
+        run_state: state.RunState = None
+            Record of completed stages. Completed stages of a previous run
+            are skipped and the stages of every finished branch are recorded.
+
+    Returns:
+        Dict[Tuple[int, Tuple[str, ...]], int]
+            Exit code of every branch that was run. Branches below a failed
+            branch are not run.
+    """
+    branches_per_step = get_branches_per_step(option_combos_per_step)
+    children = get_branch_children(branches_per_step)
+
+    store = rs.ResultsStore(settings["results_store"], settings.get("results_format", "csv"))
+    res_cap_ledger = ledger.ResidualCapacityLedger(settings["ledger_dir"])
+
+    exit_codes = {}
+    pbar = tqdm(total=len(children), desc="Building and Solving Models", bar_format='{l_bar}{bar:10}{r_bar}{bar:-10b}')
+
+    with ProcessPoolExecutor(max_workers=max(1, int(cores))) as executor:
+        running = {}
+        ready = get_root_branches(children)
+
+        while ready or running:
+
+            # submit all branches whose parent is done
+            while ready:
+                node = ready.pop(0)
+                step, option = node
+                if run_state:
+                    done_stages = run_state.get_done_stages(
+                        step, list(option), settings["step_dir"], settings["solver"], store, res_cap_ledger, settings["num_steps"]
+                    )
+                else:
+                    done_stages = set()
+                if done_stages == set(state.STAGES): # finished in a previous run
+                    exit_codes[node] = 0
+                    pbar.update(1)
+                    ready.extend(children[node])
+                    continue
+                future = executor.submit(branch.run_branch, step, list(option), settings, done_stages)
+                running[future] = (node, done_stages)
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node, done_stages = running.pop(future)
+                step, option = node
+                try:
+                    exit_code = future.result()
+                except Exception as e:
+                    logger.error(f"Branch {option} in step {step} raised {e}")
+                    exit_code = 1
+                exit_codes[node] = exit_code
+                pbar.update(1)
+
+                if exit_code == 1:
+                    if run_state:
+                        run_state.remove(step, list(option))
+                    if run_manifest.fail(step, list(option)):
+                        logger.error("All runs failed, quitting...")
+                        sys.exit()
+                    skipped = count_descendants(node, children)
+                    pbar.update(skipped)
+                    continue
+
+                if run_state:
+                    for stage in state.STAGES:
+                        if stage not in done_stages:
+                            run_state.mark(step, list(option), stage)
+                run_manifest.mark_created(step, list(option))
+
+                ready.extend(children[node])
+
+    pbar.close()
+    return exit_codes
+
+def count_descendants(node: Tuple[int, Tuple[str, ...]], children: Dict[Tuple[int, Tuple[str, ...]], List[Tuple[int, Tuple[str, ...]]]]) -> int:
+    """Counts all branches that depend directly or indirectly on a branch"""
+    count = 0
+    for child in children[node]:
+        count += 1 + count_descendants(child, children)
+    return count
@@ -1,17 +1,31 @@
 """Module to hold solving logic"""
 
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, List, Set
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import sys
 import logging
 import subprocess
+import shutil
+import time
 import os
+import re
+import io
+import pandas as pd
 
-from otoole import convert_results
+from otoole import convert_results, read_results, write
+
+from osemosys_step import utils
 
 
 logger = logging.getLogger(__name__)
 
+# solvers that can read and write a basis file to warm start from
+WARM_START_SOLVERS = ["cbc", "gurobi", "cplex", "highs"]
+BASIS_FILE = "model.bas"
+# solution of a solve without a start basis, see main --cold_baseline
+COLD_SOLUTION_FILE = "cold.sol"
+
 def generate_results(sol_file: str, solver: str, config: Dict[str,Any], data_file: str = None, csv_data: str = None) -> None:
     """Converts a solution file to a folder of CSVs
 
@@ -34,6 +48,30 @@ def generate_results(sol_file: str, solver: str, config: Dict[str,Any], data_fil
 
     convert_results(config, solver, 'csv', sol_file, str(Path(sol_dir, "results")), 'datafile', data_file)
 
+def generate_results_from_solution(solution: pd.DataFrame, config: str, data_file: str, results_dir: str) -> None:
+    """Converts primal values in memory to a folder of CSVs
+
+    Same as generate_results(), without writing a solution file. The values
+    are passed to otoole in a buffer, in the Gurobi solution format
+
+    Args:
+        solution: pd.DataFrame
+            Output from solve_highs()
+        config: str
+            path to otoole configuration file
+        data_file: str
+            path to the data file of the model
+        results_dir: str
+            Folder to write the result CSVs to
+    """
+    buffer = io.StringIO()
+    buffer.write("# Solution held in memory\n# Objective value = 0\n")
+    names = solution["Variable"] + "(" + solution["Index"] + ")"
+    buffer.write("".join(names + " " + solution["Value"].map(repr) + "\n"))
+    buffer.seek(0)
+    results, default_values = read_results(config, "gurobi", buffer, "datafile", data_file)
+    write(config, "csv", results_dir, results, default_values)
+
 def create_lp(datafile: str, lp_file: str, osemosys: str, log_file:str = None) -> int:
     """Create the LP file using GLPK
 
@@ -63,6 +101,629 @@ def create_lp(datafile: str, lp_file: str, osemosys: str, log_file:str = None) -
     else:
         return 0
 
+def get_solver_command(lp_file: str, sol_file: str, solver: str, start_file: str = None, basis_file: str = None) -> str:
+    """Gets the shell command to solve an lp file
+
+    Mirrors the commands of the solve_lp rule in the snakefile
+
+    Args:
+        lp_file: str
+            path to lp file
+        sol_file: str
+            path to write the solution to
+        solver: str
+            One of 'cbc', 'gurobi', 'cplex' or 'glpk'
+        start_file: str = None
+            path to a basis file to start from. Not used by glpk
+        basis_file: str = None
+            path to write the final basis to. Not used by glpk
+
+    Returns:
+        str
+            Command to run
+    """
+    if solver == "gurobi":
+        ilp_file = str(Path(Path(sol_file).parent, "model.ilp"))
+        # the barrier method does not use a starting basis, so gurobi picks the method when starting from one
+        method = "" if start_file else "Method=2 "
+        start = f" InputFile={start_file}" if start_file else ""
+        basis = f" ResultFile={basis_file}" if basis_file else ""
+        return f"gurobi_cl {method}ResultFile={sol_file} ResultFile={ilp_file}{basis}{start} {lp_file}"
+    elif solver == "cbc":
+        start = f" -basisI {start_file}" if start_file else ""
+        basis = f" -basisO {basis_file}" if basis_file else ""
+        return f"cbc {lp_file}{start} solve -solu {sol_file}{basis}"
+    elif solver == "cplex":
+        start = f' "read {start_file}"' if start_file else ""
+        basis = f' "write {basis_file}"' if basis_file else ""
+        return f'cplex -c "read {lp_file}"{start} "optimize" "write {sol_file}"{basis}'
+    elif solver == "glpk":
+        # glpk solves from the datafile and writes result csvs relative to the run directory
+        return f"glpsol -m osemosys.txt -d data_pp.txt -w {Path(sol_file).name}"
+    else:
+        raise ValueError(f"Solver {solver} is not supported")
+
+def get_basis_names(basis_file: str) -> Set[str]:
+    """Gets the names of the variables and constraints in a basis file"""
+    names = set()
+    with open(basis_file, "r") as f:
+        for line in f:
+            if line.startswith(" "): # not NAME and ENDATA
+                names.update(line.split()[1:])
+    return names
+
+def get_lp_names(lp_file: str, names: Set[str]) -> Set[str]:
+    """Gets which of the given variables and constraints are in an lp file
+
+    The lp file is streamed, so only the names looked for are held in memory
+    and not every token of the lp file.
+    """
+    found = set()
+    with open(lp_file, "r") as f:
+        for line in f:
+            for token in line.split():
+                token = token.rstrip(":")
+                if token in names:
+                    found.add(token)
+            if len(found) == len(names):
+                break
+    return found
+
+def map_basis(basis_file: str, lp_file: str, start_file: str) -> int:
+    """Maps a basis of another model onto the names of an lp file
+
+    Variables and constraints are matched by name, ie.
+    NewCapacity(UTOPIA,E01,2030), so the basis of the parent step carries over
+    to the years the steps share. Entries of names that are not in the lp file
+    are dropped, and the solver repairs the basis for the rest.
+
+    Args:
+        basis_file: str
+            Basis in MPS format, written by another solve
+        lp_file: str
+            lp file to start
+        start_file: str
+            path to write the mapped basis to
+
+    Returns:
+        int
+            Number of basis entries kept
+    """
+    names = get_lp_names(lp_file, get_basis_names(basis_file))
+    kept = 0
+    with open(basis_file, "r") as f_in, open(start_file, "w") as f_out:
+        for line in f_in:
+            fields = line.split()
+            if not line.startswith(" ") or not fields: # NAME and ENDATA
+                f_out.write(line)
+            elif all(name in names for name in fields[1:]):
+                f_out.write(line)
+                kept += 1
+    return kept
+
+def get_primal_values(names: List[str], values: List[float]) -> pd.DataFrame:
+    """Gets the non zero primal values of the variables of a solution
+
+    Args:
+        names: List[str]
+            Column names, ie. NewCapacity(UTOPIA,E01,1990)
+        values: List[float]
+            Primal value of each column
+
+    Returns:
+        pd.DataFrame
+            Values in the wide format of otoole, with the columns 'Variable',
+            'Index' and 'Value'
+    """
+    df = pd.DataFrame({"Name": names, "Value": values})
+    df = df.loc[df["Value"].abs() >= 1e-6] # same threshold as otoole
+    df[["Variable", "Index"]] = df["Name"].str.split("(", n=1, expand=True)
+    df["Index"] = df["Index"].str.rstrip(")")
+    return df[["Variable", "Index", "Value"]].reset_index(drop=True).astype({"Value": float})
+
+# variable lines of each solution file format, {names} is replaced by the variables to read
+SOLUTION_PATTERNS = {
+    "cbc": r"^[\s*]*\d+\s+(?P<name>{names})\((?P<index>[^)]*)\)\s+(?P<value>\S+)",
+    "gurobi": r"^(?P<name>{names})\((?P<index>[^)]*)\)\s+(?P<value>\S+)",
+    "cplex": r'^\s*<variable name="(?P<name>{names})\((?P<index>[^)]*)\)"[^>]*\svalue="(?P<value>[^"]+)"',
+    "highs": r"^\s*\d+\s+\w+\s+\S+\s+\S+\s+(?P<value>\S+)\s+\S+\s+(?P<name>{names})\((?P<index>[^)]*)\)",
+}
+
+def get_solution_pattern(solver: str, variables: List[str] = None) -> re.Pattern:
+    """Gets the compiled pattern of the variable lines of a solution file
+
+    Args:
+        solver: str
+            One of 'cbc', 'gurobi', 'cplex' or 'highs'
+        variables: List[str] = None
+            Only match these variables, ie. ['NewCapacity']. All variables
+            are matched if not provided
+    """
+    if solver not in SOLUTION_PATTERNS:
+        raise ValueError(f"Can not read solution files of {solver}")
+    names = "|".join(re.escape(variable) for variable in variables) if variables else r"\w+"
+    return re.compile(SOLUTION_PATTERNS[solver].format(names=names))
+
+def read_solution(sol_file: str, solver: str, variables: List[str] = None) -> pd.DataFrame:
+    """Reads the non zero primal values of a solution file
+
+    The file is read line by line, without otoole, so only the variables
+    needed can be read from large solution files.
+
+    Args:
+        sol_file: str
+            Path to solution file
+        solver: str
+            One of 'cbc', 'gurobi', 'cplex' or 'highs'
+        variables: List[str] = None
+            Only read these variables, ie. ['NewCapacity']. All variables
+            are read if not provided
+
+    Returns:
+        pd.DataFrame
+            Values in the wide format of otoole, with the columns 'Variable',
+            'Index' and 'Value'
+
+    Example:
+        cbc:    0 NewCapacity(UTOPIA,E01,1990)   1.5   0
+        gurobi: NewCapacity(UTOPIA,E01,1990) 1.5
+        cplex:  <variable name="NewCapacity(UTOPIA,E01,1990)" index="0" value="1.5"/>
+        highs:  0 BS 0 inf 1.5 0 NewCapacity(UTOPIA,E01,1990)
+    """
+    match = get_solution_pattern(solver, variables).match
+    names, indices, values = [], [], []
+    with open(sol_file, "r") as f:
+        for line in f:
+            if solver == "highs" and line.startswith("Rows"): # constraints follow the columns
+                break
+            found = match(line)
+            if found:
+                names.append(found.group("name"))
+                indices.append(found.group("index"))
+                values.append(found.group("value"))
+
+    df = pd.DataFrame({"Variable": names, "Index": indices, "Value": pd.to_numeric(values, errors="coerce")})
+    df = df.loc[df["Value"].abs() >= 1e-6] # same threshold as otoole
+    return df.reset_index(drop=True).astype({"Value": float})
+
+def write_results(solution: pd.DataFrame, config: str, results_dir: str, variables: List[str] = None) -> List[str]:
+    """Writes the variables of a solution to result CSVs
+
+    Only results that are variables of the model can be written this way.
+    Results calculated from them, ie. TotalCapacityAnnual, are generated by
+    otoole, see generate_results()
+
+    Args:
+        solution: pd.DataFrame
+            Output from read_solution() or solve_highs()
+        config: str
+            path to otoole configuration file
+        results_dir: str
+            Folder to write the result CSVs to
+        variables: List[str] = None
+            Only write these variables. All variables of the otoole
+            configuration that are not calculated are written if not provided
+
+    Returns:
+        List[str]
+            Names of the variables written
+    """
+    user_config = utils.read_otoole_config(config)
+    if not variables:
+        variables = [
+            name for name, details in user_config.items()
+            if details["type"] == "result" and not details.get("calculated", True)
+        ]
+    Path(results_dir).mkdir(parents=True, exist_ok=True)
+
+    for variable in variables:
+        indices = user_config[variable]["indices"]
+        values = solution.loc[solution["Variable"] == variable]
+        df = pd.DataFrame(values["Index"].str.split(",", expand=True).to_numpy(), columns=indices) if not values.empty else pd.DataFrame(columns=indices)
+        for index in indices:
+            if user_config[index]["dtype"] == "int":
+                df[index] = df[index].astype(int)
+        df["VALUE"] = values["Value"].to_numpy()
+        df.to_csv(str(Path(results_dir, f"{variable}.csv")), index=False)
+
+    return variables
+
+def solve_highs(lp_file: str, sol_file: str, log_file: str, start_file: str = None, basis_file: str = None) -> Union[pd.DataFrame, None]:
+    """Solves an lp file with HiGHS in the current process
+
+    Needs the optional highspy package. The solution file is written in the
+    format otoole reads, so the results can still be generated from it.
+
+    Args:
+        lp_file: str
+            path to lp file
+        sol_file: str
+            path to write the solution to
+        log_file: str
+            path to the solver log
+        start_file: str = None
+            basis to start from, written by write_highs_basis()
+        basis_file: str = None
+            path to write the final basis to
+
+    Returns:
+        pd.DataFrame
+            Non zero primal values, see get_primal_values(). None if the
+            model is not solved to optimality
+    """
+    try:
+        import highspy
+    except ImportError:
+        logger.error("Solving with highs needs highspy, install it with 'pip install highspy'")
+        return None
+
+    h = highspy.Highs()
+    h.setOptionValue("log_to_console", False)
+    h.setOptionValue("log_file", str(log_file))
+    if h.readModel(str(lp_file)) == highspy.HighsStatus.kError:
+        logger.error(f"HiGHS can not read {lp_file}")
+        return None
+    if start_file and h.setBasis(read_highs_basis(h, start_file)) == highspy.HighsStatus.kError:
+        logger.warning(f"HiGHS can not start {lp_file} from {start_file}")
+    h.run()
+
+    model_status = h.getModelStatus()
+    if model_status != highspy.HighsModelStatus.kOptimal:
+        logger.error(f"{lp_file} is {h.modelStatusToString(model_status)}")
+        return None
+
+    write_highs_solution(h, sol_file)
+    if basis_file:
+        write_highs_basis(h, basis_file)
+    return get_primal_values(h.getLp().col_names_, h.getSolution().col_value)
+
+def get_highs_statuses() -> Dict[Any, str]:
+    """Gets the code written for each HiGHS basis status"""
+    import highspy
+
+    return {
+        highspy.HighsBasisStatus.kLower: "LB",
+        highspy.HighsBasisStatus.kBasic: "BS",
+        highspy.HighsBasisStatus.kUpper: "UB",
+        highspy.HighsBasisStatus.kZero: "FR",
+        highspy.HighsBasisStatus.kNonbasic: "NB",
+    }
+
+def write_highs_basis(h, basis_file: str) -> None:
+    """Writes the basis of a HiGHS model by variable and constraint name
+
+    Highs.writeBasis() lists the statuses by position, so they can not be
+    mapped onto the lp of another step. Here each status is written next to
+    its name, one per line, so the basis can be mapped with map_basis() like
+    the basis files of the other solvers.
+
+    Args:
+        h: highspy.Highs
+            Model solved to optimality
+        basis_file: str
+            path to write the basis to
+
+    Example:
+        NAME
+        COLUMNS
+         BS NewCapacity(UTOPIA,E01,1990)
+        ROWS
+         LB EBa11_EnergyBalanceEachTS5(UTOPIA,ID,DSL,1990)
+        ENDATA
+    """
+    basis = h.getBasis()
+    if not basis.valid:
+        return
+    statuses = get_highs_statuses()
+    lp = h.getLp()
+    with open(basis_file, "w") as f:
+        f.write("NAME\nCOLUMNS\n")
+        f.writelines(f" {statuses[status]} {name}\n" for name, status in zip(lp.col_names_, basis.col_status))
+        f.write("ROWS\n")
+        f.writelines(f" {statuses[status]} {name}\n" for name, status in zip(lp.row_names_, basis.row_status))
+        f.write("ENDATA\n")
+
+def read_highs_basis(h, start_file: str):
+    """Reads a basis written by write_highs_basis() for the model of a HiGHS instance
+
+    Columns missing from the basis start at a bound and rows missing from it
+    start basic. The basis is passed as alien, so HiGHS completes it to a
+    valid basis before solving.
+
+    Args:
+        h: highspy.Highs
+            Model to start
+        start_file: str
+            Basis written by write_highs_basis(), ie. mapped with map_basis()
+
+    Returns:
+        highspy.HighsBasis
+    """
+    import highspy
+
+    codes = {code: status for status, code in get_highs_statuses().items()}
+    found = {"COLUMNS": {}, "ROWS": {}}
+    section = None
+    with open(start_file, "r") as f:
+        for line in f:
+            fields = line.split()
+            if not line.startswith(" "):
+                section = fields[0] if fields else None
+            elif section in found and len(fields) == 2:
+                found[section][fields[1]] = codes[fields[0]]
+
+    lp = h.getLp()
+    col_status = []
+    for name, lower, upper in zip(lp.col_names_, lp.col_lower_, lp.col_upper_):
+        if lower > -highspy.kHighsInf:
+            default = highspy.HighsBasisStatus.kLower
+        elif upper < highspy.kHighsInf:
+            default = highspy.HighsBasisStatus.kUpper
+        else:
+            default = highspy.HighsBasisStatus.kZero
+        col_status.append(found["COLUMNS"].get(name, default))
+
+    basis = highspy.HighsBasis()
+    basis.col_status = col_status
+    basis.row_status = [found["ROWS"].get(name, highspy.HighsBasisStatus.kBasic) for name in lp.row_names_]
+    basis.alien = True
+    return basis
+
+def write_highs_solution(h, sol_file: str) -> None:
+    """Writes the solution of a HiGHS model in the pretty style at full precision
+
+    Highs.writeSolution() rounds the pretty style, as read by otoole, to six
+    significant digits. The values are written here with enough digits to
+    read back the same floats, so results generated from the file are the
+    same as the ones from the values in memory.
+
+    Args:
+        h: highspy.Highs
+            Model solved to optimality
+        sol_file: str
+            path to write the solution to
+    """
+    import highspy
+
+    statuses = get_highs_statuses()
+    lp = h.getLp()
+    solution = h.getSolution()
+    basis = h.getBasis()
+
+    def get_lines(names, lower, upper, primal, dual, status):
+        lines = ["    Index Status        Lower        Upper       Primal         Dual  Name\n"]
+        for num, name in enumerate(names):
+            if not basis.valid:
+                code = ""
+            elif status[num] == highspy.HighsBasisStatus.kLower and lower[num] == upper[num]:
+                code = "FX"
+            else:
+                code = statuses[status[num]]
+            lines.append(
+                f"{num:9d} {code:>6} {lower[num]:>12.17g} {upper[num]:>12.17g} "
+                f"{primal[num]:>12.17g} {dual[num]:>12.17g}  {name}\n"
+            )
+        return lines
+
+    with open(sol_file, "w") as f:
+        f.write("Columns\n")
+        f.writelines(get_lines(lp.col_names_, lp.col_lower_, lp.col_upper_, solution.col_value, solution.col_dual, basis.col_status))
+        f.write("Rows\n")
+        f.writelines(get_lines(lp.row_names_, lp.row_lower_, lp.row_upper_, solution.row_value, solution.row_dual, basis.row_status))
+        f.write(f"\nModel status: {h.modelStatusToString(h.getModelStatus())}\n")
+        f.write(f"\nObjective value: {h.getInfo().objective_function_value!r}\n")
+
+def solve_lp(lp_file: str, solver: str, log_file: str, solve_time_file: str, osemosys: str = None, start_basis: str = None, write_basis: bool = False, sol_name: str = "model.sol") -> int:
+    """Solves a single lp file
+
+    Writes the solver output to log_file and the wall clock solve time to
+    solve_time_file, in the same format as the snakefile does.
+
+    Args:
+        lp_file: str
+            path to lp file. The solution is written next to it
+        solver: str
+            One of 'cbc', 'gurobi', 'cplex', 'glpk' or 'highs'
+        log_file: str
+            path to the solver log
+        solve_time_file: str
+            path to the solve time log
+        osemosys: str
+            path to the osemosys model file. Only needed for glpk
+        start_basis: str = None
+            basis of another branch to warm start from
+        write_basis: bool = False
+            Write the final basis next to the solution, to warm start others
+        sol_name: str = "model.sol"
+            Name of the solution file. Not used by glpk
+
+    Returns:
+        0: int
+            If a solution file was written
+        1: int
+            If not successful
+    """
+    sol_dir = Path(lp_file).parent
+    sol_file = Path(sol_dir, "model.sol" if solver == "glpk" else sol_name)
+    Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+
+    start_file = None
+    if solver != "glpk" and start_basis and Path(start_basis).exists():
+        start_file = str(Path(sol_dir, "start.bas"))
+        if map_basis(start_basis, lp_file, start_file) == 0:
+            start_file = None
+    basis_file = str(Path(sol_dir, BASIS_FILE)) if write_basis else None
+
+    if solver == "highs":
+        start_time = time.perf_counter()
+        solve_highs(lp_file, str(sol_file), log_file, start_file, basis_file)
+        with open(solve_time_file, "w") as f:
+            f.write(f"Solve Time: {time.perf_counter() - start_time:.3f} seconds")
+        return 0 if sol_file.exists() else 1
+
+    if solver == "glpk":
+        shutil.copy(str(osemosys), str(Path(sol_dir, "osemosys.txt")))
+        Path(sol_dir, "results").mkdir(exist_ok=True)
+        cwd = str(sol_dir)
+        cmd = get_solver_command(lp_file, str(sol_file), solver)
+    else:
+        cwd = None
+        cmd = get_solver_command(lp_file, str(sol_file), solver, start_file, basis_file)
+
+    start_time = time.perf_counter()
+    with open(log_file, "w") as f:
+        subprocess.run(cmd, shell=True, stdout=f, stderr=subprocess.STDOUT, cwd=cwd)
+    solve_time = time.perf_counter() - start_time
+
+    with open(solve_time_file, "w") as f:
+        f.write(f"Solve Time: {solve_time:.3f} seconds")
+
+    if not sol_file.exists():
+        logger.error(f"Can not solve {lp_file} with the command {cmd}")
+        return 1
+    else:
+        return 0
+
+def solve_lps(lp_files: List[str], solver: str, cores: int = 1, step_dir: str = "steps", log_dir: str = "logs/solves", osemosys: str = None, start_bases: Dict[str, str] = None, write_basis: bool = False, sol_name: str = "model.sol") -> Dict[str, int]:
+    """Solves lp files in parallel
+
+    Native replacement for calling the snakefile. Logs are written to
+    log_dir/<option path>/model.log and log_dir/<option path>/solve_time.log,
+    where the option path is the location of the lp file relative to step_dir.
+
+    Args:
+        lp_files: List[str]
+            paths to lp files, ie. steps/step_1/1A0-1B0/model.lp
+        solver: str
+            One of 'cbc', 'gurobi', 'cplex', 'glpk' or 'highs'
+        cores: int
+            Number of solves to run at the same time
+        step_dir: str
+            Root directory of the step folders
+        log_dir: str
+            Root directory of the solve logs
+        osemosys: str
+            path to the osemosys model file. Only needed for glpk
+        start_bases: Dict[str, str] = None
+            basis file to warm start each lp file from
+        write_basis: bool = False
+            Write the final basis of each lp file
+        sol_name: str = "model.sol"
+            Name of the solution file written next to each lp file
+
+    Returns:
+        Dict[str, int]
+            Exit code of solve_lp for each lp file
+    """
+    if not lp_files:
+        return {}
+
+    if start_bases is None:
+        start_bases = {}
+
+    futures = {}
+    with ProcessPoolExecutor(max_workers=max(1, int(cores))) as executor:
+        for lp_file in lp_files:
+            option_log_dir = Path(log_dir, Path(lp_file).parent.relative_to(step_dir))
+            futures[lp_file] = executor.submit(
+                solve_lp,
+                lp_file,
+                solver,
+                str(Path(option_log_dir, "model.log")),
+                str(Path(option_log_dir, "solve_time.log")),
+                osemosys,
+                start_bases.get(lp_file),
+                write_basis,
+                sol_name
+            )
+
+    exit_codes = {}
+    for lp_file, future in futures.items():
+        try:
+            exit_codes[lp_file] = future.result()
+        except Exception as e:
+            logger.error(f"Solving {lp_file} raised {e}")
+            exit_codes[lp_file] = 1
+
+    return exit_codes
+
+def read_solve_time(solve_time_file: str) -> float:
+    """Reads the seconds from a solve time log, or None if it is missing"""
+    if not Path(solve_time_file).exists():
+        return None
+    with open(solve_time_file, "r") as f:
+        match = re.search(r"Solve Time:\s+(\S+) seconds", f.read())
+    return float(match.group(1)) if match else None
+
+def check_solution(sol_file: str, solver: str) -> int:
+    """Checks if a solution file exists and is optimal
+
+    Args:
+        sol_file: str
+            Path to solution file
+        solver: str
+            Solver that wrote the solution file
+
+    Returns:
+        0: int
+            If successful
+        1: int
+            If not successful
+    """
+    if not Path(sol_file).exists():
+        return 1
+    elif solver == "cbc":
+        return check_cbc_feasibility(sol_file)
+    elif solver == "glpk":
+        return check_glpk_feasibility(sol_file)
+    elif solver == "gurobi":
+        return check_gurobi_feasibility(sol_file)
+    elif solver == "highs":
+        return check_highs_feasibility(sol_file)
+    elif solver == "cplex":
+        print("CPLEX solution not checked")
+    return 0
+
+def get_objective(sol_file: str, solver: str) -> float:
+    """Gets the objective value from the header of a solution file
+
+    Args:
+        sol_file: str
+            Path to solution file
+        solver: str
+            Solver that wrote the solution file
+
+    Returns:
+        float
+            Objective value, or None if it can not be read
+
+    Example:
+        cbc:    Optimal - objective value 16068.99340000
+        glpk:   c Objective:  cost = 16068.9934 (MINimum)
+        gurobi: # Objective value = 1.6068993400000e+04
+        cplex:  objectiveValue="16068.9934"
+        highs:  Objective value: 16068.9934
+    """
+    patterns = {
+        "cbc": r"objective value\s+(\S+)",
+        "glpk": r"Objective:\s+\S+\s+=\s+(\S+)",
+        "gurobi": r"Objective value\s+=\s+(\S+)",
+        "cplex": r'objectiveValue="([^"]+)"',
+        "highs": r"Objective value:\s+(\S+)",
+    }
+    if solver not in patterns or not Path(sol_file).exists():
+        return None
+    with open(sol_file, "r") as f:
+        for num, line in enumerate(f):
+            if num > 50 and solver != "highs": # only the header, highs writes it last
+                break
+            match = re.search(patterns[solver], line)
+            if match:
+                try:
+                    return float(match.group(1))
+                except ValueError:
+                    return None
+    return None
 
 def check_cbc_feasibility(sol: str) -> int:
     """Checks if the CBC solution is optimal
@@ -135,6 +796,35 @@ def check_gurobi_feasibility(sol: str) -> int:
     else:
         return 1
 
+def check_highs_feasibility(sol: str) -> int:
+    """Checks if the HiGHS solution is optimal
+
+    The model status is written after the columns and rows, so only the end
+    of the file is read
+
+    Args:
+        sol: str
+            Path to HiGHS solution file
+
+    Returns:
+        0: int
+            If successful
+        1: int
+            If not successful
+
+    Model status: Optimal
+
+    Objective value: 16068.9934
+    """
+    with open(sol, "rb") as f:
+        f.seek(max(0, Path(sol).stat().st_size - 4096))
+        tail = f.read().decode(errors="ignore")
+    match = re.search(r"^Model status\s*:\s*(.+)$", tail, re.MULTILINE)
+    if match and match.group(1).strip() == "Optimal":
+        return 0
+    else:
+        return 1
+
 def get_nth_line(file_path: str, n: int):
     """Gets nth line from a textfile"""
     with open(file_path, 'r') as file:
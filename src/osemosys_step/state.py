@@ -0,0 +1,182 @@
+"""Record of the progress of a run, used to resume an interrupted run
+
+Every stage a branch completes is appended as a line to ``state.csv``, so the
+record survives a crash at any point. The run settings are kept next to it in
+``settings.json`` to make sure a run is only resumed with the same inputs.
+"""
+
+from typing import Dict, List, Any, Set, Tuple
+from pathlib import Path
+import json
+import logging
+
+from osemosys_step import branch, ledger, solve
+from osemosys_step import results_store as rs
+
+logger = logging.getLogger(__name__)
+
+# stages of a branch, in the order they are run
+STAGES = ["data", "lp", "solved", "results", "carried"]
+
+class RunState:
+    """Stages completed by each branch of the scenario tree
+
+    Args:
+        state_dir: str
+            Directory to keep the state files in
+    """
+
+    def __init__(self, state_dir: str):
+        self.state_file = Path(state_dir, "state.csv")
+        self.settings_file = Path(state_dir, "settings.json")
+        self.stages = {}
+        self._load()
+
+    @staticmethod
+    def get_key(step: int, option: List[str]) -> str:
+        """Gets the identifier of a branch, ie. '2:1A0-1B1/2C0'"""
+        return f"{step}:{'/'.join(option)}"
+
+    def _load(self) -> None:
+        if not self.state_file.exists():
+            return
+        with open(self.state_file, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                key, stage = line.rsplit(",", 1)
+                if stage == "removed":
+                    self.stages.pop(key, None)
+                else:
+                    self.stages.setdefault(key, set()).add(stage)
+
+    def _append(self, key: str, stage: str) -> None:
+        with open(self.state_file, "a") as f:
+            f.write(f"{key},{stage}\n")
+
+    def reset(self, settings: Dict[str, Any]) -> None:
+        """Clears the record and starts a new run with the given settings"""
+        self.stages = {}
+        if self.state_file.exists():
+            self.state_file.unlink()
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.settings_file, "w") as f:
+            json.dump({"settings": settings, "setup": False}, f)
+
+    def can_resume(self, settings: Dict[str, Any]) -> bool:
+        """Checks if the recorded run was set up with the same settings"""
+        if not self.settings_file.exists():
+            logger.warning("No previous run to resume")
+            return False
+        with open(self.settings_file, "r") as f:
+            recorded = json.load(f)
+        if not recorded["setup"]:
+            logger.warning("Previous run did not finish setting up the data")
+            return False
+        if recorded["settings"] != settings:
+            logger.warning(f"Previous run used settings {recorded['settings']}, not {settings}")
+            return False
+        return True
+
+    def mark_setup(self) -> None:
+        """Records that the data of all steps has been set up"""
+        with open(self.settings_file, "r") as f:
+            recorded = json.load(f)
+        recorded["setup"] = True
+        with open(self.settings_file, "w") as f:
+            json.dump(recorded, f)
+
+    def mark(self, step: int, option: List[str], stage: str) -> None:
+        """Records that a branch completed a stage"""
+        key = self.get_key(step, option)
+        self.stages.setdefault(key, set()).add(stage)
+        self._append(key, stage)
+
+    def get_unsaved(self) -> List[Tuple[int, List[str]]]:
+        """Gets the branches that passed their capacity on without saving their results
+
+        Returns:
+            List[Tuple[int, List[str]]]
+                Step and option of each branch, in the order of the steps
+        """
+        unsaved = []
+        for key, stages in self.stages.items():
+            if "carried" in stages and "results" not in stages:
+                step, option = key.split(":", 1)
+                unsaved.append((int(step), option.split("/") if option else []))
+        return sorted(unsaved, key=lambda item: item[0])
+
+    def remove(self, step: int, option: List[str]) -> None:
+        """Forgets all stages of a failed branch"""
+        key = self.get_key(step, option)
+        self.stages.pop(key, None)
+        self._append(key, "removed")
+
+    def get_done_stages(
+        self,
+        step: int,
+        option: List[str],
+        step_dir: str,
+        solver: str,
+        store: rs.ResultsStore,
+        res_cap_ledger: ledger.ResidualCapacityLedger,
+        num_steps: int
+    ) -> Set[str]:
+        """Gets the completed stages of a branch whose artifacts are still valid
+
+        Stages are checked in order and the first stage with a missing or
+        invalid artifact invalidates all later stages. The record of the
+        branch is set back to the stages that are still valid, so that the
+        branch is run again from its first missing stage.
+
+        Args:
+            step: int
+            option: List[str]
+            step_dir: str
+            solver: str
+            store: rs.ResultsStore
+                Results store the results of the branch are saved to
+            res_cap_ledger: ledger.ResidualCapacityLedger
+                Ledger the branch passes its capacity on to
+            num_steps: int
+                Last step, which passes no capacity on
+
+        Returns:
+            Set[str]
+                Stages of the branch that are done, see STAGES
+        """
+        key = self.get_key(step, option)
+        recorded = self.stages.get(key, set())
+        if not recorded:
+            return set()
+
+        branch_dir = branch.get_branch_dir(step_dir, step, option)
+        results = Path(branch_dir, "results")
+        checks = {
+            "data": lambda: Path(branch_dir, "data_pp.txt").exists() and Path(branch_dir, "data.txt").exists(),
+            "lp": lambda: Path(branch_dir, "model.lp").exists(),
+            "solved": lambda: solve.check_solution(str(Path(branch_dir, "model.sol")), solver) == 0,
+            "results": lambda: (
+                results.exists()
+                and step in store.get_nodes().get(tuple(option), [])
+                and all(store.get_part(f.stem, step, option).exists() for f in results.glob("*.csv"))
+            ),
+            "carried": lambda: step >= num_steps or res_cap_ledger.get_checkpoint(step, option).exists(),
+        }
+
+        done = set()
+        for stage in STAGES:
+            if stage == "results" and stage not in recorded and "carried" in recorded:
+                continue # results deferred to the end of the run, see get_unsaved()
+            if stage not in recorded or not checks[stage]():
+                break
+            done.add(stage)
+
+        if done != recorded:
+            logger.warning(f"Branch {option} in step {step} is run again from its {sorted(recorded - done, key=STAGES.index)[0]} stage")
+            self.remove(step, option)
+            for stage in STAGES:
+                if stage in done:
+                    self.mark(step, option, stage)
+        return done
@@ -46,7 +46,30 @@ def format_step_input(steps: Tuple) -> List[int]:
 
     return [int(s) for s in steps]
 
-def copy_csvs(src: str, dst: str) -> None:
+# linux ioctl that makes a file share the blocks of another, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+def reflink_file(src: str, dst: str) -> bool:
+    """Makes dst a copy on write clone of src, if the file system supports it
+
+    Returns:
+        bool
+            True if the file was cloned
+    """
+    try:
+        import fcntl
+    except ImportError: # windows
+        return False
+    with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+        try:
+            fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+            return True
+        except OSError:
+            pass
+    os.remove(dst)
+    return False
+
+def copy_csvs(src: str, dst: str, link: bool = False) -> None:
     """Copies directories of CSV data
 
     Args:
@@ -54,61 +77,27 @@ def copy_csvs(src: str, dst: str) -> None:
             Source directory
         dst: str
             Destination directory
+        link: bool = False
+            Clone the files if the file system supports it, else hardlink
+            them, instead of copying. A hardlinked file must be removed
+            before it is written to, so that the source is not changed too
     """
+    reflink = link
     for f in os.listdir(src):
         source_file = os.path.join(src, f)
         dst_file = os.path.join(dst, f)
-        shutil.copy(source_file, dst_file)
-
-def get_subdirectories(directory: str):
-    """Gets all subdirectories"""
-    subdirectories = []
-    directory_path = Path(directory)
-    for path in directory_path.iterdir():
-        if path.is_dir():
-            if check_for_subdirectory(str(path)):
-                subdirectories.extend(get_subdirectories(path))
-            else:
-                subdirectories.append(path)
-
-    return subdirectories
-
-def check_for_subdirectory(directory: str):
-    """Checks if there is a subdirectory present"""
-    directory_path = Path(directory)
-    for path in directory_path.iterdir():
-        if path.is_dir():
-            return True
-    return False
-
-def concat_dataframes(src: pd.DataFrame, dst: pd.DataFrame, years: list[int] = None) -> pd.DataFrame:
-    """Combines two dfs together
-
-    Args:
-        src: str,
-            first df
-        dst: str,
-            Second df
-        years: list[int] = None
-            Years to filter source over. If none, no filtering happens
-
-    Returns:
-        pd.DataFrame
-            dataframes concatanted
-    """
-    if not (src.columns.to_list()) == (dst.columns.to_list()):
-        logger.error(f"columns for source are {src.columns} and columns to destination are {dst.columns}")
-        print("Exiting...")
-        sys.exit()
-    if years:
-        if "YEAR" in src.columns:
-            src = src.loc[src["YEAR"].isin(years)].reset_index(drop=True)
-    df = pd.concat([dst, src])
-    if all(param in df.columns.to_list() for param in ["REGION", "TECHNOLOGY", "YEAR"]):
-        df = df.sort_values(by = ["REGION", "TECHNOLOGY", "YEAR"])
-    elif all(param in df.columns.to_list() for param in ["REGION", "YEAR"]):
-        df = df.sort_values(by = ["REGION", "YEAR"])
-    return df
+        if not link:
+            shutil.copy(source_file, dst_file)
+            continue
+        if os.path.lexists(dst_file):
+            os.remove(dst_file)
+        if reflink and reflink_file(source_file, dst_file):
+            continue
+        reflink = False # not supported, hardlink the rest
+        try:
+            os.link(source_file, dst_file)
+        except OSError: # ie. across file systems
+            shutil.copy(source_file, dst_file)
 
 def get_options_from_path(file_path: str, extension: str = None) -> Union[List[str], None]:
     """Parses a path to return options
@@ -145,3 +134,40 @@ def datafile_to_csv(datafile: str, csv_dir: str, config: str) -> None:
             otoole configuration data
     """
     convert(config, 'datafile', 'csv', datafile, csv_dir)
+
+def write_phase_times(phase_times: List[List[Any]], log_file: str) -> None:
+    """Writes a summary of the time spent in each phase of each step
+
+    Args:
+        phase_times: List[List[Any]]
+            [step, phase, number of branches, seconds] for each phase
+        log_file: str
+            Path to the csv file to write
+    """
+    df = pd.DataFrame(phase_times, columns=["STEP", "PHASE", "BRANCHES", "SECONDS"])
+    df["SECONDS_PER_BRANCH"] = (df["SECONDS"] / df["BRANCHES"].where(df["BRANCHES"] > 0)).round(3)
+    df["SECONDS"] = df["SECONDS"].round(3)
+    df.to_csv(log_file, index=False)
+    for phase, seconds in df.groupby("PHASE", sort=False)["SECONDS"].sum().items():
+        logger.info(f"Total time in {phase} phase: {seconds:.1f} seconds")
+
+def write_warm_starts(warm_starts: List[List[Any]], log_file: str) -> None:
+    """Writes the solve time saved by warm starting each branch
+
+    Args:
+        warm_starts: List[List[Any]]
+            [step, branch, start branch, seconds, cold seconds] for each
+            solve. The cold seconds are the solve time of the same lp without
+            a start basis, or None if it was not solved cold
+        log_file: str
+            Path to the csv file to write
+    """
+    df = pd.DataFrame(warm_starts, columns=["STEP", "BRANCH", "START", "SECONDS", "COLD_SECONDS"])
+    seconds = pd.to_numeric(df["SECONDS"])
+    df["SAVED_SECONDS"] = (pd.to_numeric(df["COLD_SECONDS"]) - seconds).round(3)
+    df.to_csv(log_file, index=False)
+    if df["SAVED_SECONDS"].isna().all():
+        logger.info("Warm start savings are only measured with --cold_baseline")
+        return
+    saved = df["SAVED_SECONDS"].sum()
+    logger.info(f"Warm starts saved {saved:.1f} seconds of solve time compared to solving without a start basis")
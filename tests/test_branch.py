@@ -0,0 +1,123 @@
+from pathlib import Path
+from pytest import raises
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from otoole import convert
+from osemosys_step import branch
+
+COLUMNS = ["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+SUPER_SIMPLE = Path(Path(__file__).parent, "fixtures", "super_simple")
+
+class TestMaterializeBranch:
+
+    def test_copies_reference_data_and_applies_options(self, tmp_path):
+        data_dir = tmp_path / "data"
+        (data_dir / "data_1").mkdir(parents=True)
+        pd.DataFrame([["R", "T", 2020, 1], ["R", "T", 2021, 1]], columns=COLUMNS).to_csv(data_dir / "data_1" / "CapitalCost.csv", index=False)
+        pd.DataFrame([["R", "T", 2020, 0]], columns=COLUMNS).to_csv(data_dir / "data_1" / "ResidualCapacity.csv", index=False)
+        option_data_by_param = {
+            "1A0": {"CapitalCost": pd.DataFrame([["R", "T", 2021, 5]], columns=COLUMNS)},
+            "1B1": {},
+        }
+
+        for _ in range(2): # redoing gives the same data
+            branch.materialize_branch(1, ["1A0-1B1"], str(data_dir), str(tmp_path / "steps"), option_data_by_param, [2020, 2021])
+
+        assert (tmp_path / "steps" / "step_1" / "1A0-1B1").is_dir()
+        capital_cost = pd.read_csv(data_dir / "step_1" / "1A0-1B1" / "CapitalCost.csv")
+        assert capital_cost["VALUE"].to_list() == [1, 5]
+        assert (data_dir / "step_1" / "1A0-1B1" / "ResidualCapacity.csv").exists()
+
+    def test_link_leaves_reference_data_unchanged(self, tmp_path):
+        data_dir = tmp_path / "data"
+        (data_dir / "data_1").mkdir(parents=True)
+        pd.DataFrame([["R", "T", 2020, 1], ["R", "T", 2021, 1]], columns=COLUMNS).to_csv(data_dir / "data_1" / "CapitalCost.csv", index=False)
+        pd.DataFrame([["R", "T", 2020, 0]], columns=COLUMNS).to_csv(data_dir / "data_1" / "ResidualCapacity.csv", index=False)
+        option_data_by_param = {"1A0": {"CapitalCost": pd.DataFrame([["R", "T", 2021, 5]], columns=COLUMNS)}}
+
+        for _ in range(2): # redoing gives the same data
+            branch.materialize_branch(1, ["1A0"], str(data_dir), str(tmp_path / "steps"), option_data_by_param, [2020, 2021], link=True)
+
+        assert pd.read_csv(data_dir / "step_1" / "1A0" / "CapitalCost.csv")["VALUE"].to_list() == [1, 5]
+        assert pd.read_csv(data_dir / "data_1" / "CapitalCost.csv")["VALUE"].to_list() == [1, 1]
+        assert (data_dir / "step_1" / "1A0" / "ResidualCapacity.csv").read_text() == (data_dir / "data_1" / "ResidualCapacity.csv").read_text()
+
+    def test_overlay_only_writes_changed_params(self, tmp_path):
+        data_dir = tmp_path / "data"
+        (data_dir / "data_1").mkdir(parents=True)
+        pd.DataFrame([["R", "T", 2020, 1], ["R", "T", 2021, 1]], columns=COLUMNS).to_csv(data_dir / "data_1" / "CapitalCost.csv", index=False)
+        pd.DataFrame([["R", "T", 2020, 0]], columns=COLUMNS).to_csv(data_dir / "data_1" / "ResidualCapacity.csv", index=False)
+        option_data_by_param = {"1A0": {"CapitalCost": pd.DataFrame([["R", "T", 2021, 5]], columns=COLUMNS)}}
+
+        branch.materialize_branch(1, ["1A0"], str(data_dir), str(tmp_path / "steps"), option_data_by_param, [2020, 2021], overlay=True)
+
+        assert [f.name for f in (data_dir / "step_1" / "1A0").iterdir()] == ["CapitalCost.csv"]
+        capital_cost = branch.get_branch_csv(str(data_dir), 1, ["1A0"], "CapitalCost")
+        assert pd.read_csv(capital_cost)["VALUE"].to_list() == [1, 5]
+        assert branch.get_branch_csv(str(data_dir), 1, ["1A0"], "ResidualCapacity") == data_dir / "data_1" / "ResidualCapacity.csv"
+
+    def test_read_overlay_same_as_full_copy(self, tmp_path):
+        config = str(SUPER_SIMPLE / "super_simple.yaml")
+        option_data_by_param = {"1A0": {"CapitalCost": pd.DataFrame([["BB", "gas_plant", 2016, 2.5]], columns=COLUMNS)}}
+        for name, overlay in [("full", False), ("overlay", True)]:
+            data_dir = tmp_path / name
+            convert(config, "datafile", "csv", str(SUPER_SIMPLE / "super_simple.txt"), str(data_dir / "data_1"))
+            branch.materialize_branch(1, ["1A0"], str(data_dir), str(tmp_path / "steps"), option_data_by_param, [2016], overlay=overlay)
+
+        expected, expected_defaults = branch.read_branch_data(1, ["1A0"], str(tmp_path / "full"), config)
+        actual, actual_defaults = branch.read_branch_data(1, ["1A0"], str(tmp_path / "overlay"), config, overlay=True)
+
+        assert actual_defaults == expected_defaults
+        assert sorted(actual) == sorted(expected)
+        for param in expected:
+            assert_frame_equal(actual[param], expected[param])
+        assert actual["CapitalCost"]["VALUE"].to_list() == [2.5]
+
+    def test_in_memory_only_creates_step_folder(self, tmp_path):
+        branch.materialize_branch(1, ["1A0"], str(tmp_path / "data"), str(tmp_path / "steps"), {"1A0": {}}, [2020], in_memory=True)
+        assert (tmp_path / "steps" / "step_1" / "1A0").is_dir()
+        assert not (tmp_path / "data").exists()
+
+class TestGetStartBasis:
+
+    def test_parent_keeps_options_of_earlier_steps(self):
+        assert branch.get_parent_option(2, ["1A0-1B1", "2C0"]) == ["1A0-1B1"]
+        assert branch.get_parent_option(2, ["1A0-1B1"]) == ["1A0-1B1"]
+        assert branch.get_parent_option(12, ["1A0", "11C0", "12D1"]) == ["1A0", "11C0"]
+
+    def test_start_from_parent_basis(self, tmp_path):
+        (tmp_path / "step_1" / "1A0").mkdir(parents=True)
+        assert branch.get_start_basis(2, ["1A0", "2C0"], str(tmp_path)) is None
+        (tmp_path / "step_1" / "1A0" / "model.bas").write_text("ENDATA\n")
+        assert branch.get_start_basis(2, ["1A0", "2C0"], str(tmp_path)) == str(tmp_path / "step_1" / "1A0" / "model.bas")
+
+class TestCreateLpNative:
+
+    def test_other_errors_are_not_built_with_glpsol(self, tmp_path, monkeypatch):
+        def build(data, defaults):
+            raise NotImplementedError("not a missing feature")
+        def create_lp(*args):
+            raise AssertionError("built with glpsol")
+        monkeypatch.setattr(branch.lp_builder, "build", build)
+        monkeypatch.setattr(branch, "create_lp", create_lp)
+        (tmp_path / "step_1").mkdir()
+        with raises(NotImplementedError):
+            branch.create_lp_native(1, [], "data", str(tmp_path), "config.yaml", "osemosys.txt", str(tmp_path), data={}, otoole_defaults={})
+
+    def test_unsupported_feature_built_with_glpsol(self, tmp_path, monkeypatch):
+        def build(data, defaults):
+            raise branch.lp_builder.UnsupportedFeatureError("storage")
+        monkeypatch.setattr(branch.lp_builder, "build", build)
+        monkeypatch.setattr(branch, "create_lp", lambda *args: 0)
+        (tmp_path / "step_1").mkdir()
+        assert branch.create_lp_native(1, [], "data", str(tmp_path), "config.yaml", "osemosys.txt", str(tmp_path), data={}, otoole_defaults={}) == 0
+
+class TestCopyBranchArtifacts:
+
+    def test_results_replace_existing_results(self, tmp_path):
+        (tmp_path / "step_1" / "1A0" / "results").mkdir(parents=True)
+        (tmp_path / "step_1" / "1A0" / "results" / "NewCapacity.csv").write_text("REGION,TECHNOLOGY,YEAR,VALUE\nR,T,2020,1\n")
+        (tmp_path / "step_1" / "1A1" / "results").mkdir(parents=True)
+        (tmp_path / "step_1" / "1A1" / "results" / "NewCapacity.csv").write_text("REGION,TECHNOLOGY,YEAR,VALUE\n")
+        branch.copy_branch_artifacts(1, ["1A0"], ["1A1"], str(tmp_path), results=True)
+        assert (tmp_path / "step_1" / "1A1" / "results" / "NewCapacity.csv").read_text() == "REGION,TECHNOLOGY,YEAR,VALUE\nR,T,2020,1\n"
@@ -0,0 +1,95 @@
+from pathlib import Path
+import pandas as pd
+from osemosys_step import cache
+
+def _write_branch(branch_dir: Path, content: str = "x"):
+    branch_dir.mkdir(parents=True, exist_ok=True)
+    for artifact in cache.ARTIFACTS:
+        (branch_dir / artifact).write_text(content)
+
+class TestArtifactCache:
+
+    def test_key_depends_on_csv_content(self, tmp_path):
+        csv_dir = tmp_path / "data"
+        csv_dir.mkdir()
+        model = tmp_path / "osemosys.txt"
+        model.write_text("model")
+        (csv_dir / "ResidualCapacity.csv").write_text("REGION,TECHNOLOGY,YEAR,VALUE\n")
+
+        key_1 = cache.ArtifactCache.get_key(str(csv_dir), [str(model)], "cbc")
+        assert key_1 == cache.ArtifactCache.get_key(str(csv_dir), [str(model)], "cbc")
+        assert key_1 != cache.ArtifactCache.get_key(str(csv_dir), [str(model)], "gurobi")
+
+        (csv_dir / "ResidualCapacity.csv").write_text("REGION,TECHNOLOGY,YEAR,VALUE\nR,T,2000,1\n")
+        assert key_1 != cache.ArtifactCache.get_key(str(csv_dir), [str(model)], "cbc")
+
+    def test_key_depends_on_settings(self, tmp_path):
+        csv_dir = tmp_path / "data"
+        csv_dir.mkdir()
+        model = tmp_path / "osemosys.txt"
+        model.write_text("model")
+        (csv_dir / "ResidualCapacity.csv").write_text("REGION,TECHNOLOGY,YEAR,VALUE\n")
+
+        settings = {"lp_builder": "glpsol", "warm_start": False, "cold_baseline": False}
+        key_1 = cache.ArtifactCache.get_key(str(csv_dir), [str(model)], "highs", settings=settings)
+        assert key_1 == cache.ArtifactCache.get_key(str(csv_dir), [str(model)], "highs", settings=dict(settings))
+        assert key_1 != cache.ArtifactCache.get_key(str(csv_dir), [str(model)], "highs", settings={**settings, "lp_builder": "native"})
+        assert key_1 != cache.ArtifactCache.get_key(str(csv_dir), [str(model)], "highs", settings={**settings, "warm_start": True})
+
+        data = {"ResidualCapacity": pd.DataFrame(columns=["REGION", "TECHNOLOGY", "YEAR", "VALUE"])}
+        key_2 = cache.ArtifactCache.get_data_key(data, [str(model)], "highs", settings)
+        assert key_2 != cache.ArtifactCache.get_data_key(data, [str(model)], "highs", {**settings, "lp_builder": "native"})
+        assert key_2 != cache.ArtifactCache.get_data_key(data, [str(model)], "highs", {**settings, "cold_baseline": True})
+
+    def test_key_of_overlay_same_as_full_copy(self, tmp_path):
+        model = tmp_path / "osemosys.txt"
+        model.write_text("model")
+        for name in ["reference", "full"]:
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "CapitalCost.csv").write_text("REGION,TECHNOLOGY,YEAR,VALUE\n")
+            (tmp_path / name / "ResidualCapacity.csv").write_text("REGION,TECHNOLOGY,YEAR,VALUE\n")
+        (tmp_path / "overlay").mkdir()
+        for name in ["full", "overlay"]:
+            (tmp_path / name / "CapitalCost.csv").write_text("REGION,TECHNOLOGY,YEAR,VALUE\nR,T,2000,1\n")
+
+        expected = cache.ArtifactCache.get_key(str(tmp_path / "full"), [str(model)], "cbc")
+        actual = cache.ArtifactCache.get_key(str(tmp_path / "overlay"), [str(model)], "cbc", reference_dir=str(tmp_path / "reference"))
+        assert actual == expected
+
+    def test_store_and_restore(self, tmp_path):
+        artifact_cache = cache.ArtifactCache(str(tmp_path / "cache"))
+        _write_branch(tmp_path / "a", "solved")
+        (tmp_path / "b").mkdir()
+
+        assert not artifact_cache.restore("abc", str(tmp_path / "b"))
+        artifact_cache.store("abc", str(tmp_path / "a"))
+        assert artifact_cache.restore("abc", str(tmp_path / "b"))
+        assert (tmp_path / "b" / "model.sol").read_text() == "solved"
+
+    def test_restore_results(self, tmp_path):
+        artifact_cache = cache.ArtifactCache(str(tmp_path / "cache"))
+        _write_branch(tmp_path / "a")
+        (tmp_path / "a" / "results").mkdir()
+        (tmp_path / "a" / "results" / "NewCapacity.csv").write_text("REGION,TECHNOLOGY,YEAR,VALUE\nR,T,2000,1\n")
+        _write_branch(tmp_path / "b")
+        artifact_cache.store("abc", str(tmp_path / "a"))
+        artifact_cache.store("def", str(tmp_path / "b"))
+
+        (tmp_path / "c").mkdir()
+        assert artifact_cache.restore("abc", str(tmp_path / "c"))
+        assert (tmp_path / "c" / "results" / "NewCapacity.csv").read_text() == (tmp_path / "a" / "results" / "NewCapacity.csv").read_text()
+        assert artifact_cache.restore("def", str(tmp_path / "c")) # without results
+        assert not (tmp_path / "c" / "results").exists()
+
+    def test_evict_least_recently_used(self, tmp_path):
+        artifact_cache = cache.ArtifactCache(str(tmp_path / "cache"), max_size=100e-9)
+        _write_branch(tmp_path / "a", "a" * 10)
+        _write_branch(tmp_path / "b", "b" * 10)
+        artifact_cache.store("aaa", str(tmp_path / "a"))
+        artifact_cache.store("bbb", str(tmp_path / "b"))
+        _write_branch(tmp_path / "c", "c" * 20)
+        artifact_cache.store("ccc", str(tmp_path / "c"))
+
+        assert not artifact_cache.has("aaa")
+        assert not artifact_cache.has("bbb")
+        assert artifact_cache.has("ccc")
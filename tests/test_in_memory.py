@@ -0,0 +1,74 @@
+from pathlib import Path
+import pandas as pd
+from otoole import read, write
+from osemosys_step import preprocess_data, branch
+
+FIXTURES = Path(Path(__file__).parent, "fixtures", "preprocess")
+
+def _read_sets(datafile: Path):
+    """Reads the preprocessed sets, ignoring the order of their members"""
+    sets = {}
+    with open(datafile, "r") as f:
+        for line in f:
+            if line.startswith(("set MODEper", "set MODEx")):
+                name, members = line.rstrip(";\n").split(":=")
+                sets[name] = sorted(members.replace(") (", ")|(").strip().split("|" if "(" in members else " "))
+    return sets
+
+class TestPreprocessFromData:
+
+    def test_same_as_parsing_datafile(self, tmp_path):
+        config = str(Path(FIXTURES, "config.yaml"))
+        data, defaults = read(config, "csv", str(FIXTURES))
+        data_file = Path(tmp_path, "data.txt")
+        write(config, "datafile", str(data_file), data, defaults)
+
+        preprocess_data.main("otoole", str(data_file), str(Path(tmp_path, "parsed.txt")))
+        preprocess_data.main_from_data(data, str(data_file), str(Path(tmp_path, "from_data.txt")))
+
+        expected = _read_sets(Path(tmp_path, "parsed.txt"))
+        actual = _read_sets(Path(tmp_path, "from_data.txt"))
+        assert expected
+        assert actual == expected
+
+class TestBranchData:
+
+    def _step_data(self):
+        res_cap = pd.DataFrame(
+            [["R", "PLANT", 2020, 1.0], ["R", "PLANT", 2021, 1.0]],
+            columns=["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+        ).set_index(["REGION", "TECHNOLOGY", "YEAR"])
+        max_cap = pd.DataFrame(
+            [["R", "PLANT", 2020, 5.0], ["R", "PLANT", 2021, 5.0]],
+            columns=["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+        ).set_index(["REGION", "TECHNOLOGY", "YEAR"])
+        return {"ResidualCapacity": res_cap, "TotalAnnualMaxCapacity": max_cap}
+
+    def test_get_branch_data_applies_options(self):
+        step_data = self._step_data()
+        option_data = pd.DataFrame(
+            [["R", "PLANT", 2021, 2.0], ["R", "PLANT", 2030, 9.0]],
+            columns=["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+        )
+        option_data_by_param = {"1A0": {"TotalAnnualMaxCapacity": option_data}, "2B1": {}}
+
+        data = branch.get_branch_data(step_data, ["1A0", "2B1"], option_data_by_param, [2020, 2021])
+
+        max_cap = data["TotalAnnualMaxCapacity"]
+        assert max_cap.index.names == ["REGION", "TECHNOLOGY", "YEAR"]
+        assert max_cap.loc[("R", "PLANT", 2020), "VALUE"] == 5.0
+        assert max_cap.loc[("R", "PLANT", 2021), "VALUE"] == 2.0
+        assert len(max_cap) == 2
+        assert data["ResidualCapacity"] is step_data["ResidualCapacity"]
+
+    def test_get_branch_data_replaces_res_capacity(self):
+        step_data = self._step_data()
+        res_cap = pd.DataFrame(
+            [["R", "PLANT", 2021, 3.0]],
+            columns=["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+        )
+
+        data = branch.get_branch_data(step_data, [], {}, [2020, 2021], res_cap)
+
+        assert data["ResidualCapacity"].loc[("R", "PLANT", 2021), "VALUE"] == 3.0
+        assert len(data["ResidualCapacity"]) == 1
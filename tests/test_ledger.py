@@ -0,0 +1,66 @@
+import pandas as pd
+from pytest import fixture
+from pandas.testing import assert_frame_equal
+from osemosys_step import main_utils as mu
+from osemosys_step.ledger import ResidualCapacityLedger
+
+@fixture
+def res_capacity():
+    return pd.DataFrame(
+        [
+            ["UTOPIA", "E01", 1995, 2],
+            ["UTOPIA", "E01", 1996, 2],
+            ["UTOPIA", "E01", 1997, 2],
+            ["UTOPIA", "E01", 1998, 2],
+            ["UTOPIA", "E01", 1999, 2],
+        ], columns = ["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+    )
+
+@fixture
+def op_life():
+    return pd.DataFrame(
+        [
+            ["UTOPIA", "E01", 3]
+        ], columns=["REGION", "TECHNOLOGY", "VALUE"]
+    )
+
+def _new_capacity(year, value):
+    return pd.DataFrame([["UTOPIA", "E01", year, value]], columns = ["REGION", "TECHNOLOGY", "YEAR", "VALUE"])
+
+class TestResidualCapacityLedger:
+
+    def test_same_as_updating_each_step(self, tmp_path, res_capacity, op_life):
+        ledger = ResidualCapacityLedger(str(tmp_path))
+        ledger.add(0, [], op_life, _new_capacity(1995, 1), [1995])
+        ledger.add(1, ["1A0"], op_life, _new_capacity(1996, 4), [1996])
+
+        expected = mu.update_res_capacity(res_capacity, op_life, _new_capacity(1995, 1), [1995])
+        expected = mu.update_res_capacity(expected, op_life, _new_capacity(1996, 4), [1996])
+        expected = expected.loc[expected["YEAR"].isin([1997, 1998, 1999])].reset_index(drop=True)
+
+        actual = ledger.get_res_capacity(2, ["1A0", "2B0"], res_capacity, [1997, 1998, 1999])
+        assert_frame_equal(actual, expected)
+
+    def test_only_ancestors_are_applied(self, tmp_path, res_capacity, op_life):
+        ledger = ResidualCapacityLedger(str(tmp_path))
+        ledger.add(1, ["1A0"], op_life, _new_capacity(1996, 4), [1996])
+        ledger.add(1, ["1A1"], op_life, _new_capacity(1996, 8), [1996])
+
+        actual = ledger.get_res_capacity(2, ["1A1"], res_capacity, [1997])
+        assert actual["VALUE"].to_list() == [10]
+        assert list(ledger.get_ancestor_entries(2, ["1A1"])) == [(1, ("1A1",))]
+
+    def test_capacity_outside_step_years_is_not_passed_on(self, tmp_path, op_life):
+        ledger = ResidualCapacityLedger(str(tmp_path))
+        ledger.add(0, [], op_life, _new_capacity(1997, 1), [1995, 1996])
+        assert ledger.get_entry(0, []).empty
+
+    def test_entries_are_read_from_checkpoints(self, tmp_path, res_capacity, op_life):
+        ledger = ResidualCapacityLedger(str(tmp_path))
+        ledger.add(0, [], op_life, _new_capacity(1995, 1), [1995])
+        expected = ledger.get_res_capacity(1, ["1A0"], res_capacity, [1996, 1997])
+
+        resumed = ResidualCapacityLedger(str(tmp_path))
+        assert resumed.get_entry(1, ["1A0"]) is None
+        actual = resumed.get_res_capacity(1, ["1A0"], res_capacity, [1996, 1997])
+        assert_frame_equal(actual, expected, check_dtype=False)
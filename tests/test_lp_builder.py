@@ -0,0 +1,230 @@
+from pathlib import Path
+from pytest import raises, importorskip, approx, mark
+import shutil
+import pandas as pd
+from otoole import read
+from osemosys_step import lp_builder
+
+# otoole's super_simple model and the lp file glpsol --wlp writes for it
+SUPER_SIMPLE = Path(Path(__file__).parent, "fixtures", "super_simple")
+# a model of two regions, five years and five technologies, and the lp file GLPK writes for it
+MULTI_YEAR = Path(Path(__file__).parent, "fixtures", "multi_year")
+
+def get_set(values):
+    return pd.DataFrame({"VALUE": values})
+
+def get_param(rows, index):
+    return pd.DataFrame(rows, columns=index + ["VALUE"]).set_index(index)
+
+def get_data():
+    """One technology meeting a demand of 10 in two years at a variable cost of 2"""
+    data = {
+        "REGION": get_set(["R"]),
+        "TECHNOLOGY": get_set(["GEN"]),
+        "FUEL": get_set(["ELC"]),
+        "EMISSION": get_set([]),
+        "TIMESLICE": get_set(["ANNUAL"]),
+        "MODE_OF_OPERATION": get_set([1]),
+        "YEAR": get_set([2020, 2021]),
+        "YearSplit": get_param([["ANNUAL", 2020, 1.0], ["ANNUAL", 2021, 1.0]], ["TIMESLICE", "YEAR"]),
+        "OutputActivityRatio": get_param(
+            [["R", "GEN", "ELC", 1, 2020, 1.0], ["R", "GEN", "ELC", 1, 2021, 1.0]],
+            ["REGION", "TECHNOLOGY", "FUEL", "MODE_OF_OPERATION", "YEAR"]
+        ),
+        "SpecifiedAnnualDemand": get_param([["R", "ELC", 2020, 10.0], ["R", "ELC", 2021, 10.0]], ["REGION", "FUEL", "YEAR"]),
+        "SpecifiedDemandProfile": get_param(
+            [["R", "ELC", "ANNUAL", 2020, 1.0], ["R", "ELC", "ANNUAL", 2021, 1.0]],
+            ["REGION", "FUEL", "TIMESLICE", "YEAR"]
+        ),
+        "VariableCost": get_param(
+            [["R", "GEN", 1, 2020, 2.0], ["R", "GEN", 1, 2021, 2.0]],
+            ["REGION", "TECHNOLOGY", "MODE_OF_OPERATION", "YEAR"]
+        ),
+    }
+    defaults = {
+        "DiscountRate": 0.05,
+        "OperationalLife": 1,
+        "CapacityFactor": 1,
+        "AvailabilityFactor": 1,
+        "CapacityToActivityUnit": 1,
+        "YearSplit": 0,
+        "TotalAnnualMaxCapacity": -1,
+        "TotalAnnualMaxCapacityInvestment": -1,
+        "TotalTechnologyAnnualActivityUpperLimit": -1,
+        "TotalTechnologyModelPeriodActivityUpperLimit": -1,
+        "AnnualEmissionLimit": -1,
+        "ModelPeriodEmissionLimit": -1,
+    }
+    return data, defaults
+
+class TestBuild:
+
+    def test_get_names(self):
+        index = pd.DataFrame({"REGION": ["R", "R"], "TECHNOLOGY": ["GEN", "GEN"], "YEAR": [2020, 2021]})
+        actual = lp_builder.get_names("NewCapacity", index).to_list()
+        assert actual == ["NewCapacity(R,GEN,2020)", "NewCapacity(R,GEN,2021)"]
+
+    def test_write_lp(self, tmp_path):
+        data, defaults = get_data()
+        lp_file = tmp_path / "model.lp"
+        lp_builder.build(data, defaults).write_lp(str(lp_file))
+        actual = lp_file.read_text()
+        assert " EBa11_EnergyBalanceEachTS5(R,ANNUAL,ELC,2020):\n + 1.0 RateOfActivity(R,ANNUAL,GEN,1,2020)\n >= 10.0\n" in actual
+        assert "TotalDiscountedCost(R,2021)" in actual
+
+    def test_unsupported_feature(self):
+        data, defaults = get_data()
+        data["TechnologyToStorage"] = get_param(
+            [["R", "GEN", "DAM", 1, 1.0]], ["REGION", "TECHNOLOGY", "STORAGE", "MODE_OF_OPERATION"]
+        )
+        with raises(lp_builder.UnsupportedFeatureError):
+            lp_builder.build(data, defaults)
+
+    def test_unmet_demand(self):
+        data, defaults = get_data()
+        data["OutputActivityRatio"] = data["OutputActivityRatio"].iloc[:0]
+        data["InputActivityRatio"] = get_param(
+            [["R", "GEN", "ELC", 1, 2020, 1.0]], ["REGION", "TECHNOLOGY", "FUEL", "MODE_OF_OPERATION", "YEAR"]
+        )
+        data["SpecifiedAnnualDemand"] = get_param([["R", "HEAT", 2020, 10.0]], ["REGION", "FUEL", "YEAR"])
+        data["SpecifiedDemandProfile"] = get_param([["R", "HEAT", "ANNUAL", 2020, 1.0]], ["REGION", "FUEL", "TIMESLICE", "YEAR"])
+        with raises(ValueError):
+            lp_builder.build(data, defaults)
+
+    def test_reserve_margin_without_fuel_tags(self, tmp_path):
+        data, defaults = get_data()
+        data["ReserveMarginTagTechnology"] = get_param([["R", "GEN", 2020, 1.0]], ["REGION", "TECHNOLOGY", "YEAR"])
+        data["ResidualCapacity"] = get_param([["R", "GEN", 2020, 3.0]], ["REGION", "TECHNOLOGY", "YEAR"])
+        lp_builder.build(data, defaults).write_lp(str(tmp_path / "model.lp"))
+        actual = (tmp_path / "model.lp").read_text()
+        assert " RM3_ReserveMargin_Constraint(R,ANNUAL,2020):\n + 1.0 NewCapacity(R,GEN,2020)\n >= -3.0\n" in actual
+
+    def test_reserve_margin_without_technology_tags(self, tmp_path):
+        data, defaults = get_data()
+        data["ReserveMarginTagTechnology"] = get_param([], ["REGION", "TECHNOLOGY", "YEAR"])
+        data["ReserveMarginTagFuel"] = get_param([["R", "ELC", 2021, 1.0]], ["REGION", "FUEL", "YEAR"])
+        data["ReserveMargin"] = get_param([["R", 2021, 1.2]], ["REGION", "YEAR"])
+        lp_builder.build(data, defaults).write_lp(str(tmp_path / "model.lp"))
+        actual = (tmp_path / "model.lp").read_text()
+        assert " RM3_ReserveMargin_Constraint(R,ANNUAL,2021):\n - 1.2 RateOfActivity(R,ANNUAL,GEN,1,2021)\n >= 0.0\n" in actual
+        assert "RM3_ReserveMargin_Constraint(R,ANNUAL,2020)" not in actual
+
+    def test_formulation_differences(self, tmp_path):
+        model = Path(MULTI_YEAR, "osemosys.txt").read_text()
+        assert lp_builder.get_formulation_differences(str(Path(MULTI_YEAR, "osemosys.txt"))) == []
+
+        osemosys_file = tmp_path / "osemosys.txt"
+        osemosys_file.write_text(model.replace("s.t. RM3_ReserveMargin_Constraint", "# s.t. RM3_ReserveMargin_Constraint"))
+        assert "RM3" in lp_builder.get_formulation_differences(str(osemosys_file))[0]
+        osemosys_file.write_text(model.replace("solve;", "s.t. GasLimit{r in REGION}: sum{y in YEAR} TotalDiscountedCost[r,y] >= 0;\nsolve;"))
+        assert "GasLimit" in lp_builder.get_formulation_differences(str(osemosys_file))[0]
+        assert lp_builder.get_formulation_differences(str(tmp_path / "missing.txt"))
+
+    def test_objective(self):
+        importorskip("highspy")
+        data, defaults = get_data()
+        h = lp_builder.build(data, defaults).to_highs()
+        h.run()
+        expected = 10 * 2 * (1 / 1.05 ** 0.5 + 1 / 1.05 ** 1.5)
+        assert h.getInfo().objective_function_value == approx(expected)
+
+class TestGlpsolRegression:
+
+    def test_objective_matches_glpsol(self):
+        """The shipped glpsol lp has a CapitalCost of 1e-05 for gas_import
+        that super_simple.txt does not have. Without it the objective is
+        46.4312332 instead of 46.4312566"""
+        highspy = importorskip("highspy")
+        data, defaults = read(str(Path(SUPER_SIMPLE, "super_simple.yaml")), "datafile", str(Path(SUPER_SIMPLE, "super_simple.txt")))
+        capital_cost = data["CapitalCost"].reset_index()
+        capital_cost.loc[len(capital_cost)] = ["BB", "gas_import", 2016, 1e-05]
+        data["CapitalCost"] = capital_cost.set_index(["REGION", "TECHNOLOGY", "YEAR"])
+
+        h = lp_builder.build(data, defaults).to_highs()
+        h.setOptionValue("output_flag", False)
+        h.run()
+        expected = highspy.Highs()
+        expected.setOptionValue("output_flag", False)
+        expected.readModel(str(Path(SUPER_SIMPLE, "super_simple_gnu.lp")))
+        expected.run()
+        assert h.getInfo().objective_function_value == approx(expected.getInfo().objective_function_value, rel=1e-9)
+
+    def test_multi_year_matches_glpsol(self):
+        """Substituting the accounting variables does not change the
+        objective value, or the slack of a constraint at the glpsol solution"""
+        importorskip("highspy")
+        data, defaults = read(str(Path(SUPER_SIMPLE, "super_simple.yaml")), "datafile", str(Path(MULTI_YEAR, "multi_year.txt")))
+        lp = lp_builder.build(data, defaults)
+        assert lp_builder.get_equation_differences(lp, str(Path(MULTI_YEAR, "multi_year_gnu.lp.gz"))) == []
+
+    def test_other_equations_differ(self):
+        """As if the model file annualised the capital cost in another way"""
+        importorskip("highspy")
+        data, defaults = read(str(Path(SUPER_SIMPLE, "super_simple.yaml")), "datafile", str(Path(MULTI_YEAR, "multi_year.txt")))
+        data["CapitalCost"] = data["CapitalCost"] * 1.1
+        lp = lp_builder.build(data, defaults)
+        differences = lp_builder.get_equation_differences(lp, str(Path(MULTI_YEAR, "multi_year_gnu.lp.gz")))
+        assert "objective value" in differences[0]
+
+@mark.skipif(shutil.which("glpsol") is None, reason="needs glpsol")
+class TestCheckModelFile:
+
+    def check(self, tmp_path, model):
+        importorskip("highspy")
+        osemosys_file = tmp_path / "osemosys.txt"
+        osemosys_file.write_text(model)
+        datafile = str(Path(MULTI_YEAR, "multi_year.txt"))
+        data, defaults = read(str(Path(SUPER_SIMPLE, "super_simple.yaml")), "datafile", datafile)
+        return lp_builder.check_model_file(str(osemosys_file), datafile, data, defaults, str(tmp_path / "model.lp"))
+
+    def test_same_equations(self, tmp_path):
+        assert self.check(tmp_path, Path(MULTI_YEAR, "osemosys.txt").read_text()) == []
+
+    def test_capital_cost_without_annuity(self, tmp_path):
+        model = Path(MULTI_YEAR, "osemosys.txt").read_text()
+        model = model.replace("CapitalCost[r,t,y]*NewCapacity[r,t,y]*CapitalRecoveryFactor[r,t]*PvAnnuity[r,t] = CapitalInvestment[r,t,y]", "CapitalCost[r,t,y]*NewCapacity[r,t,y] = CapitalInvestment[r,t,y]")
+        assert self.check(tmp_path, model)
+
+    def test_other_capacity_constraint(self, tmp_path):
+        model = Path(MULTI_YEAR, "osemosys.txt").read_text()
+        model = model.replace("RateOfTotalActivity[r,t,l,y] <= TotalCapacityAnnual[r,t,y]*CapacityFactor[r,t,l,y]*CapacityToActivityUnit[r,t]", "RateOfTotalActivity[r,t,l,y] <= TotalCapacityAnnual[r,t,y]*CapacityToActivityUnit[r,t]")
+        assert self.check(tmp_path, model)
+
+class TestPatch:
+
+    def test_same_as_build(self, tmp_path):
+        data, defaults = get_data()
+        base_lp = lp_builder.build(data, defaults)
+        sibling = dict(data)
+        sibling["TotalAnnualMaxCapacityInvestment"] = get_param([["R", "GEN", 2021, 5.0]], ["REGION", "TECHNOLOGY", "YEAR"])
+        sibling["VariableCost"] = data["VariableCost"] * 2
+        lp_builder.patch(base_lp, data, sibling, defaults).write_lp(str(tmp_path / "patched.lp"))
+        lp_builder.build(sibling, defaults).write_lp(str(tmp_path / "built.lp"))
+        assert (tmp_path / "patched.lp").read_text() == (tmp_path / "built.lp").read_text()
+        assert "NewCapacity(R,GEN,2021) <= 5.0" in (tmp_path / "patched.lp").read_text()
+
+    def test_base_unchanged(self, tmp_path):
+        data, defaults = get_data()
+        base_lp = lp_builder.build(data, defaults)
+        base_lp.write_lp(str(tmp_path / "before.lp"))
+        sibling = dict(data)
+        sibling["VariableCost"] = data["VariableCost"] * 2
+        lp_builder.patch(base_lp, data, sibling, defaults)
+        base_lp.write_lp(str(tmp_path / "after.lp"))
+        assert (tmp_path / "before.lp").read_text() == (tmp_path / "after.lp").read_text()
+
+    def test_new_constraints(self):
+        data, defaults = get_data()
+        base_lp = lp_builder.build(data, defaults)
+        sibling = dict(data)
+        sibling["TotalTechnologyAnnualActivityUpperLimit"] = get_param([["R", "GEN", 2021, 5.0]], ["REGION", "TECHNOLOGY", "YEAR"])
+        with raises(lp_builder.StructureChangedError):
+            lp_builder.patch(base_lp, data, sibling, defaults)
+
+    def test_new_variables(self):
+        data, defaults = get_data()
+        base_lp = lp_builder.build(data, defaults)
+        sibling = dict(data)
+        sibling["OperationalLife"] = get_param([["R", "GEN", 5]], ["REGION", "TECHNOLOGY"])
+        with raises(lp_builder.StructureChangedError):
+            lp_builder.patch(base_lp, data, sibling, defaults)
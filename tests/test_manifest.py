@@ -0,0 +1,61 @@
+from pathlib import Path
+from osemosys_step import manifest, scheduler
+
+OPTION_COMBOS = {
+    0: [],
+    1: [["1A0"], ["1A1"]],
+    2: [["1A0", "2B0"], ["1A0", "2B1"], ["1A1", "2B0"], ["1A1", "2B1"]],
+}
+
+def get_manifest(tmp_path):
+    children = scheduler.get_branch_children(scheduler.get_branches_per_step(OPTION_COMBOS))
+    return manifest.RunManifest(
+        str(tmp_path / "steps"), children,
+        str(tmp_path / "data"), str(tmp_path / "steps"), str(tmp_path / "results"), str(tmp_path / "logs")
+    )
+
+class TestRunManifest:
+
+    def test_node_paths(self, tmp_path):
+        run_manifest = get_manifest(tmp_path)
+        node = run_manifest.get(2, ["1A0", "2B1"])
+        assert node.parent == (1, ("1A0",))
+        assert node.path == Path(tmp_path, "steps", "step_2", "1A0", "2B1")
+        assert node.results_path == Path(tmp_path, "results", "1A0", "2B1")
+        assert node.artifacts["sol"] == Path(node.path, "model.sol")
+        assert run_manifest.get_parent(0, []) is None
+
+    def test_state_is_reloaded(self, tmp_path):
+        run_manifest = get_manifest(tmp_path)
+        run_manifest.reset()
+        run_manifest.mark_created(0, [])
+        run_manifest.mark_created(1, ["1A0"])
+
+        actual = get_manifest(tmp_path)
+        assert actual.is_created(1, ["1A0"])
+        assert not actual.is_created(1, ["1A1"])
+
+    def test_fail_removes_descendants(self, tmp_path):
+        run_manifest = get_manifest(tmp_path)
+        run_manifest.reset()
+        for step, option in [(1, ["1A0"]), (2, ["1A0", "2B0"]), (2, ["1A1", "2B0"])]:
+            run_manifest.get(step, option).path.mkdir(parents=True)
+            run_manifest.mark_created(step, option)
+
+        assert not run_manifest.fail(1, ["1A0"])
+        assert not (tmp_path / "steps" / "step_1" / "1A0").exists()
+        assert not (tmp_path / "steps" / "step_2" / "1A0" / "2B0").exists()
+        assert (tmp_path / "steps" / "step_2" / "1A1" / "2B0").exists()
+        assert run_manifest.get(2, ["1A0", "2B1"]).state == "failed"
+        assert run_manifest.fail(0, [])
+
+    def test_get_result_options(self, tmp_path):
+        run_manifest = get_manifest(tmp_path)
+        run_manifest.reset()
+        for step, option in [(0, []), (1, ["1A0"]), (1, ["1A1"]), (2, ["1A0", "2B0"]), (2, ["1A0", "2B1"])]:
+            run_manifest.mark_created(step, option)
+        run_manifest.fail(2, ["1A0", "2B1"])
+
+        actual = run_manifest.get_result_options()
+        expected = [["1A0", "2B0"], ["1A1"]]
+        assert actual == expected
@@ -0,0 +1,83 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from osemosys_step import main_utils as mu
+
+COLUMNS = ["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+
+def _option_data():
+    scenario = pd.DataFrame(
+        [
+            ["TotalAnnualMaxCapacityInvestment", "UTOPIA", "E01", 0, 2020, -1],
+            ["TotalAnnualMaxCapacityInvestment", "UTOPIA", "E01", 0, 2021, -1],
+            ["TotalTechnologyAnnualActivityUpperLimit", "UTOPIA", "E01", 0, 2020, 5],
+            ["TotalAnnualMaxCapacityInvestment", "UTOPIA", "E01", 1, 2020, 0],
+            ["TotalAnnualMaxCapacityInvestment", "UTOPIA", "E01", 1, 2021, 0],
+        ], columns=["PARAMETER", "REGION", "TECHNOLOGY", "OPTION", "YEAR", "VALUE"]
+    )
+    return mu.get_param_data_per_option(mu.get_option_data_per_step({1: {"A": scenario}}))
+
+class TestGetParamDataPerOption:
+
+    def test_rows_are_split_by_parameter(self):
+        option_data_by_param = _option_data()
+
+        assert sorted(option_data_by_param) == ["1A0", "1A1"]
+        assert sorted(option_data_by_param["1A0"]) == [
+            "TotalAnnualMaxCapacityInvestment", "TotalTechnologyAnnualActivityUpperLimit"
+        ]
+        assert list(option_data_by_param["1A1"]) == ["TotalAnnualMaxCapacityInvestment"]
+
+        expected = pd.DataFrame([["UTOPIA", "E01", 2020, 5]], columns=COLUMNS)
+        assert_frame_equal(option_data_by_param["1A0"]["TotalTechnologyAnnualActivityUpperLimit"], expected)
+
+class TestGetOptionUpdates:
+
+    def test_later_options_overwrite_earlier_options(self):
+        option_data_by_param = {
+            "1A0": {"CapitalCost": pd.DataFrame([["R", "T", 2020, 1], ["R", "T", 2021, 1]], columns=COLUMNS)},
+            "2B0": {"CapitalCost": pd.DataFrame([["R", "T", 2021, 2], ["R", "T", 2030, 2]], columns=COLUMNS)},
+            "2C0": {},
+        }
+        expected = pd.DataFrame([["R", "T", 2020, 1], ["R", "T", 2021, 2]], columns=COLUMNS).set_index(COLUMNS[:-1])
+
+        actual = mu.get_option_updates(option_data_by_param, ["1A0", "2B0", "2C0"], "CapitalCost", [2020, 2021])
+        assert_frame_equal(actual, expected)
+        assert mu.get_option_updates(option_data_by_param, ["2C0"], "CapitalCost", [2020, 2021]) is None
+
+class TestApplyOptionData:
+
+    def test_same_as_appending_and_dropping_duplicates(self):
+        original = pd.DataFrame(
+            [["R", "T1", 2020, 1.0], ["R", "T1", 2021, 1.0], ["R", "T2", 2020, 3.0]], columns=COLUMNS
+        )
+        option = pd.DataFrame(
+            [["R", "T1", 2021, 5.0], ["R", "T3", 2020, 7.0]], columns=COLUMNS
+        )
+
+        expected = pd.concat([original, option])
+        expected = expected.drop_duplicates(keep="last", subset=["REGION", "TECHNOLOGY", "YEAR"])
+        expected = expected.sort_values(["REGION", "TECHNOLOGY", "YEAR"]).reset_index(drop=True)
+
+        actual = mu.apply_option_data(original, option.set_index(["TECHNOLOGY", "REGION", "YEAR"]))
+        assert_frame_equal(actual, expected)
+
+class TestGetOptionsPerStep:
+
+    def _scenario(self, options):
+        return pd.DataFrame({"PARAMETER": "CapitalCost", "OPTION": options})
+
+    def test_two_scenarios(self):
+        steps = {1: {"B": self._scenario([0, 1]), "A": self._scenario([0, 1])}}
+        assert mu.get_options_per_step(steps) == {1: ["A0-B0", "A0-B1", "A1-B0", "A1-B1"]}
+
+    def test_three_scenarios(self):
+        steps = {
+            1: {"A": self._scenario([0, 1]), "B": self._scenario([0, 1, 2]), "C": self._scenario([0, 1])},
+            2: {"D": self._scenario([0, 1])},
+        }
+        actual = mu.get_options_per_step(steps)
+
+        assert len(actual[1]) == 2 * 3 * 2
+        assert len(set(actual[1])) == len(actual[1])
+        assert actual[1][:3] == ["A0-B0-C0", "A0-B0-C1", "A0-B1-C0"]
+        assert actual[2] == ["D0", "D1"]
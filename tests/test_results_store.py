@@ -0,0 +1,82 @@
+from pytest import importorskip
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from osemosys_step import results_store as rs
+
+def write_results(results_dir, values):
+    results_dir.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(
+        [["R", "GEN", year, value] for year, value in values],
+        columns=["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+    ).to_csv(results_dir / "NewCapacity.csv", index=False)
+
+class TestResultsStore:
+
+    def test_save_only_actual_years(self, tmp_path):
+        write_results(tmp_path / "steps", [(2020, 1.0), (2025, 2.0)])
+        store = rs.ResultsStore(str(tmp_path / "store"))
+        store.save(0, [], str(tmp_path / "steps"), [2020])
+
+        actual = store.read()
+        expected = pd.DataFrame(
+            [["NewCapacity", 0, "", "R", "GEN", 2020, 1.0]],
+            columns=["VARIABLE", "STEP", "BRANCH", "REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+        )
+        assert_frame_equal(actual, expected)
+
+    def test_export_csv(self, tmp_path):
+        store = rs.ResultsStore(str(tmp_path / "store"))
+        write_results(tmp_path / "step_0", [(2020, 1.0)])
+        store.save(0, [], str(tmp_path / "step_0"), [2020])
+        write_results(tmp_path / "step_1" / "1A0", [(2025, 2.0)])
+        store.save(1, ["1A0"], str(tmp_path / "step_1" / "1A0"), [2025])
+        write_results(tmp_path / "step_1" / "1A1", [(2025, 3.0)])
+        store.save(1, ["1A1"], str(tmp_path / "step_1" / "1A1"), [2025])
+        write_results(tmp_path / "step_2" / "1A0" / "2B0", [(2030, 4.0)])
+        store.save(2, ["1A0", "2B0"], str(tmp_path / "step_2" / "1A0" / "2B0"), [2030])
+
+        results_dir = tmp_path / "results"
+        store.export_csv(str(results_dir), [["1A0", "2B0"], ["1A1"]])
+
+        actual = pd.read_csv(results_dir / "1A0" / "2B0" / "NewCapacity.csv")
+        assert actual["VALUE"].to_list() == [1.0, 2.0, 4.0]
+        actual = pd.read_csv(results_dir / "1A1" / "NewCapacity.csv")
+        assert actual["VALUE"].to_list() == [1.0, 3.0]
+        assert store.read()["BRANCH"].to_list() == ["", "1A0", "1A1", "1A0/2B0"]
+
+    def test_export_csv_to_given_options(self, tmp_path):
+        store = rs.ResultsStore(str(tmp_path / "store"))
+        write_results(tmp_path / "step_0", [(2020, 1.0)])
+        store.save(0, [], str(tmp_path / "step_0"), [2020])
+        write_results(tmp_path / "step_1" / "1A0", [(2025, 2.0)])
+        store.save(1, ["1A0"], str(tmp_path / "step_1" / "1A0"), [2025])
+
+        results_dir = tmp_path / "results"
+        (results_dir / "1A0").mkdir(parents=True)
+        (results_dir / "1A1").mkdir(parents=True)
+        store.export_csv(str(results_dir), [["1A0"]])
+
+        actual = pd.read_csv(results_dir / "1A0" / "NewCapacity.csv")
+        assert actual["VALUE"].to_list() == [1.0, 2.0]
+        assert not (results_dir / "1A1" / "NewCapacity.csv").exists()
+
+    def test_path_nodes_from_index(self, tmp_path):
+        store = rs.ResultsStore(str(tmp_path / "store"))
+        write_results(tmp_path / "steps", [(2020, 1.0)])
+        store.save(0, [], str(tmp_path / "steps"), [2020])
+        store.save(1, ["1A0"], str(tmp_path / "steps"), [2020])
+        store.save(2, ["1A0"], str(tmp_path / "steps"), [2020])
+        store.save(2, ["1A1"], str(tmp_path / "steps"), [2020])
+
+        actual = rs.ResultsStore(str(tmp_path / "store")).get_path_nodes(["1A0", "3B0"])
+        expected = [(0, ()), (1, ("1A0",)), (2, ("1A0",))]
+        assert actual == expected
+
+    def test_parquet(self, tmp_path):
+        importorskip("pyarrow")
+        write_results(tmp_path / "steps", [(2020, 1.0), (2025, 2.0)])
+        store = rs.ResultsStore(str(tmp_path / "store"), "parquet")
+        store.save(0, [], str(tmp_path / "steps"), [2020, 2025])
+
+        assert store.get_part("NewCapacity", 0, []).exists()
+        assert store.read_path(["1A0"], "NewCapacity")["VALUE"].to_list() == [1.0, 2.0]
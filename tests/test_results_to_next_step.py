@@ -96,6 +96,40 @@ class TestGetNewCapacityLifetime:
         actual = mu.get_new_capacity_lifetime(op_life=op_life, new_capacity=new_capacity)
         assert_frame_equal(actual, expected)
 
+    def test_get_new_capacity_lifetime_regions(self, op_life):
+
+        new_capacity = pd.DataFrame(
+            [
+                ["UTOPIA", "E01", 1995, 1],
+                ["UTOPIA", "E02", 1996, 2],
+                ["ATLANTIS", "E01", 1998, 3],
+            ], columns = ["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+        )
+        expected = pd.DataFrame(
+            [
+                ["ATLANTIS", "E01", 1998, 3],
+                ["ATLANTIS", "E01", 1999, 3],
+                ["ATLANTIS", "E01", 2000, 3],
+                ["ATLANTIS", "E01", 2001, 3],
+                ["ATLANTIS", "E01", 2002, 3],
+                ["UTOPIA", "E01", 1995, 1],
+                ["UTOPIA", "E01", 1996, 1],
+                ["UTOPIA", "E01", 1997, 1],
+                ["UTOPIA", "E01", 1998, 1],
+                ["UTOPIA", "E01", 1999, 1],
+                ["UTOPIA", "E02", 1996, 2], # no operational life
+            ], columns = ["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+        )
+        actual = mu.get_new_capacity_lifetime(op_life=op_life, new_capacity=new_capacity)
+        assert_frame_equal(actual, expected)
+
+    def test_get_new_capacity_lifetime_empty(self, op_life):
+
+        new_capacity = pd.DataFrame(columns = ["REGION", "TECHNOLOGY", "YEAR", "VALUE"])
+        actual = mu.get_new_capacity_lifetime(op_life=op_life, new_capacity=new_capacity)
+        assert actual.empty
+        assert list(actual.columns) == ["REGION", "TECHNOLOGY", "YEAR", "VALUE"]
+
 class TestApplyOperationalLife:
 
     def test_apply_op_life_one_year(self):
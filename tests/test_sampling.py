@@ -0,0 +1,70 @@
+from pytest import fixture, raises
+from osemosys_step import main_utils as mu
+from osemosys_step import sampling
+
+@fixture
+def options_per_step():
+    return {
+        0: [],
+        1: ["1A0-1B0", "1A0-1B1", "1A1-1B0", "1A1-1B1"],
+        2: [],
+        3: ["3C0", "3C1", "3C2"],
+    }
+
+class TestSampleUniform:
+
+    def test_reproducible(self, options_per_step):
+        paths = sampling.sample_uniform(options_per_step, 5, seed=1)
+        assert paths == sampling.sample_uniform(options_per_step, 5, seed=1)
+        assert len(set(paths)) == 5
+        for path in paths:
+            assert path[0] in options_per_step[1]
+            assert path[1] in options_per_step[3]
+
+    def test_all_paths(self, options_per_step):
+        paths = sampling.sample_uniform(options_per_step, 100)
+        expected = [tuple(x) for x in mu.get_option_combinations_per_step(options_per_step)[3]]
+        assert paths == expected
+
+class TestSampleStratified:
+
+    def test_every_option_is_covered(self, options_per_step):
+        paths = sampling.sample_stratified(options_per_step, 3, seed=2)
+        options = set()
+        for path in paths:
+            for grouped_option in path:
+                options.update(grouped_option.split("-"))
+        assert options == {"1A0", "1A1", "1B0", "1B1", "3C0", "3C1", "3C2"}
+
+    def test_size_paths_are_returned(self):
+        options_per_step = {0: [], 1: ["1A0-1B0", "1A0-1B1", "1A1-1B0", "1A1-1B1"], 2: ["2C0", "2C1"]}
+        for size in range(1, 9):
+            paths = sampling.sample_stratified(options_per_step, size, seed=0)
+            assert len(paths) == size
+            assert len(set(paths)) == size
+        assert len(sampling.sample_stratified(options_per_step, 20, seed=0)) == 8
+
+class TestReadPaths:
+
+    def test_read_paths(self, tmp_path, options_per_step):
+        path_file = tmp_path / "paths.txt"
+        path_file.write_text("# paths\n1A0-1B1/3C2\n\n1A1-1B0/3C0\n")
+        assert sampling.read_paths(str(path_file), options_per_step) == [("1A0-1B1", "3C2"), ("1A1-1B0", "3C0")]
+
+    def test_unknown_option(self, tmp_path, options_per_step):
+        path_file = tmp_path / "paths.txt"
+        path_file.write_text("1A0-1B1/3C9\n")
+        with raises(ValueError):
+            sampling.read_paths(str(path_file), options_per_step)
+
+class TestGetOptionCombinationsPerStep:
+
+    def test_shared_prefixes_are_listed_once(self, options_per_step):
+        paths = [("1A0-1B1", "3C2"), ("1A0-1B1", "3C0"), ("1A1-1B0", "3C0")]
+        actual = sampling.get_option_combinations_per_step(options_per_step, paths)
+        assert actual == {
+            0: [],
+            1: [["1A0-1B1"], ["1A1-1B0"]],
+            2: [["1A0-1B1"], ["1A1-1B0"]],
+            3: [["1A0-1B1", "3C2"], ["1A0-1B1", "3C0"], ["1A1-1B0", "3C0"]],
+        }
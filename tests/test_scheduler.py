@@ -0,0 +1,72 @@
+from osemosys_step import main_utils as mu
+from osemosys_step import scheduler, branch
+
+class TestGetOptionCombinationsPerStep:
+
+    def test_options_in_non_consecutive_steps(self):
+        options_per_step = {0: [], 1: ["1A0", "1A1"], 2: [], 3: ["3B0", "3B1"]}
+        actual = mu.get_option_combinations_per_step(options_per_step)
+        expected = {
+            0: [],
+            1: [["1A0"], ["1A1"]],
+            2: [["1A0"], ["1A1"]],
+            3: [["1A0", "3B0"], ["1A0", "3B1"], ["1A1", "3B0"], ["1A1", "3B1"]],
+        }
+        assert actual == expected
+
+    def test_options_in_first_step(self):
+        options_per_step = {0: ["0A0", "0A1"], 1: ["1C0", "1C1"]}
+        actual = mu.get_option_combinations_per_step(options_per_step)
+        expected = {
+            0: [["0A0"], ["0A1"]],
+            1: [["0A0", "1C0"], ["0A0", "1C1"], ["0A1", "1C0"], ["0A1", "1C1"]],
+        }
+        assert actual == expected
+
+class TestGetBranchChildren:
+
+    def test_get_branch_children(self):
+        option_combos = {
+            0: [],
+            1: [["1A0"], ["1A1"]],
+            2: [["1A0"], ["1A1"]],
+            3: [["1A0", "3B0"], ["1A0", "3B1"], ["1A1", "3B0"], ["1A1", "3B1"]],
+        }
+        branches = scheduler.get_branches_per_step(option_combos)
+        actual = scheduler.get_branch_children(branches)
+        expected = {
+            (0, ()): [(1, ("1A0",)), (1, ("1A1",))],
+            (1, ("1A0",)): [(2, ("1A0",))],
+            (1, ("1A1",)): [(2, ("1A1",))],
+            (2, ("1A0",)): [(3, ("1A0", "3B0")), (3, ("1A0", "3B1"))],
+            (2, ("1A1",)): [(3, ("1A1", "3B0")), (3, ("1A1", "3B1"))],
+            (3, ("1A0", "3B0")): [],
+            (3, ("1A0", "3B1")): [],
+            (3, ("1A1", "3B0")): [],
+            (3, ("1A1", "3B1")): [],
+        }
+        assert actual == expected
+        assert scheduler.get_root_branches(actual) == [(0, ())]
+        assert scheduler.count_descendants((0, ()), actual) == 8
+
+class TestSelectBranches:
+
+    def test_top_k(self):
+        objectives = {("1A0",): 3.0, ("1A1",): None, ("1A2",): 1.0, ("1A3",): 2.0}
+        assert scheduler.select_branches(objectives, top_k=2) == [("1A2",), ("1A3",)]
+        assert scheduler.select_branches(objectives) == [("1A2",), ("1A3",), ("1A0",), ("1A1",)]
+
+    def test_cost_gap(self):
+        objectives = {("1A0",): 100.0, ("1A1",): 104.0, ("1A2",): 106.0, ("1A3",): None}
+        assert scheduler.select_branches(objectives, cost_gap=0.05) == [("1A0",), ("1A1",)]
+
+def _fail_on_second_option(step, option):
+    if option == ["1A1"]:
+        raise ValueError("failed")
+    return 0
+
+class TestMapBranches:
+
+    def test_map_branches_collects_failures(self):
+        actual = branch.map_branches(_fail_on_second_option, 1, [["1A0"], ["1A1"], ["1A2"]], 2)
+        assert actual == [0, 1, 0]
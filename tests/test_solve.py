@@ -0,0 +1,225 @@
+from pathlib import Path
+from pytest import raises, importorskip, approx
+import gzip
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from osemosys_step import solve
+
+MULTI_YEAR_LP = Path(Path(__file__).parent, "fixtures", "multi_year", "multi_year_gnu.lp.gz")
+SUPER_SIMPLE = Path(Path(__file__).parent, "fixtures", "super_simple")
+
+class TestGetSolverCommand:
+
+    def test_cbc(self):
+        actual = solve.get_solver_command("steps/step_0/model.lp", "steps/step_0/model.sol", "cbc")
+        expected = "cbc steps/step_0/model.lp solve -solu steps/step_0/model.sol"
+        assert actual == expected
+
+    def test_gurobi(self):
+        actual = solve.get_solver_command("steps/step_0/model.lp", "steps/step_0/model.sol", "gurobi")
+        expected = "gurobi_cl Method=2 ResultFile=steps/step_0/model.sol ResultFile=steps/step_0/model.ilp steps/step_0/model.lp"
+        assert actual == expected
+
+    def test_unknown_solver(self):
+        with raises(ValueError):
+            solve.get_solver_command("model.lp", "model.sol", "xpress")
+
+class TestGetObjective:
+
+    def test_cbc(self, tmp_path):
+        sol_file = tmp_path / "model.sol"
+        sol_file.write_text("Optimal - objective value 16068.99340000\n      0 x 1 0\n")
+        assert solve.get_objective(str(sol_file), "cbc") == 16068.9934
+
+    def test_glpk(self, tmp_path):
+        sol_file = tmp_path / "model.sol"
+        sol_file.write_text("c Problem:    osemosys\nc Objective:  cost = 16068.9934 (MINimum)\n")
+        assert solve.get_objective(str(sol_file), "glpk") == 16068.9934
+
+    def test_missing_file(self, tmp_path):
+        assert solve.get_objective(str(tmp_path / "model.sol"), "cbc") is None
+
+class TestWarmStart:
+
+    def test_cbc_command(self):
+        actual = solve.get_solver_command("model.lp", "model.sol", "cbc", "start.bas", "model.bas")
+        expected = "cbc model.lp -basisI start.bas solve -solu model.sol -basisO model.bas"
+        assert actual == expected
+
+    def test_get_lp_names_only_keeps_names_looked_for(self, tmp_path):
+        lp_file = tmp_path / "model.lp"
+        lp_file.write_text("Minimize\n cost: + NewCapacity(R,T,2030) + NewCapacity(R,T,2035)\nEnd\n")
+
+        actual = solve.get_lp_names(str(lp_file), {"NewCapacity(R,T,2030)", "NewCapacity(R,T,2025)", "cost"})
+        assert actual == {"NewCapacity(R,T,2030)", "cost"}
+
+    def test_map_basis_drops_unknown_names(self, tmp_path):
+        lp_file = tmp_path / "model.lp"
+        lp_file.write_text(
+            "\\* Problem: osemosys *\\\n\nMinimize\n cost: + NewCapacity(R,T,2030) + NewCapacity(R,T,2035)\n\n"
+            "Subject To\n CAa4_Constraint(R,T,2030): + NewCapacity(R,T,2030) >= 0\n\nEnd\n"
+        )
+        basis_file = tmp_path / "parent.bas"
+        basis_file.write_text(
+            "NAME          osemosys\n"
+            " XU NewCapacity(R,T,2025) CAa4_Constraint(R,T,2025)\n"
+            " XL NewCapacity(R,T,2030) CAa4_Constraint(R,T,2030)\n"
+            " UL NewCapacity(R,T,2035)\n"
+            "ENDATA\n"
+        )
+        start_file = tmp_path / "start.bas"
+
+        assert solve.map_basis(str(basis_file), str(lp_file), str(start_file)) == 2
+        assert start_file.read_text() == (
+            "NAME          osemosys\n"
+            " XL NewCapacity(R,T,2030) CAa4_Constraint(R,T,2030)\n"
+            " UL NewCapacity(R,T,2035)\n"
+            "ENDATA\n"
+        )
+
+    def test_highs_starts_from_basis(self, tmp_path):
+        importorskip("highspy")
+        for option in ["1A0", "1A1"]:
+            (tmp_path / option).mkdir()
+            (tmp_path / option / "model.lp").write_bytes(gzip.decompress(MULTI_YEAR_LP.read_bytes()))
+        lp_files = [str(tmp_path / option / "model.lp") for option in ["1A0", "1A1"]]
+
+        assert solve.solve_lp(lp_files[0], "highs", str(tmp_path / "1A0.log"), str(tmp_path / "1A0_time.log"), write_basis=True) == 0
+        basis = (tmp_path / "1A0" / "model.bas").read_text()
+        assert basis.startswith("NAME\nCOLUMNS\n BS TotalDiscountedCost(R1,2020)\n")
+
+        # entries of the basis missing from the lp are completed by HiGHS
+        lines = basis.splitlines(keepends=True)
+        (tmp_path / "1A0" / "model.bas").write_text("".join(lines[:100] + lines[200:]))
+        assert solve.solve_lp(lp_files[1], "highs", str(tmp_path / "1A1.log"), str(tmp_path / "1A1_time.log"), start_basis=str(tmp_path / "1A0" / "model.bas")) == 0
+        assert "useful basis" in (tmp_path / "1A1.log").read_text()
+        expected = solve.get_objective(str(tmp_path / "1A0" / "model.sol"), "highs")
+        assert solve.get_objective(str(tmp_path / "1A1" / "model.sol"), "highs") == approx(expected)
+
+class TestHighs:
+
+    def test_get_primal_values(self):
+        names = ["NewCapacity(UTOPIA,E01,1990)", "NewCapacity(UTOPIA,E01,1991)", "TotalDiscountedCost(UTOPIA,1990)"]
+        actual = solve.get_primal_values(names, [1.5, 0.0, 20.0])
+        expected = pd.DataFrame(
+            [["NewCapacity", "UTOPIA,E01,1990", 1.5], ["TotalDiscountedCost", "UTOPIA,1990", 20.0]],
+            columns=["Variable", "Index", "Value"]
+        )
+        assert_frame_equal(actual, expected)
+
+    def test_solve_highs(self, tmp_path):
+        importorskip("highspy")
+        lp_file = tmp_path / "model.lp"
+        lp_file.write_text("Minimize\n cost: + 2 NewCapacity(R,T,2030)\nSubject To\n demand: + NewCapacity(R,T,2030) >= 3\nEnd\n")
+        actual = solve.solve_highs(str(lp_file), str(tmp_path / "model.sol"), str(tmp_path / "model.log"))
+        assert actual["Value"].to_list() == [3.0]
+        assert solve.get_objective(str(tmp_path / "model.sol"), "highs") == 6.0
+        assert solve.check_solution(str(tmp_path / "model.sol"), "highs") == 0
+
+    def test_solution_file_at_full_precision(self, tmp_path):
+        importorskip("highspy")
+        lp_file = tmp_path / "model.lp"
+        lp_file.write_text("Minimize\n cost: + 3 NewCapacity(R,T,2030)\nSubject To\n demand: + 3 NewCapacity(R,T,2030) >= 1\nEnd\n")
+        expected = solve.solve_highs(str(lp_file), str(tmp_path / "model.sol"), str(tmp_path / "model.log"))
+        actual = solve.read_solution(str(tmp_path / "model.sol"), "highs")
+        assert actual["Value"].to_list() == [1 / 3]
+        assert_frame_equal(actual, expected)
+
+    def test_results_from_memory_same_as_from_file(self, tmp_path):
+        """otoole gets the same results from the values in memory as from the solution file"""
+        importorskip("highspy")
+        lp_file = tmp_path / "model.lp"
+        lp_file.write_text(Path(SUPER_SIMPLE, "super_simple_gnu.lp").read_text())
+        config = str(Path(SUPER_SIMPLE, "super_simple.yaml"))
+        data_file = str(Path(SUPER_SIMPLE, "super_simple.txt"))
+        solution = solve.solve_highs(str(lp_file), str(tmp_path / "model.sol"), str(tmp_path / "model.log"))
+        solve.generate_results_from_solution(solution, config, data_file, str(tmp_path / "memory"))
+        solve.generate_results(str(tmp_path / "model.sol"), "highs", config, data_file)
+
+        expected = sorted(x.name for x in (tmp_path / "results").glob("*.csv"))
+        assert sorted(x.name for x in (tmp_path / "memory").glob("*.csv")) == expected
+        assert "TotalCapacityAnnual.csv" in expected
+        for name in expected:
+            assert_frame_equal(pd.read_csv(tmp_path / "memory" / name), pd.read_csv(tmp_path / "results" / name))
+
+    def test_check_solution_not_optimal(self, tmp_path):
+        sol_file = tmp_path / "model.sol"
+        sol_file.write_text(
+            "Columns\n    Index Status        Lower        Upper       Primal         Dual  Name\n"
+            "        0                   0          inf                            x\n"
+            "\nModel status: Infeasible\n\nObjective value: 0\n"
+        )
+        assert solve.check_solution(str(sol_file), "highs") == 1
+
+class TestReadSolution:
+
+    expected = pd.DataFrame(
+        [["NewCapacity", "UTOPIA,E01,1990", 1.5], ["TotalDiscountedCost", "UTOPIA,1990", 20.0]],
+        columns=["Variable", "Index", "Value"]
+    )
+
+    def test_cbc(self, tmp_path):
+        sol_file = tmp_path / "model.sol"
+        sol_file.write_text(
+            "Optimal - objective value 20.00000000\n"
+            "      0 NewCapacity(UTOPIA,E01,1990)        1.5      0\n"
+            "      1 NewCapacity(UTOPIA,E01,1991)          0      3\n"
+            "**    2 TotalDiscountedCost(UTOPIA,1990)     20      0\n"
+        )
+        assert_frame_equal(solve.read_solution(str(sol_file), "cbc"), self.expected)
+
+    def test_gurobi(self, tmp_path):
+        sol_file = tmp_path / "model.sol"
+        sol_file.write_text(
+            "# Objective value = 2.0000000000000e+01\n"
+            "NewCapacity(UTOPIA,E01,1990) 1.5\n"
+            "TotalDiscountedCost(UTOPIA,1990) 2.0000000000000e+01\n"
+        )
+        assert_frame_equal(solve.read_solution(str(sol_file), "gurobi"), self.expected)
+
+    def test_cplex(self, tmp_path):
+        sol_file = tmp_path / "model.sol"
+        sol_file.write_text(
+            '<CPLEXSolution version="1.2">\n'
+            ' <header objectiveValue="20"/>\n'
+            ' <variables>\n'
+            '  <variable name="NewCapacity(UTOPIA,E01,1990)" index="0" value="1.5"/>\n'
+            '  <variable name="TotalDiscountedCost(UTOPIA,1990)" index="1" value="20"/>\n'
+            ' </variables>\n'
+            '</CPLEXSolution>\n'
+        )
+        assert_frame_equal(solve.read_solution(str(sol_file), "cplex"), self.expected)
+
+    def test_highs(self, tmp_path):
+        sol_file = tmp_path / "model.sol"
+        sol_file.write_text(
+            "Columns\n"
+            "    Index Status        Lower        Upper       Primal         Dual  Name\n"
+            "        0     BS            0          inf          1.5            0  NewCapacity(UTOPIA,E01,1990)\n"
+            "        1     BS            0          inf           20            0  TotalDiscountedCost(UTOPIA,1990)\n"
+            "Rows\n"
+            "    Index Status        Lower        Upper       Primal         Dual  Name\n"
+            "        0     LB            3          inf            3            2  Demand(UTOPIA,1990)\n"
+        )
+        assert_frame_equal(solve.read_solution(str(sol_file), "highs"), self.expected)
+
+    def test_variables(self, tmp_path):
+        sol_file = tmp_path / "model.sol"
+        sol_file.write_text("NewCapacity(UTOPIA,E01,1990) 1.5\nTotalDiscountedCost(UTOPIA,1990) 20\n")
+        actual = solve.read_solution(str(sol_file), "gurobi", ["NewCapacity"])
+        assert actual["Variable"].to_list() == ["NewCapacity"]
+
+    def test_write_results(self, tmp_path):
+        config = tmp_path / "config.yaml"
+        config.write_text(
+            "REGION:\n  dtype: str\n  type: set\n"
+            "TECHNOLOGY:\n  dtype: str\n  type: set\n"
+            "YEAR:\n  dtype: int\n  type: set\n"
+            "NewCapacity:\n  indices: [REGION, TECHNOLOGY, YEAR]\n  type: result\n  dtype: float\n  default: 0\n  calculated: False\n"
+            "TotalCapacityAnnual:\n  indices: [REGION, TECHNOLOGY, YEAR]\n  type: result\n  dtype: float\n  default: 0\n  calculated: True\n"
+        )
+        written = solve.write_results(self.expected, str(config), str(tmp_path / "results"))
+        assert written == ["NewCapacity"]
+        actual = pd.read_csv(tmp_path / "results" / "NewCapacity.csv")
+        expected = pd.DataFrame([["UTOPIA", "E01", 1990, 1.5]], columns=["REGION", "TECHNOLOGY", "YEAR", "VALUE"])
+        assert_frame_equal(actual, expected)
@@ -0,0 +1,93 @@
+import pandas as pd
+from osemosys_step import ledger, state
+from osemosys_step import results_store as rs
+
+SETTINGS = {"input_data": "data/utopia.txt", "step_length": [5], "foresight": None, "scenario_dir": "data/scenarios", "solver": "cbc"}
+
+class TestRunState:
+
+    def test_record_is_reloaded(self, tmp_path):
+        run_state = state.RunState(str(tmp_path))
+        run_state.reset(SETTINGS)
+        run_state.mark(1, ["1A0"], "data")
+        run_state.mark(1, ["1A1"], "data")
+        run_state.remove(1, ["1A1"])
+
+        actual = state.RunState(str(tmp_path)).stages
+        expected = {"1:1A0": {"data"}}
+        assert actual == expected
+
+    def test_can_resume(self, tmp_path):
+        run_state = state.RunState(str(tmp_path))
+        assert not run_state.can_resume(SETTINGS)
+        run_state.reset(SETTINGS)
+        assert not run_state.can_resume(SETTINGS)
+        run_state.mark_setup()
+        assert run_state.can_resume(SETTINGS)
+        assert not run_state.can_resume({**SETTINGS, "step_length": [1, 5]})
+
+    def test_get_done_stages_stops_at_missing_artifact(self, tmp_path):
+        branch_dir = tmp_path / "step_1" / "1A0"
+        branch_dir.mkdir(parents=True)
+        (branch_dir / "data.txt").write_text("")
+        (branch_dir / "data_pp.txt").write_text("")
+
+        run_state = state.RunState(str(tmp_path))
+        run_state.reset(SETTINGS)
+        for stage in ["data", "lp", "solved"]:
+            run_state.mark(1, ["1A0"], stage)
+
+        store = rs.ResultsStore(str(tmp_path / "results_store"))
+        res_cap_ledger = ledger.ResidualCapacityLedger(str(tmp_path / "ledger"))
+        actual = run_state.get_done_stages(1, ["1A0"], str(tmp_path), "cbc", store, res_cap_ledger, 2)
+        assert actual == {"data"}
+
+    def test_get_done_stages_checks_carried_branch(self, tmp_path):
+        branch_dir = tmp_path / "step_1" / "1A0"
+        (branch_dir / "results").mkdir(parents=True)
+        for artifact in ["data.txt", "data_pp.txt", "model.lp"]:
+            (branch_dir / artifact).write_text("")
+        (branch_dir / "model.sol").write_text("Optimal - objective value 20.00000000\n")
+        for variable in ["NewCapacity", "TotalDiscountedCost"]:
+            pd.DataFrame([["R", 2020, 1.0]], columns=["REGION", "YEAR", "VALUE"]).to_csv(branch_dir / "results" / f"{variable}.csv", index=False)
+        store = rs.ResultsStore(str(tmp_path / "results_store"))
+        store.save(1, ["1A0"], str(branch_dir / "results"), [2020])
+        res_cap_ledger = ledger.ResidualCapacityLedger(str(tmp_path / "ledger"))
+        res_cap_ledger.get_checkpoint(1, ["1A0"]).parent.mkdir(parents=True)
+        res_cap_ledger.get_checkpoint(1, ["1A0"]).write_text("REGION,TECHNOLOGY,YEAR,VALUE\n")
+
+        run_state = state.RunState(str(tmp_path))
+        run_state.reset(SETTINGS)
+        for stage in state.STAGES:
+            run_state.mark(1, ["1A0"], stage)
+        assert run_state.get_done_stages(1, ["1A0"], str(tmp_path), "cbc", store, res_cap_ledger, 2) == set(state.STAGES)
+
+        # resume after a partition of the results store was lost
+        store.get_part("TotalDiscountedCost", 1, ["1A0"]).unlink()
+        run_state = state.RunState(str(tmp_path))
+        actual = run_state.get_done_stages(1, ["1A0"], str(tmp_path), "cbc", rs.ResultsStore(str(tmp_path / "results_store")), res_cap_ledger, 2)
+        assert actual == {"data", "lp", "solved"}
+        assert state.RunState(str(tmp_path)).stages == {"1:1A0": {"data", "lp", "solved"}}
+        assert run_state.get_unsaved() == []
+
+        # the ledger checkpoint is only needed if there is a next step
+        res_cap_ledger.get_checkpoint(1, ["1A0"]).unlink()
+        store.save(1, ["1A0"], str(branch_dir / "results"), [2020])
+        for stage in ["results", "carried"]:
+            run_state.mark(1, ["1A0"], stage)
+        assert run_state.get_done_stages(1, ["1A0"], str(tmp_path), "cbc", store, res_cap_ledger, 2) == {"data", "lp", "solved", "results"}
+        run_state.mark(1, ["1A0"], "carried")
+        assert run_state.get_done_stages(1, ["1A0"], str(tmp_path), "cbc", store, res_cap_ledger, 1) == set(state.STAGES)
+
+    def test_get_unsaved(self, tmp_path):
+        run_state = state.RunState(str(tmp_path))
+        run_state.reset(SETTINGS)
+        run_state.mark(1, ["1A0", "2C0"], "carried")
+        run_state.mark(0, [], "carried")
+        run_state.mark(1, ["1A1", "2C0"], "carried")
+        run_state.mark(1, ["1A1", "2C0"], "results")
+        run_state.mark(1, ["1A0", "2C1"], "solved")
+
+        actual = run_state.get_unsaved()
+        expected = [(0, []), (1, ["1A0", "2C0"])]
+        assert actual == expected